@@ -15,7 +15,12 @@ import json
 # Add project root to Python path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from memory_system import MemorySystem
+from memory_system import (
+    HIGH_IMPORTANCE_KEYWORDS,
+    LOW_IMPORTANCE_KEYWORDS,
+    MemorySystem,
+    _IMPORTANCE_MATCHER,
+)
 
 
 class MemoryBenchmark:
@@ -294,6 +299,72 @@ class MemoryBenchmark:
             "total_conversations": stats["total_conversations"],
         }
 
+    def benchmark_importance_scoring(self, num_responses: int = 200, response_size: int = 10240):
+        """중요도 점수 계산 처리량 벤치마크 (10KB 응답)"""
+        print(
+            f"\n[Benchmark 6] 중요도 점수 계산 성능 ({num_responses}개 × {response_size // 1024}KB)"
+        )
+        print("-" * 80)
+
+        samples = [
+            "Python에서 리스트와 튜플의 차이점은 성능과 가변성입니다. 튜플은 불변 객체입니다. ",
+            "To fix this error, check the configuration and restart the service. ",
+            "```python\nimport os\n\ndef load(path):\n    return open(path).read()\n```\n",
+            "SELECT id, name FROM users WHERE active = 1; ",
+        ]
+        conversations = []
+        for i in range(num_responses):
+            query, response, model = self.generate_test_conversation(i)
+            body = response + " " + "".join(random.sample(samples, k=2))
+            conversations.append(
+                (query, (body * (response_size // len(body) + 1))[:response_size], model)
+            )
+        texts = [f"{q.lower()} {r.lower()}" for q, r, _ in conversations]
+
+        start_time = time.perf_counter()
+        scores = [self.memory.calculate_importance_score(q, r, m) for q, r, m in conversations]
+        score_time = time.perf_counter() - start_time
+
+        # 키워드 단계: KeywordMatcher vs 키워드마다 `in` 검사 (점수 상한 +3/-2 반영)
+        limits = {"high": 3, "low": 2}
+        start_time = time.perf_counter()
+        matched = [_IMPORTANCE_MATCHER.counts(text, limits) for text in texts]
+        matcher_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        naive = [
+            {
+                "high": min(sum(1 for k in HIGH_IMPORTANCE_KEYWORDS if k in text), 3),
+                "low": min(sum(1 for k in LOW_IMPORTANCE_KEYWORDS if k in text), 2),
+            }
+            for text in texts
+        ]
+        naive_time = time.perf_counter() - start_time
+
+        assert matched == naive, "KeywordMatcher 결과가 `in` 검사와 다름"
+
+        throughput = num_responses / score_time
+        print("✅ 중요도 계산 완료:")
+        print(f"   평균 계산 시간: {score_time / num_responses * 1000:.3f}ms/response")
+        print(
+            f"   처리량: {throughput:.1f} responses/sec ({throughput * response_size / 2**20:.1f} MB/s)"
+        )
+        print(
+            f"   키워드 스캔: matcher {matcher_time / num_responses * 1000:.3f}ms"
+            f" vs `in` {naive_time / num_responses * 1000:.3f}ms"
+            f" ({naive_time / matcher_time:.1f}x)"
+        )
+        print(f"   평균 점수: {sum(scores) / len(scores):.2f}/10")
+
+        self.results["importance_scoring"] = {
+            "num_responses": num_responses,
+            "response_size": response_size,
+            "avg_time_ms": score_time / num_responses * 1000,
+            "throughput_per_sec": throughput,
+            "keyword_matcher_ms": matcher_time / num_responses * 1000,
+            "keyword_naive_ms": naive_time / num_responses * 1000,
+        }
+
     def save_results(self):
         """벤치마크 결과 저장"""
         output_file = (
@@ -343,6 +414,12 @@ class MemoryBenchmark:
             print(f"   평균: {hyb['avg_time_ms']:.2f}ms")
             print(f"   P95: {hyb['p95_time_ms']:.2f}ms")
 
+        if "importance_scoring" in self.results:
+            imp = self.results["importance_scoring"]
+            print(f"\n⚖️  중요도 계산 성능 ({imp['response_size'] // 1024}KB 응답):")
+            print(f"   처리량: {imp['throughput_per_sec']:.1f} responses/sec")
+            print(f"   평균: {imp['avg_time_ms']:.3f}ms")
+
         print("\n" + "=" * 80)
 
 
@@ -362,6 +439,11 @@ async def main():
         action="store_true",
         help="Run full 1M conversation test (takes ~1 hour)",
     )
+    parser.add_argument(
+        "--importance-only",
+        action="store_true",
+        help="Run only the importance scoring benchmark (no database writes)",
+    )
     args = parser.parse_args()
 
     test_size = 1_000_000 if args.full else args.size
@@ -379,12 +461,18 @@ async def main():
         # Setup
         benchmark.setup()
 
+        if args.importance_only:
+            benchmark.benchmark_importance_scoring()
+            benchmark.print_summary()
+            return 0
+
         # Run benchmarks
         benchmark.benchmark_save()
         benchmark.benchmark_fts_search(num_queries=100)
         await benchmark.benchmark_vector_search(num_queries=50)
         await benchmark.benchmark_hybrid_search(num_queries=50)
         benchmark.benchmark_stats()
+        benchmark.benchmark_importance_scoring()
 
         # Results
         benchmark.save_results()
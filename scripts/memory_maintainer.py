@@ -31,6 +31,8 @@ EMBEDDING_URL = os.getenv("EMBEDDING_URL", "http://embedding:8003")
 MEMORY_BACKUP_CRON = os.getenv("MEMORY_BACKUP_CRON", "03:00")  # 새벽 3시
 MEMORY_SYNC_INTERVAL = int(os.getenv("MEMORY_SYNC_INTERVAL", "300"))  # 5분
 TTL_CHECK_INTERVAL = int(os.getenv("TTL_CHECK_INTERVAL", "3600"))  # 1시간
+# 배치 삭제 + incremental_vacuum + WAL 체크포인트 (0이면 비활성)
+DB_MAINTENANCE_INTERVAL = int(os.getenv("DB_MAINTENANCE_INTERVAL", "21600"))  # 6시간
 
 # 로깅 설정
 log_dir = Path(AI_MEMORY_DIR) / "logs"
@@ -333,6 +335,23 @@ class MemoryMaintainer:
 
         logger.info(f"TTL 정리 작업 완료 - 총 {total_deleted}개 대화 삭제")
 
+    def run_db_maintenance(self):
+        """DB 점진적 유지보수 (전체 VACUUM 없이 빈 페이지 반환)"""
+        logger.info("DB 유지보수 작업 시작")
+        from memory_system import get_memory_system
+
+        memory_system = get_memory_system()
+
+        for db_path in self.find_memory_databases():
+            project_id = db_path.parent.name
+            progress = memory_system.run_maintenance(project_id)
+            logger.info(
+                f"DB 유지보수 - {project_id}: {progress.get('state')}, "
+                f"삭제 {progress.get('deleted', 0)}개, 반환 {progress.get('freed_pages', 0)} pages"
+            )
+
+        logger.info("DB 유지보수 작업 완료")
+
     def run_qdrant_sync(self):
         """Qdrant 동기화 작업 실행 (공통 헬퍼 함수 사용)"""
         logger.info("Qdrant 동기화 작업 시작")
@@ -455,11 +474,14 @@ def main():
     schedule.every(TTL_CHECK_INTERVAL).seconds.do(maintainer.run_ttl_cleanup)
     schedule.every(MEMORY_SYNC_INTERVAL).seconds.do(maintainer.run_qdrant_sync)
     schedule.every().day.at(MEMORY_BACKUP_CRON).do(maintainer.run_backup)
+    if DB_MAINTENANCE_INTERVAL > 0:
+        schedule.every(DB_MAINTENANCE_INTERVAL).seconds.do(maintainer.run_db_maintenance)
 
     logger.info("Memory Maintainer 스케줄 시작")
     logger.info(f"TTL 정리: {TTL_CHECK_INTERVAL}초마다")
     logger.info(f"Qdrant 동기화: {MEMORY_SYNC_INTERVAL}초마다")
     logger.info(f"백업: 매일 {MEMORY_BACKUP_CRON}")
+    logger.info(f"DB 유지보수: {DB_MAINTENANCE_INTERVAL}초마다")
 
     # 초기 헬스체크
     health = maintainer.health_check()
@@ -8,7 +8,7 @@ import json
 import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
 from contextlib import contextmanager
 import threading
 import re
@@ -39,12 +39,213 @@ except ImportError:
             pass
 
 
+# 중요도 키워드 (combined_text 부분 문자열 일치, 소문자 기준)
+HIGH_IMPORTANCE_KEYWORDS = (
+    # 기술 설정
+    "설정",
+    "config",
+    "configuration",
+    "환경변수",
+    "environment",
+    "architecture",
+    "design pattern",
+    "아키텍처",
+    "설계",
+    # 문제 해결
+    "버그",
+    "에러",
+    "오류",
+    "문제",
+    "해결",
+    "fix",
+    "bug",
+    "error",
+    "issue",
+    "problem",
+    "solution",
+    "trouble",
+    # 중요 개발
+    "구현",
+    "implementation",
+    "알고리즘",
+    "algorithm",
+    "최적화",
+    "optimization",
+    "performance",
+    "성능",
+    "보안",
+    "security",
+    # 결정사항
+    "결정",
+    "decision",
+    "정책",
+    "policy",
+    "방향",
+    "direction",
+    "전략",
+    "strategy",
+    "계획",
+    "plan",
+)
+
+LOW_IMPORTANCE_KEYWORDS = (
+    "안녕",
+    "hello",
+    "hi",
+    "테스트",
+    "test",
+    "확인",
+    "check",
+    "감사",
+    "thank",
+    "좋아",
+    "좋다",
+    "괜찮",
+    "ok",
+    "okay",
+)
+
+# 코드 포함 여부 패턴 (원문 대상 IGNORECASE 검색과 같은 의미)
+CODE_PATTERNS = (
+    r"```[\s\S]*?```",  # 코드 블록
+    r"`[^`]+`",  # 인라인 코드
+    r"def\s+\w+",  # Python 함수
+    r"function\s+\w+",  # JavaScript 함수
+    r"class\s+\w+",  # 클래스 정의
+    r"import\s+\w+",  # Import 문
+    r"SELECT\s+.*FROM",  # SQL 쿼리
+)
+
+
+class KeywordMatcher:
+    """
+    여러 키워드 표의 일치 개수를 한 번에 계산 (`keyword in text`를 키워드마다 반복한 것과 같은 결과)
+    - 비ASCII(한글) 키워드: trie 모양의 정규식 하나로 컴파일해 findall 한 번으로 스캔
+      · findall은 겹치지 않는 가장 긴 일치만 돌려주므로 나머지는 미리 계산한 표로 보완
+        (일치한 키워드에 포함된 키워드, 일치 구간에서 시작해 경계를 넘는 키워드는 후보만 `in` 확인)
+      · ASCII 텍스트에는 나타날 수 없으므로 건너뜀
+    - ASCII 키워드: `in` (memchr 기반이라 라틴 문자 텍스트에서는 sre 스캔보다 빠름)
+    - limits: 표별 상한에 도달하면 그 표의 남은 키워드 검사를 생략 (결과는 min(개수, 상한))
+    """
+
+    def __init__(self, tables: Dict[str, Sequence[str]]):
+        self._tables: Dict[str, List[str]] = {}  # 키워드 → 속한 표 이름 (중복 포함)
+        for name, keywords in tables.items():
+            for keyword in keywords:
+                self._tables.setdefault(keyword, []).append(name)
+        self._names = list(tables)
+        # ASCII 키워드는 속한 표 조합별로 묶음 → 묶음의 표가 모두 상한에 닿으면 나머지를 건너뜀
+        self._ascii: Dict[Tuple[str, ...], List[str]] = {}
+        for keyword, names in self._tables.items():
+            if keyword.isascii():
+                self._ascii.setdefault(tuple(names), []).append(keyword)
+
+        keywords = [k for k in self._tables if not k.isascii()]
+        self._pattern = re.compile(self._trie_pattern(keywords)) if keywords else None
+        self._contained: Dict[str, FrozenSet[str]] = {
+            a: frozenset(b for b in keywords if b in a) for a in keywords
+        }
+        self._straddling: Dict[str, FrozenSet[str]] = {
+            a: frozenset(
+                b
+                for b in keywords
+                if b not in a and any(b.startswith(a[i:]) for i in range(1, len(a)))
+            )
+            for a in keywords
+        }
+
+    @staticmethod
+    def _trie_pattern(keywords: Iterable[str]) -> str:
+        trie: Dict[str, Any] = {}
+        for keyword in keywords:
+            node = trie
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node[""] = True
+
+        def build(node: Dict[str, Any]) -> str:
+            alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+            if not alts:
+                return ""
+            if len(alts) == 1 and "" not in node:
+                return alts[0]
+            body = f"(?:{'|'.join(alts)})"
+            return body + "?" if "" in node else body
+
+        return build(trie)
+
+    def _find_compiled(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        if self._pattern is None or text.isascii():
+            return found
+        candidates: Set[str] = set()
+        for match in set(self._pattern.findall(text)):
+            found |= self._contained[match]
+            candidates |= self._straddling[match]
+        found.update(keyword for keyword in candidates - found if keyword in text)
+        return found
+
+    def counts(self, text: str, limits: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """표 이름 → text에 나타나는 키워드 개수 (limits가 있으면 min(개수, 상한))"""
+        limits = limits or {}
+        counts = dict.fromkeys(self._names, 0)
+        for keyword in self._find_compiled(text):
+            for name in self._tables[keyword]:
+                counts[name] += 1
+        for names, keywords in self._ascii.items():
+            if len(names) == 1:
+                # 대부분의 키워드는 표 하나에만 속함 → 개수만 세다가 상한에서 중단
+                name = names[0]
+                count, limit = counts[name], limits.get(name)
+                if limit is not None and count >= limit:
+                    continue
+                for keyword in keywords:
+                    if keyword in text:
+                        count += 1
+                        if count == limit:
+                            break
+                counts[name] = count
+                continue
+            for keyword in keywords:
+                if all(counts[name] >= limits.get(name, counts[name] + 1) for name in names):
+                    break
+                if keyword in text:
+                    for name in names:
+                        counts[name] += 1
+        return {name: min(count, limits.get(name, count)) for name, count in counts.items()}
+
+
+_IMPORTANCE_MATCHER = KeywordMatcher(
+    {"high": HIGH_IMPORTANCE_KEYWORDS, "low": LOW_IMPORTANCE_KEYWORDS}
+)
+
+# 소문자화한 텍스트에서는 IGNORECASE 없이 검색 (리터럴 접두어 고속 검색 사용)
+# lower()가 IGNORECASE와 다르게 접는 문자가 있으면 원문 IGNORECASE 검색으로 대체
+# 패턴은 이스케이프(\S 등)는 그대로 두고 리터럴만 소문자화
+_CODE_PATTERNS_LOWER = tuple(
+    re.compile(re.sub(r"\\.|[^\\]+", lambda m: m[0] if m[0][0] == "\\" else m[0].lower(), p))
+    for p in CODE_PATTERNS
+)
+_CODE_PATTERNS_IGNORECASE = tuple(re.compile(p, re.IGNORECASE) for p in CODE_PATTERNS)
+_CASE_FOLD_EXCEPTIONS = ("\u0130", "\u0131", "\u017f")  # İ ı ſ
+
+
+def _contains_code(text: str, text_lower: str) -> bool:
+    if not text.isascii() and any(ch in text for ch in _CASE_FOLD_EXCEPTIONS):
+        return any(p.search(text) for p in _CODE_PATTERNS_IGNORECASE)
+    return any(p.search(text_lower) for p in _CODE_PATTERNS_LOWER)
+
+
 class MemorySystem:
     def __init__(self, data_dir: str = None):
         self.data_dir = self._get_data_directory(data_dir)
         self._local = threading.local()
         self._storage_available = True
 
+        # 프로젝트별 DB 유지보수 진행 상황 (get_maintenance_progress로 조회)
+        self._maintenance: Dict[str, Dict[str, Any]] = {}
+        self._maintenance_lock = threading.Lock()
+
         # 임베딩 및 벡터 검색 설정
         self.embedding_url = os.getenv("EMBEDDING_URL", "http://localhost:8003")
         self.qdrant_url = os.getenv("QDRANT_URL", "http://localhost:6333")
@@ -210,6 +411,9 @@ class MemorySystem:
             conn = sqlite3.connect(str(db_path), check_same_thread=False, timeout=30.0)
             conn.row_factory = sqlite3.Row
 
+            # 새 DB는 생성 시점부터 incremental auto_vacuum (기존 DB는 optimize_database가 전환)
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
             # SQLite 성능 최적화
             conn.execute("PRAGMA journal_mode=WAL")
             conn.execute("PRAGMA synchronous=NORMAL")
@@ -344,15 +548,7 @@ class MemorySystem:
             conn.execute(index_sql)
 
         # FTS5 트리거 (자동 동기화)
-        conn.execute(
-            """
-            CREATE TRIGGER IF NOT EXISTS conversations_ai_insert AFTER INSERT ON conversations
-            BEGIN
-                INSERT INTO conversations_fts(rowid, user_query, ai_response)
-                VALUES (NEW.id, NEW.user_query, NEW.ai_response);
-            END
-        """
-        )
+        conn.execute(self._FTS_INSERT_TRIGGER)
 
         conn.execute(
             """
@@ -375,6 +571,15 @@ class MemorySystem:
         """
         )
 
+    # 대량 저장은 트리거를 잠시 내리고 FTS를 INSERT ... SELECT 한 번으로 채움 (save_conversations_bulk)
+    _FTS_INSERT_TRIGGER = """
+        CREATE TRIGGER IF NOT EXISTS conversations_ai_insert AFTER INSERT ON conversations
+        BEGIN
+            INSERT INTO conversations_fts(rowid, user_query, ai_response)
+            VALUES (NEW.id, NEW.user_query, NEW.ai_response);
+        END
+    """
+
     def calculate_importance_score(
         self,
         user_query: str,
@@ -392,76 +597,10 @@ class MemorySystem:
         response_lower = ai_response.lower()
         combined_text = f"{query_lower} {response_lower}"
 
-        # 높은 중요도 키워드
-        high_importance_keywords = [
-            # 기술 설정
-            "설정",
-            "config",
-            "configuration",
-            "환경변수",
-            "environment",
-            "architecture",
-            "design pattern",
-            "아키텍처",
-            "설계",
-            # 문제 해결
-            "버그",
-            "에러",
-            "오류",
-            "문제",
-            "해결",
-            "fix",
-            "bug",
-            "error",
-            "issue",
-            "problem",
-            "solution",
-            "trouble",
-            # 중요 개발
-            "구현",
-            "implementation",
-            "알고리즘",
-            "algorithm",
-            "최적화",
-            "optimization",
-            "performance",
-            "성능",
-            "보안",
-            "security",
-            # 결정사항
-            "결정",
-            "decision",
-            "정책",
-            "policy",
-            "방향",
-            "direction",
-            "전략",
-            "strategy",
-            "계획",
-            "plan",
-        ]
-
-        # 낮은 중요도 키워드
-        low_importance_keywords = [
-            "안녕",
-            "hello",
-            "hi",
-            "테스트",
-            "test",
-            "확인",
-            "check",
-            "감사",
-            "thank",
-            "좋아",
-            "좋다",
-            "괜찮",
-            "ok",
-            "okay",
-        ]
-
-        # 키워드 기반 점수 조정
-        high_count = sum(1 for keyword in high_importance_keywords if keyword in combined_text)
-        low_count = sum(1 for keyword in low_importance_keywords if keyword in combined_text)
+        # 키워드 기반 점수 조정 (점수에 반영되는 상한까지만 계산)
+        counts = _IMPORTANCE_MATCHER.counts(combined_text, limits={"high": 3, "low": 2})
+        high_count = counts["high"]
+        low_count = counts["low"]
 
         score += min(high_count, 3)  # 최대 +3
         score -= min(low_count, 2)  # 최대 -2
@@ -476,20 +615,8 @@ class MemorySystem:
             score -= 1
 
         # 코드 포함 여부
-        code_patterns = [
-            r"```[\s\S]*?```",  # 코드 블록
-            r"`[^`]+`",  # 인라인 코드
-            r"def\s+\w+",  # Python 함수
-            r"function\s+\w+",  # JavaScript 함수
-            r"class\s+\w+",  # 클래스 정의
-            r"import\s+\w+",  # Import 문
-            r"SELECT\s+.*FROM",  # SQL 쿼리
-        ]
-
-        for pattern in code_patterns:
-            if re.search(pattern, ai_response, re.IGNORECASE):
-                score += 1
-                break
+        if _contains_code(ai_response, response_lower):
+            score += 1
 
         # 모델 타입 고려
         if model_used == "code-7b":
@@ -527,39 +654,20 @@ class MemorySystem:
             return None
 
         try:
-            context = context or {}
-            importance_score = self.calculate_importance_score(
-                user_query, ai_response, model_used, context
+            row = self._conversation_row(
+                user_query,
+                ai_response,
+                model_used,
+                session_id,
+                token_count,
+                response_time_ms,
+                context,
+                tags,
+                datetime.now(),
             )
 
-            # TTL 계산
-            ttl_days = self.IMPORTANCE_LEVELS[importance_score]["ttl_days"]
-            expires_at = None
-            if ttl_days > 0:
-                expires_at = datetime.now() + timedelta(days=ttl_days)
-
             with self.transaction(project_id) as conn:
-                cursor = conn.execute(
-                    """
-                    INSERT INTO conversations (
-                        user_query, ai_response, model_used, importance_score,
-                        tags, session_id, token_count, response_time_ms,
-                        project_context, expires_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        user_query,
-                        ai_response,
-                        model_used,
-                        importance_score,
-                        json.dumps(tags or [], ensure_ascii=False),
-                        session_id,
-                        token_count,
-                        response_time_ms,
-                        json.dumps(context, ensure_ascii=False),
-                        expires_at,
-                    ),
-                )
+                cursor = conn.execute(self._CONVERSATION_INSERT, row)
 
                 conversation_id = cursor.lastrowid
 
@@ -581,6 +689,128 @@ class MemorySystem:
             print(f"⚠️ Memory save error: {e}")
             return None
 
+    _CONVERSATION_INSERT = """
+        INSERT INTO conversations (
+            user_query, ai_response, model_used, importance_score,
+            tags, session_id, token_count, response_time_ms,
+            project_context, expires_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    def _conversation_row(
+        self,
+        user_query: str,
+        ai_response: str,
+        model_used: Optional[str],
+        session_id: Optional[str],
+        token_count: Optional[int],
+        response_time_ms: Optional[int],
+        context: Optional[Dict],
+        tags: Optional[List[str]],
+        now: datetime,
+    ) -> tuple:
+        """_CONVERSATION_INSERT 파라미터 (중요도 점수와 TTL 기반 만료 시각 포함)"""
+        context = context or {}
+        importance_score = self.calculate_importance_score(
+            user_query, ai_response, model_used, context
+        )
+
+        # TTL 계산
+        ttl_days = self.IMPORTANCE_LEVELS[importance_score]["ttl_days"]
+        expires_at = None
+        if ttl_days > 0:
+            expires_at = now + timedelta(days=ttl_days)
+
+        return (
+            user_query,
+            ai_response,
+            model_used,
+            importance_score,
+            json.dumps(tags, ensure_ascii=False) if tags else "[]",
+            session_id,
+            token_count,
+            response_time_ms,
+            json.dumps(context, ensure_ascii=False) if context else "{}",
+            expires_at,
+        )
+
+    def save_conversations_bulk(
+        self, project_id: str, conversations: List[Dict[str, Any]]
+    ) -> Optional[List[int]]:
+        """
+        여러 대화를 한 트랜잭션으로 저장 (이력 마이그레이션/재생용)
+        conversations: save_conversation 인자와 같은 키의 dict 목록 (user_query, ai_response 필수)
+        - 중요도/TTL을 한 번에 계산한 뒤 executemany로 삽입
+        - FTS 색인과 임베딩 큐는 삽입 범위에 대한 INSERT ... SELECT 한 문장씩
+        반환: 입력 순서대로의 대화 ID 목록 (권한 오류 등 실패 시 None, 일부만 저장되지 않음)
+        """
+        if not self._storage_available:
+            return None
+        if not conversations:
+            return []
+
+        try:
+            now = datetime.now()
+            rows = [
+                self._conversation_row(
+                    c["user_query"],
+                    c["ai_response"],
+                    c.get("model_used"),
+                    c.get("session_id"),
+                    c.get("token_count"),
+                    c.get("response_time_ms"),
+                    c.get("context"),
+                    c.get("tags"),
+                    now,
+                )
+                for c in conversations
+            ]
+
+            with self.transaction(project_id) as conn:
+                # 처음부터 쓰기 잠금 → 트리거 교체/삽입/FTS 채우기가 한 트랜잭션 (다른 writer는 대기)
+                if not conn.in_transaction:
+                    conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DROP TRIGGER IF EXISTS conversations_ai_insert")
+                conn.executemany(self._CONVERSATION_INSERT, rows)
+                # 쓰기 잠금을 쥔 한 트랜잭션의 AUTOINCREMENT id는 연속 → 마지막 id로 전체 범위 계산
+                last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                first_id = last_id - len(rows) + 1
+                inserted = conn.execute(
+                    "SELECT COUNT(*) FROM conversations WHERE id BETWEEN ? AND ?",
+                    (first_id, last_id),
+                ).fetchone()[0]
+                if inserted != len(rows):
+                    raise RuntimeError(
+                        f"Non-contiguous conversation ids ({inserted} of {len(rows)} in range)"
+                    )
+
+                conn.execute(
+                    """
+                    INSERT INTO conversations_fts(rowid, user_query, ai_response)
+                    SELECT id, user_query, ai_response FROM conversations WHERE id BETWEEN ? AND ?
+                """,
+                    (first_id, last_id),
+                )
+                conn.execute(self._FTS_INSERT_TRIGGER)
+
+                # 임베딩 큐에 한 번에 추가 (나중에 비동기 처리)
+                conn.execute(
+                    """
+                    INSERT INTO conversation_embeddings (conversation_id, sync_status)
+                    SELECT id, 'pending' FROM conversations WHERE id BETWEEN ? AND ?
+                """,
+                    (first_id, last_id),
+                )
+
+            return list(range(first_id, last_id + 1))
+
+        except (OSError, PermissionError) as e:
+            print(f"⚠️ Cannot save conversations to memory: {e}")
+            return None
+        except Exception as e:
+            print(f"⚠️ Memory bulk save error: {e}")
+            return None
+
     def search_conversations(
         self,
         project_id: str,
@@ -1187,22 +1417,61 @@ class MemorySystem:
             print(f"⚠️ 백업 복원 실패: {e}")
             return False
 
-    def cleanup_expired_conversations(self, project_id: str) -> int:
-        """TTL 만료된 대화 정리"""
+    def _update_maintenance(self, project_id: str, **fields):
+        with self._maintenance_lock:
+            self._maintenance.setdefault(project_id, {"project_id": project_id}).update(fields)
+
+    def get_maintenance_progress(self, project_id: str) -> Dict[str, Any]:
+        """유지보수 진행 상황 (단계, 삭제한 대화 수, 반환한 페이지 수 등)"""
+        with self._maintenance_lock:
+            return dict(self._maintenance.get(project_id, {"project_id": project_id}))
+
+    def cleanup_expired_conversations(self, project_id: str, batch_size: int = 1000) -> int:
+        """TTL 만료된 대화 정리 (배치마다 커밋해 쓰기 잠금을 짧게 유지)"""
         try:
-            with self.transaction(project_id) as conn:
-                cursor = conn.execute(
-                    """
-                    DELETE FROM conversations
-                    WHERE expires_at IS NOT NULL
-                    AND expires_at < ?
-                """,
-                    (datetime.now().isoformat(),),
-                )
+            now = datetime.now().isoformat()
+            deleted_count = 0
+            self._update_maintenance(project_id, phase="cleanup_expired", deleted=0)
 
-                deleted_count = cursor.rowcount
+            while True:
+                with self.transaction(project_id) as conn:
+                    ids = [
+                        row[0]
+                        for row in conn.execute(
+                            """
+                            SELECT id FROM conversations
+                            WHERE expires_at IS NOT NULL
+                            AND expires_at < ?
+                            LIMIT ?
+                        """,
+                            (now, batch_size),
+                        )
+                    ]
+                    if not ids:
+                        break
+
+                    # 참조하는 행 먼저 정리 (foreign_keys=ON)
+                    placeholders = ",".join("?" * len(ids))
+                    conn.execute(
+                        f"DELETE FROM conversation_embeddings WHERE conversation_id IN ({placeholders})",
+                        ids,
+                    )
+                    conn.execute(
+                        f"""
+                        UPDATE important_facts SET source_conversation_id = NULL
+                        WHERE source_conversation_id IN ({placeholders})
+                    """,
+                        ids,
+                    )
+                    conn.execute(f"DELETE FROM conversations WHERE id IN ({placeholders})", ids)
+
+                deleted_count += len(ids)
+                self._update_maintenance(project_id, deleted=deleted_count)
+                if len(ids) < batch_size:
+                    break
 
-                # 고아 임베딩 정리
+            # 고아 임베딩 정리
+            with self.transaction(project_id) as conn:
                 conn.execute(
                     """
                     DELETE FROM conversation_embeddings
@@ -1212,27 +1481,76 @@ class MemorySystem:
                 """
                 )
 
-                if deleted_count > 0:
-                    print(f"✅ TTL 정리 완료: {deleted_count}개 대화 삭제")
+            if deleted_count > 0:
+                print(f"✅ TTL 정리 완료: {deleted_count}개 대화 삭제")
 
-                return deleted_count
+            return deleted_count
 
         except Exception as e:
             print(f"⚠️ TTL 정리 실패: {e}")
             return 0
 
-    def optimize_database(self, project_id: str) -> bool:
-        """데이터베이스 최적화 (VACUUM, ANALYZE)"""
+    def optimize_database(self, project_id: str, vacuum_pages: int = 1000) -> bool:
+        """
+        데이터베이스 최적화 (incremental_vacuum, WAL 체크포인트, PRAGMA optimize)
+        - 빈 페이지를 vacuum_pages개씩 반환하고 매번 커밋 → 다른 읽기/쓰기를 오래 막지 않음
+        - 전체 VACUUM은 기존 DB를 auto_vacuum=INCREMENTAL로 전환하는 최초 1회만 실행
+        """
         try:
+            conn = self._get_connection(project_id)
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                self._update_maintenance(project_id, phase="migrate_auto_vacuum")
+                with self.transaction(project_id) as conn:
+                    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                    conn.execute("VACUUM")
+
+            self._update_maintenance(project_id, phase="incremental_vacuum", freed_pages=0)
+            freed = 0
+            while True:
+                with self.transaction(project_id) as conn:
+                    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                    if not before:
+                        break
+                    conn.execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})").fetchall()
+                    after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                freed += before - after
+                self._update_maintenance(project_id, freed_pages=freed, freelist_pages=after)
+                if after == 0 or after >= before:
+                    break
+
+            self._update_maintenance(project_id, phase="wal_checkpoint")
             with self.transaction(project_id) as conn:
-                conn.execute("VACUUM")
-                conn.execute("ANALYZE")
-                print(f"✅ 데이터베이스 최적화 완료: {project_id}")
-                return True
+                busy, log, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+                self._update_maintenance(
+                    project_id,
+                    wal_checkpoint={"busy": busy, "log": log, "checkpointed": checkpointed},
+                )
+                conn.execute("PRAGMA optimize")
+
+            self._update_maintenance(project_id, phase=None)
+            print(f"✅ 데이터베이스 최적화 완료: {project_id} ({freed} pages freed)")
+            return True
         except Exception as e:
+            self._update_maintenance(project_id, phase=None, error=str(e))
             print(f"⚠️ 데이터베이스 최적화 실패: {e}")
             return False
 
+    def run_maintenance(self, project_id: str, batch_size: int = 1000) -> Dict[str, Any]:
+        """백그라운드 유지보수 1회: 만료 대화 배치 삭제 → 점진적 최적화. 진행 상황 반환"""
+        started = datetime.now()
+        self._update_maintenance(
+            project_id, state="running", started_at=started.isoformat(), error=None
+        )
+        self.cleanup_expired_conversations(project_id, batch_size=batch_size)
+        success = self.optimize_database(project_id)
+        self._update_maintenance(
+            project_id,
+            state="idle" if success else "failed",
+            finished_at=datetime.now().isoformat(),
+            duration_ms=int((datetime.now() - started).total_seconds() * 1000),
+        )
+        return self.get_maintenance_progress(project_id)
+
     def get_qdrant_sync_queue(
         self, project_id: str, limit: int = 100, include_failed: bool = False
     ) -> List[Dict]:
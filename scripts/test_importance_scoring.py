@@ -7,34 +7,32 @@
 from memory_system import memory_system
 
 
-def test_importance_scenarios():
-    """다양한 시나리오로 중요도 점수 테스트"""
-
-    test_cases = [
-        # 인사 및 간단한 대화 (낮은 중요도)
-        {
-            "user_query": "안녕하세요!",
-            "ai_response": "안녕하세요! 무엇을 도와드릴까요?",
-            "expected_range": (1, 3),
-            "description": "간단한 인사",
-        },
-        {
-            "user_query": "감사합니다",
-            "ai_response": "천만에요. 다른 질문이 있으시면 언제든 말씀해주세요.",
-            "expected_range": (1, 3),
-            "description": "감사 인사",
-        },
-        # 일반적인 질문 (중간 중요도)
-        {
-            "user_query": "Python에서 리스트와 튜플의 차이점은 무엇인가요?",
-            "ai_response": "Python에서 리스트와 튜플의 주요 차이점은 다음과 같습니다:\n\n1. 가변성(Mutability):\n- 리스트는 가변(mutable) 객체로, 생성 후에도 요소를 추가, 삭제, 변경할 수 있습니다.\n- 튜플은 불변(immutable) 객체로, 생성 후에는 요소를 변경할 수 없습니다.\n\n2. 표기법:\n- 리스트: [1, 2, 3]\n- 튜플: (1, 2, 3)\n\n3. 성능:\n- 튜플이 리스트보다 메모리 효율적이고 접근 속도가 빠릅니다.\n\n4. 사용 용도:\n- 리스트: 데이터가 변경될 가능성이 있는 경우\n- 튜플: 고정된 데이터나 함수의 반환값으로 여러 값을 묶을 때",
-            "expected_range": (4, 7),
-            "description": "Python 기본 개념 질문",
-        },
-        # 코딩 관련 질문 (높은 중요도)
-        {
-            "user_query": "FastAPI에서 데이터베이스 연결을 위한 의존성 주입을 어떻게 구현하나요?",
-            "ai_response": """FastAPI에서 데이터베이스 연결을 위한 의존성 주입을 구현하는 방법은 다음과 같습니다:
+# 중요도 판정 시나리오 (tests/memory/test_importance_scorer.py 골든 테스트에서도 사용)
+IMPORTANCE_TEST_CASES = [
+    # 인사 및 간단한 대화 (낮은 중요도)
+    {
+        "user_query": "안녕하세요!",
+        "ai_response": "안녕하세요! 무엇을 도와드릴까요?",
+        "expected_range": (1, 3),
+        "description": "간단한 인사",
+    },
+    {
+        "user_query": "감사합니다",
+        "ai_response": "천만에요. 다른 질문이 있으시면 언제든 말씀해주세요.",
+        "expected_range": (1, 3),
+        "description": "감사 인사",
+    },
+    # 일반적인 질문 (중간 중요도)
+    {
+        "user_query": "Python에서 리스트와 튜플의 차이점은 무엇인가요?",
+        "ai_response": "Python에서 리스트와 튜플의 주요 차이점은 다음과 같습니다:\n\n1. 가변성(Mutability):\n- 리스트는 가변(mutable) 객체로, 생성 후에도 요소를 추가, 삭제, 변경할 수 있습니다.\n- 튜플은 불변(immutable) 객체로, 생성 후에는 요소를 변경할 수 없습니다.\n\n2. 표기법:\n- 리스트: [1, 2, 3]\n- 튜플: (1, 2, 3)\n\n3. 성능:\n- 튜플이 리스트보다 메모리 효율적이고 접근 속도가 빠릅니다.\n\n4. 사용 용도:\n- 리스트: 데이터가 변경될 가능성이 있는 경우\n- 튜플: 고정된 데이터나 함수의 반환값으로 여러 값을 묶을 때",
+        "expected_range": (4, 7),
+        "description": "Python 기본 개념 질문",
+    },
+    # 코딩 관련 질문 (높은 중요도)
+    {
+        "user_query": "FastAPI에서 데이터베이스 연결을 위한 의존성 주입을 어떻게 구현하나요?",
+        "ai_response": """FastAPI에서 데이터베이스 연결을 위한 의존성 주입을 구현하는 방법은 다음과 같습니다:
 
 ```python
 from fastapi import FastAPI, Depends
@@ -66,13 +64,13 @@ def read_users(db: Session = Depends(get_db)):
 1. 자동 연결 관리
 2. 예외 발생시 안전한 정리
 3. 테스트 용이성""",
-            "expected_range": (6, 9),
-            "description": "고급 코딩 질문 + 코드 포함",
-        },
-        # 설정 및 구성 관련 (높은 중요도)
-        {
-            "user_query": "Docker compose에서 환경변수를 안전하게 관리하는 방법을 알려주세요",
-            "ai_response": """Docker Compose에서 환경변수를 안전하게 관리하는 방법들:
+        "expected_range": (6, 9),
+        "description": "고급 코딩 질문 + 코드 포함",
+    },
+    # 설정 및 구성 관련 (높은 중요도)
+    {
+        "user_query": "Docker compose에서 환경변수를 안전하게 관리하는 방법을 알려주세요",
+        "ai_response": """Docker Compose에서 환경변수를 안전하게 관리하는 방법들:
 
 1. .env 파일 사용:
 ```yaml
@@ -108,18 +106,24 @@ secrets:
 - .env 파일을 .gitignore에 추가
 - 프로덕션에서는 Docker Secrets 또는 외부 비밀 관리 시스템 사용
 - 환경별로 파일 분리""",
-            "expected_range": (7, 9),
-            "description": "설정 관리 + 보안 고려사항",
-        },
-        # 사용자가 중요표시한 경우 (최고 중요도)
-        {
-            "user_query": "이 프로젝트의 핵심 아키텍처를 설명해주세요",
-            "ai_response": "이 프로젝트는 로컬 AI 서비스를 위한 마이크로서비스 아키텍처를 사용합니다...",
-            "context": {"user_important": True},
-            "expected_range": (8, 10),
-            "description": "사용자 중요 표시",
-        },
-    ]
+        "expected_range": (7, 9),
+        "description": "설정 관리 + 보안 고려사항",
+    },
+    # 사용자가 중요표시한 경우 (최고 중요도)
+    {
+        "user_query": "이 프로젝트의 핵심 아키텍처를 설명해주세요",
+        "ai_response": "이 프로젝트는 로컬 AI 서비스를 위한 마이크로서비스 아키텍처를 사용합니다...",
+        "context": {"user_important": True},
+        "expected_range": (8, 10),
+        "description": "사용자 중요 표시",
+    },
+]
+
+
+def test_importance_scenarios():
+    """다양한 시나리오로 중요도 점수 테스트"""
+
+    test_cases = IMPORTANCE_TEST_CASES
 
     print("🧪 중요도 자동 판정 시스템 테스트")
     print("=" * 60)
@@ -12,6 +12,7 @@ import logging
 from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 
@@ -82,12 +83,18 @@ except ImportError:
         def save_conversation(self, *args, **kwargs):
             return 1
 
+        def save_conversations_bulk(self, project_id, conversations):
+            return list(range(1, len(conversations) + 1))
+
         def search_conversations(self, *args, **kwargs):
             return []
 
         def get_conversation_stats(self, *args, **kwargs):
             return {}
 
+    def get_memory_system():
+        return MemorySystem()
+
 
 # Pydantic 모델들
 class ConversationSave(BaseModel):
@@ -102,6 +109,11 @@ class ConversationSave(BaseModel):
     project_path: Optional[str] = None
 
 
+class ConversationBulkSave(BaseModel):
+    conversations: List[ConversationSave]
+    project_path: Optional[str] = None
+
+
 class ConversationSearch(BaseModel):
     query: Optional[str] = None
     importance_min: Optional[int] = None
@@ -120,6 +132,10 @@ class MemorySync(BaseModel):
     batch_size: int = 64
 
 
+# 대량 저장 요청당 최대 대화 수
+MEMORY_BULK_MAX_CONVERSATIONS = int(os.getenv("MEMORY_BULK_MAX_CONVERSATIONS", "50000"))
+
+
 # FastAPI 앱 생성
 memory_app = FastAPI(
     title="AI Memory API",
@@ -257,6 +273,43 @@ async def save_conversation(conversation: ConversationSave):
         raise HTTPException(status_code=500, detail=f"Error saving conversation: {e}")
 
 
+@memory_app.post("/v1/memory/conversations/bulk")
+async def save_conversations_bulk(bulk: ConversationBulkSave):
+    """대화 대량 저장 (이력 마이그레이션/재생용, 한 트랜잭션, 요청 순서대로 ID 반환)"""
+    if len(bulk.conversations) > MEMORY_BULK_MAX_CONVERSATIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MEMORY_BULK_MAX_CONVERSATIONS} conversations per request",
+        )
+    try:
+        project_id = os.getenv("DEFAULT_PROJECT_ID") or memory_system.get_project_id(
+            bulk.project_path
+        )
+
+        # 항목별 project_path는 무시 (요청 단위 프로젝트)
+        conversation_ids = await run_in_threadpool(
+            memory_system.save_conversations_bulk,
+            project_id,
+            [c.model_dump(exclude={"project_path"}) for c in bulk.conversations],
+        )
+
+        if conversation_ids is None:
+            raise HTTPException(status_code=500, detail="Failed to save conversations")
+
+        return {
+            "success": True,
+            "conversation_ids": conversation_ids,
+            "count": len(conversation_ids),
+            "project_id": project_id,
+            "message": f"{len(conversation_ids)} conversations saved successfully",
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving conversations: {e}")
+
+
 @memory_app.post("/v1/memory/conversations/search")
 async def search_conversations(search: ConversationSearch):
     """대화 검색"""
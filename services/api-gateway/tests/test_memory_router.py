@@ -413,6 +413,80 @@ def test_conversation_tags_as_list():
     print("✓ Conversation tags list test passed")
 
 
+# ============================================================================
+# Bulk Endpoint HTTP Tests (/v1/memory/conversations/bulk)
+# ============================================================================
+
+
+@pytest.fixture
+def gateway_memory(tmp_path, monkeypatch):
+    """memory_router app backed by a real MemorySystem in tmp_path"""
+    scripts_dir = os.path.join(os.path.dirname(__file__), "..", "..", "..", "scripts")
+    monkeypatch.syspath_prepend(os.path.abspath(scripts_dir))
+    monkeypatch.setenv("AI_MEMORY_DIR", str(tmp_path))
+    monkeypatch.delenv("DEFAULT_PROJECT_ID", raising=False)
+
+    import memory_router
+    from memory_system import MemorySystem as RealMemorySystem
+
+    monkeypatch.setattr(memory_router, "memory_system", RealMemorySystem(data_dir=str(tmp_path)))
+    return memory_router
+
+
+@pytest.mark.asyncio
+async def test_bulk_endpoint_returns_ids_in_request_order(gateway_memory):
+    """Bulk save returns one ID per conversation, in request order"""
+    conversations = [
+        {"user_query": f"Question {i}", "ai_response": f"Answer {i}", "tags": [f"t{i}"]}
+        for i in range(5)
+    ]
+    transport = ASGITransport(app=gateway_memory.memory_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/v1/memory/conversations/bulk",
+            json={"conversations": conversations, "project_path": "/tmp/bulk-project"},
+        )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 5
+    ids = body["conversation_ids"]
+    assert ids == sorted(ids) and len(set(ids)) == 5
+
+    with gateway_memory.memory_system.transaction(body["project_id"]) as conn:
+        placeholders = ",".join("?" * len(ids))
+        rows = conn.execute(
+            f"SELECT id, user_query FROM conversations WHERE id IN ({placeholders})", ids
+        ).fetchall()
+    queries = {row["id"]: row["user_query"] for row in rows}
+    assert [queries[i] for i in ids] == [c["user_query"] for c in conversations]
+
+
+@pytest.mark.asyncio
+async def test_bulk_endpoint_rejects_oversized_request(gateway_memory, monkeypatch):
+    """More than MEMORY_BULK_MAX_CONVERSATIONS → 413, nothing saved"""
+    monkeypatch.setattr(gateway_memory, "MEMORY_BULK_MAX_CONVERSATIONS", 2)
+    save = MagicMock(return_value=[7, 8])
+    monkeypatch.setattr(gateway_memory.memory_system, "save_conversations_bulk", save)
+
+    conversations = [{"user_query": "q", "ai_response": "a"}] * 3
+    transport = ASGITransport(app=gateway_memory.memory_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/v1/memory/conversations/bulk", json={"conversations": conversations}
+        )
+        assert response.status_code == 413
+        assert "At most 2" in response.json()["detail"]
+
+        ok = await client.post(
+            "/v1/memory/conversations/bulk", json={"conversations": conversations[:2]}
+        )
+        assert ok.status_code == 200
+        assert ok.json()["conversation_ids"] == [7, 8]
+
+    assert save.call_count == 1
+
+
 if __name__ == "__main__":
     import asyncio
 
@@ -1,8 +1,10 @@
 import os
 import threading
-from typing import List, Optional, Dict, Any
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Optional, Dict, Any, Tuple
 
-from fastapi import FastAPI, Body
+from fastapi import FastAPI, Body, HTTPException
 from pydantic import BaseModel
 from prometheus_fastapi_instrumentator import Instrumentator
 
@@ -14,12 +16,15 @@ Embedding Service (FastAPI + FastEmbed)
 - POST /embed  { "texts": ["...","..."] } -> { "embeddings": [[...],[...]] }
 - GET  /health -> 모델/차원/상태
 - POST /reload -> 모델 교체(옵션)
+- /embed의 "model"로 기본 모델 외 모델 지정 가능 (RAG 컬렉션 임베딩 모델 교체 중 이전/새 모델 병행)
 환경변수:
   EMBEDDING_MODEL        (기본: BAAI/bge-small-en-v1.5)
   EMBEDDING_BATCH_SIZE   (기본: 64)
   EMBEDDING_NORMALIZE    (기본: "true" → L2 normalize)
   FASTEMBED_CACHE        (기본: ~/.cache/fastembed)
   EMBEDDING_THREADS      (기본: 0 → auto)
+  EMBEDDING_EXTRA_MODELS (기본: 1 → 기본 모델 외 동시에 메모리에 두는 모델 수)
+  EMBEDDING_ALLOWED_MODELS (기본: 없음 → /embed "model"로 허용할 추가 모델, 쉼표 구분)
 """
 
 DEFAULT_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
@@ -36,6 +41,11 @@ NUM_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
 # 안전 제한 (OOM/타임아웃 방지)
 MAX_TEXTS = int(os.getenv("EMBEDDING_MAX_TEXTS", "1024"))
 MAX_CHARS = int(os.getenv("EMBEDDING_MAX_CHARS", "8000"))
+EXTRA_MODELS = int(os.getenv("EMBEDDING_EXTRA_MODELS", "1"))
+# 요청으로 지정 가능한 모델 (기본/현재 모델 외). 임의 모델 다운로드 방지
+ALLOWED_MODELS = {
+    m.strip() for m in os.getenv("EMBEDDING_ALLOWED_MODELS", "").split(",") if m.strip()
+}
 
 app = FastAPI(title="Embedding Service (FastEmbed)", version="1.0.0")
 
@@ -50,6 +60,11 @@ _model_name: str = DEFAULT_MODEL
 _model_dim: Optional[int] = None
 _model_loader: Optional[threading.Thread] = None
 _last_load_error: Optional[str] = None
+# 요청별 지정 모델 (name → (model, dim)), 최근 사용 순으로 EXTRA_MODELS개까지 유지
+_extra_models: "OrderedDict[str, Tuple[TextEmbedding, int]]" = OrderedDict()
+# 로딩 중인 추가 모델 (name → Future). 다운로드/로딩은 _extra_lock 밖에서 모델별로 진행
+_extra_loading: Dict[str, "Future[Tuple[TextEmbedding, int]]"] = {}
+_extra_lock = threading.Lock()
 
 
 def _load_model(model_name: str) -> TextEmbedding:
@@ -71,8 +86,63 @@ def _ensure_model() -> None:
             _model_dim = len(sample[0])
 
 
+def _get_model(model_name: Optional[str]) -> Tuple[TextEmbedding, str, int]:
+    """요청 모델 → (model, name, dim). 미지정/기본 모델이면 전역 모델"""
+    if not model_name or model_name == _model_name:
+        _ensure_model()
+        assert _model is not None
+        return _model, _model_name, _model_dim or 0
+    if model_name != DEFAULT_MODEL and model_name not in ALLOWED_MODELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Model '{model_name}' is not allowed (see EMBEDDING_ALLOWED_MODELS)",
+        )
+    if EXTRA_MODELS <= 0:
+        raise HTTPException(status_code=400, detail=f"Model '{model_name}' is not loaded")
+    try:
+        model, dim = _get_extra_model(model_name)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Failed to load model '{model_name}': {e}")
+    return model, model_name, dim
+
+
+def _get_extra_model(model_name: str) -> Tuple[TextEmbedding, int]:
+    """
+    추가 모델 조회/로딩. 같은 모델의 동시 요청은 첫 요청의 로딩을 기다리고,
+    다른 모델/기본 모델 요청은 로딩(다운로드)에 막히지 않음
+    """
+    with _extra_lock:
+        if model_name in _extra_models:
+            _extra_models.move_to_end(model_name)
+            return _extra_models[model_name]
+        future = _extra_loading.get(model_name)
+        loader = future is None
+        if loader:
+            future = _extra_loading[model_name] = Future()
+    if not loader:
+        return future.result()
+
+    try:
+        model = _load_model(model_name)
+        sample = list(model.embed(["dimension probe"], batch_size=1, normalize=NORMALIZE))
+        loaded = (model, len(sample[0]))
+    except Exception as e:
+        with _extra_lock:
+            del _extra_loading[model_name]
+        future.set_exception(e)
+        raise
+    with _extra_lock:
+        _extra_models[model_name] = loaded
+        while len(_extra_models) > EXTRA_MODELS:
+            _extra_models.popitem(last=False)
+        del _extra_loading[model_name]
+    future.set_result(loaded)
+    return loaded
+
+
 class EmbedRequest(BaseModel):
     texts: List[str]
+    model: Optional[str] = None  # 미지정 시 기본 모델
 
 
 class EmbedResponse(BaseModel):
@@ -125,6 +195,7 @@ def health():
         "normalize": NORMALIZE,
         "threads": NUM_THREADS,
         "loading": loader_alive,
+        "extra_models": list(_extra_models),
         "error": _last_load_error,
     }
 
@@ -143,18 +214,17 @@ def embed(req: EmbedRequest = Body(...)):
     # 항목별 길이 제한 (초과분 컷)
     safe_texts = [t[:MAX_CHARS] if t and len(t) > MAX_CHARS else (t or "") for t in req.texts]
 
-    _ensure_model()
-    assert _model is not None
+    model, model_name, model_dim = _get_model(req.model)
 
     # FastEmbed는 제너레이터 형태 -> 리스트로 수집
-    vecs = list(_model.embed(safe_texts, batch_size=BATCH_SIZE, normalize=NORMALIZE))
+    vecs = list(model.embed(safe_texts, batch_size=BATCH_SIZE, normalize=NORMALIZE))
     # 안전: float 변환
     out = [list(map(float, v)) for v in vecs]
 
     return EmbedResponse(
         embeddings=out,
-        model=_model_name,
-        dim=_model_dim or len(out[0]),
+        model=model_name,
+        dim=model_dim or len(out[0]),
         normalize=NORMALIZE,
     )
 
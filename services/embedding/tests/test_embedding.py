@@ -541,3 +541,88 @@ async def test_health_after_successful_embedding(app_with_mocks):
         assert data["ok"] is True
         assert data["dim"] == 384
         assert "model" in data
+
+
+@pytest.mark.asyncio
+async def test_embed_with_requested_model_keeps_default(app_with_mocks):
+    """A per-request model is loaded alongside the default model, which stays active"""
+    transport = ASGITransport(app=app_with_mocks)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        with (
+            patch("app._load_model") as mock_load,
+            patch.object(embedding_app_module, "ALLOWED_MODELS", {"BAAI/bge-base-en-v1.5"}),
+        ):
+            other = MagicMock()
+            other.embed = lambda texts, **kwargs: [[0.2] * 768 for _ in texts]
+            mock_load.return_value = other
+            try:
+                response = await client.post(
+                    "/embed", json={"texts": ["a", "b"], "model": "BAAI/bge-base-en-v1.5"}
+                )
+                assert response.status_code == 200
+                data = response.json()
+                assert data["model"] == "BAAI/bge-base-en-v1.5"
+                assert data["dim"] == 768 and len(data["embeddings"][0]) == 768
+
+                # 두 번째 요청은 다시 로드하지 않음, 기본 모델은 그대로
+                await client.post("/embed", json={"texts": ["c"], "model": "BAAI/bge-base-en-v1.5"})
+                assert mock_load.call_count == 1
+                default = (await client.post("/embed", json={"texts": ["d"]})).json()
+                assert default["model"] == "BAAI/bge-small-en-v1.5" and default["dim"] == 384
+            finally:
+                embedding_app_module._extra_models.clear()
+
+
+@pytest.mark.asyncio
+async def test_embed_rejects_models_outside_allowlist(app_with_mocks):
+    """Unknown model names are rejected with 400 before anything is downloaded"""
+    transport = ASGITransport(app=app_with_mocks)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        with patch("app._load_model") as mock_load:
+            response = await client.post(
+                "/embed", json={"texts": ["a"], "model": "someone/huge-model"}
+            )
+    assert response.status_code == 400
+    assert "not allowed" in response.json()["detail"]
+    mock_load.assert_not_called()
+
+
+def test_extra_model_load_does_not_block_other_requests(app_with_mocks):
+    """A slow extra-model download holds no global lock; concurrent callers share one load"""
+    import threading
+
+    release = threading.Event()
+    other = MagicMock()
+    other.embed = lambda texts, **kwargs: [[0.2] * 768 for _ in texts]
+
+    def slow_load(name):
+        release.wait(5)
+        return other
+
+    with (
+        patch("app._load_model", side_effect=slow_load) as mock_load,
+        patch.object(embedding_app_module, "ALLOWED_MODELS", {"BAAI/bge-base-en-v1.5"}),
+    ):
+        try:
+            results = []
+            loaders = [
+                threading.Thread(
+                    target=lambda: results.append(
+                        embedding_app_module._get_model("BAAI/bge-base-en-v1.5")
+                    )
+                )
+                for _ in range(2)
+            ]
+            for t in loaders:
+                t.start()
+            # 로딩 중에도 기본 모델 요청은 바로 처리되고 전역 lock은 비어 있음
+            assert embedding_app_module._get_model(None)[2] == 384
+            assert not embedding_app_module._model_lock.locked()
+            release.set()
+            for t in loaders:
+                t.join(5)
+            assert [r[2] for r in results] == [768, 768]
+            assert mock_load.call_count == 1
+        finally:
+            release.set()
+            embedding_app_module._extra_models.clear()
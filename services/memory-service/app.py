@@ -5,6 +5,7 @@ Provides OpenAI-compatible memory endpoints for conversation storage and retriev
 
 from fastapi import FastAPI, HTTPException, Query, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 import os
@@ -36,6 +37,9 @@ app.add_middleware(
 # Initialize memory system
 memory_system = MemorySystem(data_dir=os.getenv("MEMORY_DATA_DIR", "/mnt/e/ai-data/memory"))
 
+# Maximum conversations per bulk request
+MEMORY_BULK_MAX_CONVERSATIONS = int(os.getenv("MEMORY_BULK_MAX_CONVERSATIONS", "50000"))
+
 
 # Pydantic models
 class ConversationCreate(BaseModel):
@@ -50,6 +54,29 @@ class ConversationCreate(BaseModel):
     context: Optional[Dict[str, Any]] = Field(None, description="Additional context")
 
 
+class ConversationBulkItem(BaseModel):
+    user_query: str = Field(..., description="User's question or prompt")
+    ai_response: str = Field(..., description="AI's response")
+    model_used: Optional[str] = Field(None, description="Model used for response")
+    session_id: Optional[str] = Field(None, description="Session ID for grouping")
+    response_time_ms: Optional[int] = Field(None, description="Response time in milliseconds")
+    token_count: Optional[int] = Field(None, description="Token count")
+    tags: Optional[List[str]] = Field(None, description="Tags for categorization")
+    context: Optional[Dict[str, Any]] = Field(None, description="Additional context")
+
+
+class ConversationBulkCreate(BaseModel):
+    conversations: List[ConversationBulkItem] = Field(..., description="Conversations to save")
+    project_path: Optional[str] = Field(None, description="Project path for project ID")
+
+
+class ConversationBulkResponse(BaseModel):
+    conversation_ids: List[int]
+    project_id: str
+    count: int
+    success: bool = True
+
+
 class ConversationResponse(BaseModel):
     conversation_id: int
     project_id: str
@@ -166,6 +193,48 @@ async def create_conversation(conversation: ConversationCreate, background_tasks
         raise HTTPException(status_code=500, detail=f"Error saving conversation: {str(e)}")
 
 
+@app.post("/v1/memory/conversations/bulk", response_model=ConversationBulkResponse)
+async def create_conversations_bulk(
+    bulk: ConversationBulkCreate, background_tasks: BackgroundTasks
+):
+    """
+    Save many conversations in one transaction (history migration / replay)
+    Returns conversation IDs in request order
+    """
+    if len(bulk.conversations) > MEMORY_BULK_MAX_CONVERSATIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MEMORY_BULK_MAX_CONVERSATIONS} conversations per request",
+        )
+    try:
+        if bulk.project_path:
+            project_id = memory_system.get_project_id(bulk.project_path)
+        else:
+            project_id = memory_system.get_project_id()
+
+        conversation_ids = await run_in_threadpool(
+            memory_system.save_conversations_bulk,
+            project_id,
+            [c.model_dump() for c in bulk.conversations],
+        )
+        if conversation_ids is None:
+            raise HTTPException(status_code=500, detail="Failed to save conversations")
+
+        if conversation_ids:
+            background_tasks.add_task(process_embeddings_background, project_id)
+
+        return ConversationBulkResponse(
+            conversation_ids=conversation_ids,
+            project_id=project_id,
+            count=len(conversation_ids),
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving conversations: {str(e)}")
+
+
 @app.post("/v1/memory/search")
 async def search_conversations(search: SearchQuery):
     """
@@ -312,7 +381,7 @@ async def list_projects():
 
 @app.post("/v1/memory/optimize")
 async def optimize_database(project_path: Optional[str] = Query(None)):
-    """Optimize database (VACUUM, ANALYZE)"""
+    """Optimize database (incremental vacuum, WAL checkpoint, PRAGMA optimize)"""
     try:
         if project_path:
             project_id = memory_system.get_project_id(project_path)
@@ -331,6 +400,16 @@ async def optimize_database(project_path: Optional[str] = Query(None)):
         raise HTTPException(status_code=500, detail=f"Optimization error: {str(e)}")
 
 
+@app.get("/v1/memory/maintenance")
+async def maintenance_progress(project_path: Optional[str] = Query(None)):
+    """Progress of the incremental database maintenance (batched deletes, incremental vacuum)"""
+    if project_path:
+        project_id = memory_system.get_project_id(project_path)
+    else:
+        project_id = memory_system.get_project_id()
+    return memory_system.get_maintenance_progress(project_id)
+
+
 @app.get("/v1/memory/conversation/{conversation_id}")
 async def get_conversation(conversation_id: int, project_path: Optional[str] = Query(None)):
     """Get a specific conversation by ID"""
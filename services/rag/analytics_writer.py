@@ -0,0 +1,206 @@
+"""
+RAG Analytics Writer
+- /query 요청 경로에서 SQLite 쓰기를 제거하기 위한 비동기 배치 writer
+- 인메모리 큐 → 백그라운드 스레드가 executemany로 일괄 기록
+- 문서 접근 카운트는 doc_id별로 합산 후 한 번에 반영
+- 큐가 가득 차면 응답을 막지 않고 드롭(카운터로 노출)
+- 종류(검색 로그/캐시/접근 카운트)별로 따로 커밋, 배치가 실패하면 행 단위로 재시도해 문제 행만 버림(lost)
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SEARCH = "search"
+_CACHE = "cache"
+_ACCESS = "access"
+
+
+class AnalyticsWriter:
+    """RAGDatabase 분석/캐시 쓰기를 백그라운드에서 배치 처리"""
+
+    def __init__(
+        self,
+        database,
+        max_queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+    ):
+        self.db = database
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Tuple[str, Any]]" = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        # 통계
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.flushes = 0
+        self.errors = 0
+        self.lost = 0
+        self.last_flush_at: Optional[float] = None
+
+    # -------- Lifecycle --------
+    def start(self):
+        """백그라운드 writer 스레드 시작 (이미 실행 중이면 무시)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="rag-analytics-writer", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """스레드 종료 후 남은 항목을 모두 기록 (shutdown 시 호출)"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        self._stop.set()
+        if thread is not None:
+            thread.join(timeout=timeout)
+        self.flush()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # -------- Enqueue API (요청 경로에서 호출, 절대 블로킹하지 않음) --------
+    def log_search(self, **row) -> bool:
+        return self._put(_SEARCH, row)
+
+    def cache_query(
+        self,
+        query: str,
+        collection: str,
+        response: str,
+        context_data: List[Dict],
+        ttl_hours: int = 24,
+    ) -> bool:
+        return self._put(
+            _CACHE,
+            {
+                "query": query,
+                "collection": collection,
+                "response": response,
+                "context_data": context_data,
+                "ttl_hours": ttl_hours,
+            },
+        )
+
+    def track_document_access(self, doc_id: str) -> bool:
+        return self._put(_ACCESS, doc_id)
+
+    def _put(self, kind: str, item: Any) -> bool:
+        if not self.running:
+            self.start()
+        try:
+            self._queue.put_nowait((kind, item))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    # -------- Drain --------
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                self._write(batch)
+
+    def _drain(self, block: bool) -> List[Tuple[str, Any]]:
+        batch: List[Tuple[str, Any]] = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def flush(self) -> int:
+        """큐에 남은 항목을 현재 스레드에서 즉시 기록"""
+        total = 0
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return total
+            self._write(batch)
+            total += len(batch)
+
+    def _write(self, batch: List[Tuple[str, Any]]):
+        searches: List[Dict[str, Any]] = []
+        caches: List[Dict[str, Any]] = []
+        access: Counter = Counter()
+        for kind, item in batch:
+            if kind == _SEARCH:
+                searches.append(item)
+            elif kind == _CACHE:
+                caches.append(item)
+            elif kind == _ACCESS:
+                access[item] += 1
+
+        with self._flush_lock:
+            try:
+                # 캐시를 먼저 기록해 동일 질의의 재계산 창을 최소화
+                self._write_group(_CACHE, self.db.cache_queries_bulk, caches, [1] * len(caches))
+                self._write_group(_SEARCH, self.db.log_searches_bulk, searches, [1] * len(searches))
+                self._write_group(
+                    _ACCESS,
+                    lambda rows: self.db.track_document_access_bulk(dict(rows)),
+                    list(access.items()),
+                    list(access.values()),
+                )
+            finally:
+                self.flushes += 1
+                self.last_flush_at = time.time()
+
+    def _write_group(
+        self, kind: str, write: Callable[[List[Any]], Any], rows: List[Any], weights: List[int]
+    ):
+        """한 종류를 한 트랜잭션으로 기록, 실패하면 행 단위로 재시도 (weights: 행별 항목 수)"""
+        if not rows:
+            return
+        try:
+            write(rows)
+            self.written += sum(weights)
+            return
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Analytics {kind} batch write failed ({len(rows)} rows): {e}")
+
+        for row, weight in zip(rows, weights):
+            try:
+                write([row])
+                self.written += weight
+            except Exception as e:
+                # 분석 데이터 유실은 허용, 서비스는 계속
+                self.lost += weight
+                logger.warning(f"Dropped analytics {kind} row: {e}")
+
+    # -------- Stats --------
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "errors": self.errors,
+            "lost": self.lost,
+            "last_flush_at": self.last_flush_at,
+        }
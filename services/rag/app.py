@@ -1,18 +1,27 @@
 import os
 import glob
+import json
 import math
-import re
 import time
+import asyncio
 import hashlib
 import logging
-from typing import List, Optional, Dict, Any, Tuple
+import posixpath
+import tempfile
+import unicodedata
+from contextlib import aclosing, contextmanager
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Dict, Any, Set, Tuple
 
 import httpx
-from fastapi import FastAPI, Query
-from pydantic import BaseModel
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qmodels
 from prometheus_fastapi_instrumentator import Instrumentator
+from prometheus_client import Gauge
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -21,6 +30,35 @@ from tenacity import (
 )
 
 from database import db
+from analytics_writer import AnalyticsWriter
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from chunk_store import ChunkStore
+from llm_limiter import ConcurrencyLimiter, LimiterFull, SingleFlight
+from deadline import (
+    DEADLINE_HEADER,
+    DEADLINE_STAGES,
+    Deadline,
+    DeadlineExceeded,
+    current_deadline,
+    misses as deadline_misses,
+    record_miss,
+    stage_timeout,
+    stop_before_deadline,
+)
+from collection_profiles import (
+    PROFILES,
+    CollectionProfile,
+    create_collection_kwargs,
+    get_profile,
+    search_params,
+    update_collection_kwargs,
+)
+from token_counter import TokenCounter
+from context_selection import merge_adjacent, select_context
+from cache_warmup import CacheWarmup
+from health_prober import HealthProber
+from embedding_migration import EmbeddingMigration, shadow_collection_name
+from snapshot import SnapshotError, SnapshotReader, SnapshotWriter
 
 
 logger = logging.getLogger(__name__)
@@ -50,17 +88,107 @@ RAG_TOPK = int(os.getenv("RAG_TOPK", "4"))
 RAG_CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", "512"))
 RAG_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "100"))
 
+# 토크나이저 (청크/컨텍스트 예산을 실제 토큰으로 계산)
+# - RAG_EMBED_TOKENIZER: 임베딩 모델 토크나이저 (HF ID 또는 tokenizer.json 경로)
+# - RAG_CHAT_TOKENIZER: 채팅 모델 토크나이저 (미설정 시 근사치)
+RAG_EMBED_TOKENIZER = os.getenv(
+    "RAG_EMBED_TOKENIZER", os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+)
+RAG_CHAT_TOKENIZER = os.getenv("RAG_CHAT_TOKENIZER", "")
+RAG_EMBED_MAX_TOKENS = int(os.getenv("RAG_EMBED_MAX_TOKENS", "512"))
+
+# Hybrid retrieval (BM25 + dense, reciprocal-rank fusion)
+RAG_HYBRID_ENABLED = os.getenv("RAG_HYBRID_ENABLED", "true").lower() == "true"
+RAG_HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))
+RAG_DENSE_WEIGHT = float(os.getenv("RAG_DENSE_WEIGHT", "1.0"))
+RAG_LEXICAL_WEIGHT = float(os.getenv("RAG_LEXICAL_WEIGHT", "1.0"))
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+
+# 컨텍스트 선택: topk × OVERFETCH 후보 → score-gap cutoff → MMR → 인접 청크 병합
+RAG_CONTEXT_SELECTION = os.getenv("RAG_CONTEXT_SELECTION", "true").lower() == "true"
+RAG_CONTEXT_OVERFETCH = int(os.getenv("RAG_CONTEXT_OVERFETCH", "3"))
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))  # 1이면 관련도만, 0이면 다양성만
+RAG_MIN_RELATIVE_SCORE = float(os.getenv("RAG_MIN_RELATIVE_SCORE", "0.3"))  # 최고 점수 대비
+# 선택된 hit을 앞뒤 N개 이웃 청크로 확장 (chunk store 조회만, 컨텍스트 토큰 예산 안에서)
+RAG_NEIGHBOR_WINDOW = int(os.getenv("RAG_NEIGHBOR_WINDOW", "1"))
+
+# 임베딩 모델: 컬렉션별로 (모델, 차원, 실제 Qdrant 컬렉션)을 기록
+# 설정이 바뀌면 shadow 컬렉션에 재임베딩한 뒤 alias 교체 (그 전까지 질의는 이전 컬렉션/모델)
+RAG_EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+RAG_EMBED_MIGRATION_AUTO = os.getenv("RAG_EMBED_MIGRATION_AUTO", "true").lower() == "true"
+RAG_EMBED_MIGRATION_PAGE = int(os.getenv("RAG_EMBED_MIGRATION_PAGE", "256"))
+# alias 교체 후 이전 컬렉션 삭제까지 대기 (진행 중 질의 보호, 음수면 삭제하지 않음)
+RAG_EMBED_MIGRATION_DROP_DELAY = float(os.getenv("RAG_EMBED_MIGRATION_DROP_DELAY", "60"))
+# Qdrant alias 재확인 주기 (다른 replica의 교체 반영, DROP_DELAY보다 짧게, 0이면 끔)
+RAG_ALIAS_REFRESH_INTERVAL = float(os.getenv("RAG_ALIAS_REFRESH_INTERVAL", "10"))
+
+# 새 컬렉션 튜닝 프로파일 (latency / balanced / memory, 빈 값이면 Qdrant 기본값)
+RAG_COLLECTION_PROFILE = os.getenv("RAG_COLLECTION_PROFILE", "")
+
+# Batch query (/query/batch)
+RAG_BATCH_MAX_QUERIES = int(os.getenv("RAG_BATCH_MAX_QUERIES", "10000"))
+RAG_BATCH_WINDOW = int(os.getenv("RAG_BATCH_WINDOW", "256"))  # 임베딩/검색 1회당 질의 수
+RAG_BATCH_CONCURRENCY = int(os.getenv("RAG_BATCH_CONCURRENCY", "4"))
+
+# 프롬프트 레이아웃: prefix_stable(시스템 블록 → 정렬된 컨텍스트 → 질문) | classic(질문 먼저)
+# prefix_stable은 같은 문서에 대한 후속 질문에서 llama.cpp KV prompt cache 재사용
+RAG_PROMPT_LAYOUT = os.getenv("RAG_PROMPT_LAYOUT", "prefix_stable")
+RAG_LLM_CACHE_PROMPT = os.getenv("RAG_LLM_CACHE_PROMPT", "true").lower() == "true"
+# llama.cpp --parallel 슬롯 수 (>0이면 컨텍스트 집합별로 같은 슬롯 id_slot 힌트 전달)
+RAG_LLM_SLOTS = int(os.getenv("RAG_LLM_SLOTS", "0"))
+
+# LLM 동시 호출 제한 (대기열이 차거나 대기 시간 초과 시 503)
+RAG_LLM_MAX_CONCURRENCY = int(os.getenv("RAG_LLM_MAX_CONCURRENCY", "4"))
+RAG_LLM_MAX_QUEUE = int(os.getenv("RAG_LLM_MAX_QUEUE", "32"))
+RAG_LLM_QUEUE_TIMEOUT = float(os.getenv("RAG_LLM_QUEUE_TIMEOUT", "30"))
+
+# Deadline 전파 (X-Request-Deadline-Ms): 남은 시간 중 단계별 상한 비율
+RAG_DEADLINE_EMBED_SHARE = float(os.getenv("RAG_DEADLINE_EMBED_SHARE", "0.25"))
+RAG_DEADLINE_SEARCH_SHARE = float(os.getenv("RAG_DEADLINE_SEARCH_SHARE", "0.5"))
+# LLM에 남은 시간이 이보다 적으면 호출하지 않고 컨텍스트만 반환 (degraded)
+RAG_DEADLINE_LLM_MIN_MS = float(os.getenv("RAG_DEADLINE_LLM_MIN_MS", "500"))
+# 응답 직렬화/전송용 예약 시간
+RAG_DEADLINE_RESERVE_MS = float(os.getenv("RAG_DEADLINE_RESERVE_MS", "50"))
+
 # Qdrant Retry Configuration (Issue #14)
 QDRANT_MAX_RETRIES = int(os.getenv("QDRANT_MAX_RETRIES", "3"))
 QDRANT_RETRY_MIN_WAIT = int(os.getenv("QDRANT_RETRY_MIN_WAIT", "2"))
 QDRANT_RETRY_MAX_WAIT = int(os.getenv("QDRANT_RETRY_MAX_WAIT", "10"))
 
+# Analytics writer (요청 경로 밖에서 배치 기록)
+RAG_ANALYTICS_QUEUE_SIZE = int(os.getenv("RAG_ANALYTICS_QUEUE_SIZE", "10000"))
+RAG_ANALYTICS_BATCH_SIZE = int(os.getenv("RAG_ANALYTICS_BATCH_SIZE", "500"))
+RAG_ANALYTICS_FLUSH_INTERVAL = float(os.getenv("RAG_ANALYTICS_FLUSH_INTERVAL", "1.0"))
+# 답변 캐시 TTL (캐시 키에 컬렉션 색인 버전 포함 → 재색인 시 자동 무효화)
+RAG_CACHE_TTL_HOURS = float(os.getenv("RAG_CACHE_TTL_HOURS", "168"))
+# 재색인 후 캐시 warm-up: RAG_WARMUP_DELAY초 뒤 최근 RAG_WARMUP_HOURS시간 상위 N개 질의를 미리 답변
+# (사용자 LLM 호출이 없을 때만 1개씩, DELAY < 0 또는 TOP_N = 0이면 비활성)
+RAG_WARMUP_TOP_N = int(os.getenv("RAG_WARMUP_TOP_N", "20"))
+RAG_WARMUP_HOURS = int(os.getenv("RAG_WARMUP_HOURS", "168"))
+RAG_WARMUP_DELAY = float(os.getenv("RAG_WARMUP_DELAY", "60"))
+# search_logs → 시간별 rollup 주기 (초, 0이면 비활성)
+RAG_ROLLUP_INTERVAL = float(os.getenv("RAG_ROLLUP_INTERVAL", "60"))
+RAG_ROLLUP_BATCH_SIZE = int(os.getenv("RAG_ROLLUP_BATCH_SIZE", "50000"))
+# 분석 DB 유지보수 주기 (초, 0이면 비활성): 배치 삭제 + incremental_vacuum + WAL 체크포인트
+RAG_MAINTENANCE_INTERVAL = float(os.getenv("RAG_MAINTENANCE_INTERVAL", "3600"))
+# 의존성 헬스 백그라운드 점검 주기 (초, 0이면 /health마다 즉시 점검), 실패 시 간격을 최대 BACKOFF까지 2배씩
+RAG_HEALTH_INTERVAL = float(os.getenv("RAG_HEALTH_INTERVAL", "10"))
+RAG_HEALTH_MAX_BACKOFF = float(os.getenv("RAG_HEALTH_MAX_BACKOFF", "120"))
+RAG_HEALTH_TIMEOUT = float(os.getenv("RAG_HEALTH_TIMEOUT", "5"))
+# 컬렉션 스냅샷 export/import (import는 임베딩 없이 벡터를 그대로 병렬 upsert)
+RAG_SNAPSHOT_DIR = os.getenv(
+    "RAG_SNAPSHOT_DIR", ""
+)  # ?path= import 허용 디렉토리 (비우면 업로드만)
+RAG_SNAPSHOT_PAGE = int(os.getenv("RAG_SNAPSHOT_PAGE", "1024"))  # export scroll 페이지
+RAG_SNAPSHOT_BATCH = int(os.getenv("RAG_SNAPSHOT_BATCH", "512"))  # import upsert 배치
+RAG_SNAPSHOT_PARALLEL = int(os.getenv("RAG_SNAPSHOT_PARALLEL", "4"))  # 동시 upsert 배치 수
+
 DOCUMENTS_DIR = os.getenv("DOCUMENTS_DIR", "./documents")
 COLLECTION_DEFAULT = os.getenv("RAG_DEFAULT_COLLECTION", "myproj")
 # Global filesystem support
 HOST_ROOT = "/mnt/host"
 
-# 게이트웨이 스트리밍은 클라이언트에서 설정, 여기서는 비스트림 기본
+# /query는 비스트림, /query/stream은 게이트웨이 SSE를 그대로 중계
 OPENAI_CHAT_COMPLETIONS = f"{RAG_LLM_API_BASE}/chat/completions"
 
 # -------- FastAPI --------
@@ -72,18 +200,125 @@ Instrumentator().instrument(app).expose(app)
 # -------- Globals --------
 qdrant: Optional[QdrantClient] = None
 EMBED_DIM: Optional[int] = None
+lexical = LexicalIndex()
+chunk_store = ChunkStore()
+embed_tokens = TokenCounter(RAG_EMBED_TOKENIZER)
+chat_tokens = TokenCounter(RAG_CHAT_TOKENIZER or None)
+analytics = AnalyticsWriter(
+    db,
+    max_queue_size=RAG_ANALYTICS_QUEUE_SIZE,
+    batch_size=RAG_ANALYTICS_BATCH_SIZE,
+    flush_interval=RAG_ANALYTICS_FLUSH_INTERVAL,
+)
+
+llm_limiter = ConcurrencyLimiter(
+    RAG_LLM_MAX_CONCURRENCY, RAG_LLM_MAX_QUEUE, wait_timeout=RAG_LLM_QUEUE_TIMEOUT
+)
+# 같은 캐시 키의 동시 질의는 생성 1회 공유 (writer flush 전까지 결과 유지)
+llm_flights = SingleFlight(linger=RAG_ANALYTICS_FLUSH_INTERVAL * 2)
+
+cache_warmup = CacheWarmup(
+    top_queries=lambda col: db.get_top_queries(col, RAG_WARMUP_HOURS, RAG_WARMUP_TOP_N),
+    warm=lambda q, cols: _warm_answer(q, cols),
+    # 낮은 우선순위: 사용자 LLM 호출이 진행/대기 중이면 양보
+    idle=lambda: llm_limiter.in_flight == 0 and llm_limiter.waiting == 0,
+    delay=RAG_WARMUP_DELAY if RAG_WARMUP_TOP_N > 0 else -1,
+)
+
+health_prober = HealthProber(
+    probes={
+        "qdrant": lambda: _probe_qdrant(),
+        "embedding": lambda: _probe_embedding(),
+        "api_gateway": lambda: _probe_gateway(),
+    },
+    interval=RAG_HEALTH_INTERVAL,
+    max_backoff=RAG_HEALTH_MAX_BACKOFF,
+    timeout=RAG_HEALTH_TIMEOUT,
+)
+
+Gauge("rag_llm_in_flight", "LLM calls in progress").set_function(lambda: llm_limiter.in_flight)
+Gauge("rag_llm_waiting", "LLM calls waiting for a slot").set_function(lambda: llm_limiter.waiting)
+Gauge("rag_llm_rejected_total", "LLM calls rejected on full queue").set_function(
+    lambda: llm_limiter.rejected
+)
+Gauge("rag_query_coalesced_total", "Queries served by a shared in-flight answer").set_function(
+    lambda: llm_flights.coalesced
+)
+
+_deadline_miss_gauge = Gauge(
+    "rag_deadline_miss_total", "Requests that ran out of deadline budget", ["stage"]
+)
+for _stage in DEADLINE_STAGES:
+    _deadline_miss_gauge.labels(stage=_stage).set_function(lambda s=_stage: deadline_misses[s])
+
+Gauge("rag_analytics_queue_depth", "Pending analytics writes").set_function(
+    lambda: analytics.stats()["queue_depth"]
+)
+Gauge("rag_analytics_dropped_total", "Analytics writes dropped on full queue").set_function(
+    lambda: analytics.dropped
+)
 
 
 # -------- Models --------
 class IndexResponse(BaseModel):
     collection: str
     chunks: int
+    # 정규화 텍스트가 같은 청크는 한 번만 임베딩/저장 (dedup_ratio: 중복으로 생략한 청크 비율)
+    unique_chunks: int = 0
+    dedup_ratio: float = 0.0
+
+
+class QueryFilter(BaseModel):
+    # Qdrant payload 인덱스로 검색 단계에서 적용되는 필터
+    path_prefix: Optional[str] = Field(None, description="디렉토리 경로 prefix")
+    extensions: Optional[List[str]] = Field(None, max_length=32, description='예: ["md", "txt"]')
+    modified_after: Optional[float] = Field(None, description="mtime 하한 (epoch seconds)")
+    modified_before: Optional[float] = Field(None, description="mtime 상한 (epoch seconds)")
+
+
+class RetrievalOptions(BaseModel):
+    # Hybrid retrieval 옵션 (None이면 환경변수 기본값)
+    hybrid: Optional[bool] = None
+    dense_weight: Optional[float] = Field(None, ge=0)
+    lexical_weight: Optional[float] = Field(None, ge=0)
+    candidates: Optional[int] = Field(None, ge=1, le=200)
+    # HNSW 검색 override (None이면 컬렉션 프로파일 기본값)
+    hnsw_ef: Optional[int] = Field(None, ge=1, le=4096)
+    exact: Optional[bool] = None
+    filter: Optional[QueryFilter] = None
+    # 컨텍스트 선택 override (None이면 환경변수 기본값)
+    select_context: Optional[bool] = None
+    mmr_lambda: Optional[float] = Field(None, ge=0, le=1)
+    min_relative_score: Optional[float] = Field(None, ge=0, le=1)
+    neighbors: Optional[int] = Field(None, ge=0, le=8, description="hit 앞뒤로 붙일 청크 수")
+
+
+class QueryRequest(RetrievalOptions):
+    query: str
+    collection: Optional[str] = None
+    topk: Optional[int] = None
+    # 여러 컬렉션 동시 검색 (지정 시 collection 대신 사용)
+    collections: Optional[List[str]] = Field(None, min_length=1, max_length=16)
 
 
-class QueryRequest(BaseModel):
-    query: str
+class BatchQueryRequest(RetrievalOptions):
+    queries: List[str] = Field(..., min_length=1, max_length=RAG_BATCH_MAX_QUERIES)
     collection: Optional[str] = None
     topk: Optional[int] = None
+    concurrency: Optional[int] = Field(None, ge=1, le=64, description="동시 LLM 호출 수")
+    use_cache: bool = True
+
+
+class SearchRequest(QueryRequest):
+    # 컨텍스트 패킹 예산 (None이면 /query와 같은 CONTEXT_TOKEN_BUDGET)
+    budget: Optional[int] = Field(None, ge=1, le=32768, description="반환할 청크 토큰 예산")
+
+
+class SearchResponse(BaseModel):
+    results: List[Dict[str, Any]]
+    usage: Dict[str, Any]
+    cached: Optional[bool] = False
+    response_time_ms: Optional[int] = None
 
 
 class QueryResponse(BaseModel):
@@ -92,6 +327,8 @@ class QueryResponse(BaseModel):
     usage: Dict[str, Any]
     cached: Optional[bool] = False
     response_time_ms: Optional[int] = None
+    # deadline 안에 답변을 만들지 못해 검색 컨텍스트(원문 포함)만 반환
+    degraded: Optional[bool] = False
 
 
 class AnalyticsResponse(BaseModel):
@@ -104,68 +341,73 @@ class AnalyticsResponse(BaseModel):
 
 
 # -------- Utils --------
-def _approx_tokens(text: str) -> int:
-    # 매우 러프한 토큰 근사(영문/한글 혼용 환경에서 대략 단어당 1~2토큰 가정)
-    # chunk size는 "토큰" 기준으로 쓰지만 실제론 단어 수로 근사
-    return max(1, math.ceil(len(text) / 4))  # 대강 4문자 ≈ 1토큰
-
-
-# 한국어 문장 분할기 (품질 향상)
-_SENT_SPLIT = re.compile(r"(?<=[.!?])\s+|(?<=\n)\s*")
+def _embed_request(texts: List[str], model: Optional[str]) -> Dict[str, Any]:
+    # 임베딩 서비스 규약: POST /embed  { "texts": ["..."] } -> { "embeddings": [[...]] }
+    # 설정된 모델과 다른 모델로 색인된 컬렉션은 "model" 지정 (alias 교체 전 이전 모델)
+    if model and model != RAG_EMBEDDING_MODEL:
+        return {"texts": texts, "model": model}
+    return {"texts": texts}
 
 
-def _split_sentences_ko(text: str, max_chars: int = 400) -> List[str]:
-    """
-    한국어 문장 분할 (간단 버전)
-    매우 단순: 문장 구분자 기준 → 너무 길면 다시 고정폭 슬라이스
-    """
-    parts = [p.strip() for p in _SENT_SPLIT.split(text) if p.strip()]
-    out, buf = [], ""
-    for p in parts:
-        if len(buf) + len(p) + 1 <= max_chars:
-            buf = (buf + " " + p).strip()
-        else:
-            if buf:
-                out.append(buf)
-            buf = p if len(p) <= max_chars else p[:max_chars]
-    if buf:
-        out.append(buf)
-    return out
+def _embed_result(data: Dict[str, Any], request: Dict[str, Any]) -> List[List[float]]:
+    if "model" in request and data.get("model") not in (None, request["model"]):
+        raise RuntimeError(
+            f"Embedding service returned {data.get('model')} instead of {request['model']}"
+        )
+    return data["embeddings"]
 
 
-def _sliding_chunks(text: str, chunk_tokens: int, overlap_tokens: int) -> List[str]:
-    words = text.split()
-    # 단어 수 기준으로 근사 변환
-    # (chunk_tokens ~ 단어수로 취급)
-    size = max(8, chunk_tokens)  # 안전 하한
-    step = max(1, size - overlap_tokens)
-    chunks = []
-    for i in range(0, len(words), step):
-        w = words[i : i + size]
-        if not w:
-            break
-        chunks.append(" ".join(w))
-        if i + size >= len(words):
-            break
-    return chunks
-
-
-async def _probe_embedding_dim(client: httpx.AsyncClient) -> int:
-    # 임베딩 서비스 규약: POST /embed  { "texts": ["..."] } -> { "embeddings": [[...]] }
-    r = await client.post(
-        f"{EMBEDDING_URL}/embed", json={"texts": ["dimension probe"]}, timeout=30.0
-    )
+async def _probe_embedding_dim(client: httpx.AsyncClient, model: Optional[str] = None) -> int:
+    request = _embed_request(["dimension probe"], model)
+    r = await client.post(f"{EMBEDDING_URL}/embed", json=request, timeout=30.0)
     r.raise_for_status()
-    data = r.json()
-    emb = data["embeddings"][0]
+    emb = _embed_result(r.json(), request)[0]
     return len(emb)
 
 
-async def _embed_texts(client: httpx.AsyncClient, texts: List[str]) -> List[List[float]]:
-    r = await client.post(f"{EMBEDDING_URL}/embed", json={"texts": texts}, timeout=60.0)
+async def _embed_texts(
+    client: httpx.AsyncClient, texts: List[str], model: Optional[str] = None
+) -> List[List[float]]:
+    timeout = stage_timeout("embed", 60.0, share=RAG_DEADLINE_EMBED_SHARE)
+    request = _embed_request(texts, model)
+    with _deadline_stage("embed"):
+        r = await client.post(f"{EMBEDDING_URL}/embed", json=request, timeout=timeout)
     r.raise_for_status()
-    data = r.json()
-    return data["embeddings"]
+    return _embed_result(r.json(), request)
+
+
+@contextmanager
+def _deadline_stage(stage: str):
+    """deadline이 있는 요청에서 stage 타임아웃 → 단계별 기록 후 DeadlineExceeded"""
+    try:
+        yield
+    except (httpx.TimeoutException, asyncio.TimeoutError) as e:
+        if current_deadline.get() is None:
+            raise
+        record_miss(stage)
+        raise DeadlineExceeded(stage) from e
+
+
+def _deadline_from_header(value: Optional[str]) -> Optional[Deadline]:
+    """X-Request-Deadline-Ms → 현재 요청 컨텍스트의 deadline (asyncio.to_thread에도 전달됨)"""
+    deadline = Deadline.from_header(value)
+    current_deadline.set(deadline)
+    return deadline
+
+
+def _llm_timeout() -> Optional[float]:
+    """
+    LLM 단계 전체 타임아웃 (deadline이 없으면 None: 기존 대기열/생성 타임아웃만 적용)
+    deadline 안에 최소 예산이 남지 않으면 DeadlineExceeded("llm")
+    """
+    if current_deadline.get() is None:
+        return None
+    return stage_timeout(
+        "llm",
+        RAG_LLM_TIMEOUT,
+        reserve=RAG_DEADLINE_RESERVE_MS / 1000,
+        minimum=RAG_DEADLINE_LLM_MIN_MS / 1000,
+    )
 
 
 def _detect_model_for_query(query: str) -> str:
@@ -225,43 +467,307 @@ def _detect_model_for_query(query: str) -> str:
 
 
 async def _llm_answer(
-    client: httpx.AsyncClient, system: str, user: str
+    client: httpx.AsyncClient,
+    system: str,
+    user: str,
+    slot: Optional[int] = None,
+    bounded: bool = True,
+    timeout: Optional[float] = None,
 ) -> Tuple[str, Dict[str, Any]]:
+    """
+    bounded=False: 대기열 상한 없이 슬롯을 기다림 (배치 작업)
+    timeout: 슬롯 대기 + 생성 전체 상한 (기본 RAG_LLM_TIMEOUT은 생성에만 적용)
+    """
     # 쿼리 내용에 따라 적절한 모델 선택
     selected_model = _detect_model_for_query(user)
     logger.info(f"RAG 모델 선택: {selected_model} (쿼리: {user[:50]}...)")
 
+    payload = _llm_payload(selected_model, system, user, stream=False, slot=slot)
+    async with asyncio.timeout(timeout), llm_limiter.slot(bounded):
+        r = await client.post(
+            OPENAI_CHAT_COMPLETIONS, json=payload, timeout=timeout or RAG_LLM_TIMEOUT
+        )
+    r.raise_for_status()
+    data = r.json()
+    content = data["choices"][0]["message"]["content"]
+    usage = _with_cached_tokens(data.get("usage") or {}, data)
+    return content, usage
+
+
+def _with_cached_tokens(usage: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    prompt cache로 재사용된 토큰 수를 usage["cached_tokens"]로 노출
+    - OpenAI 형식 usage.prompt_tokens_details.cached_tokens
+    - llama.cpp server timings.cache_n
+    """
+    details = usage.get("prompt_tokens_details") or {}
+    cached = details.get("cached_tokens")
+    if cached is None:
+        cached = (data.get("timings") or {}).get("cache_n")
+    if cached is not None:
+        usage = {**usage, "cached_tokens": cached}
+    return usage
+
+
+def _llm_payload(
+    model: str, system: str, user: str, stream: bool, slot: Optional[int] = None
+) -> Dict[str, Any]:
     payload = {
-        "model": selected_model,
+        "model": model,
         "temperature": RAG_LLM_TEMPERATURE,
         "max_tokens": RAG_LLM_MAX_TOKENS,
-        "stream": False,
+        "stream": stream,
         "messages": [
             {"role": "system", "content": system},
             {"role": "user", "content": user},
         ],
     }
-    r = await client.post(OPENAI_CHAT_COMPLETIONS, json=payload, timeout=RAG_LLM_TIMEOUT)
-    r.raise_for_status()
-    data = r.json()
-    content = data["choices"][0]["message"]["content"]
-    usage = data.get("usage", {})
-    return content, usage
+    if stream:
+        # 마지막 청크에 usage 포함 요청 (OpenAI 호환 게이트웨이)
+        payload["stream_options"] = {"include_usage": True}
+    # llama.cpp 전용 힌트 (게이트웨이가 provider 파라미터로 그대로 전달)
+    if RAG_LLM_CACHE_PROMPT:
+        payload["cache_prompt"] = True
+    if slot is not None:
+        payload["id_slot"] = slot
+    return payload
+
+
+async def _llm_stream(
+    client: httpx.AsyncClient,
+    system: str,
+    user: str,
+    slot: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """게이트웨이 SSE 스트림을 chunk(dict) 단위로 전달"""
+    selected_model = _detect_model_for_query(user)
+    logger.info(f"RAG 스트리밍 모델 선택: {selected_model} (쿼리: {user[:50]}...)")
+
+    payload = _llm_payload(selected_model, system, user, stream=True, slot=slot)
+    async with (
+        llm_limiter.slot(),
+        client.stream(
+            "POST", OPENAI_CHAT_COMPLETIONS, json=payload, timeout=timeout or RAG_LLM_TIMEOUT
+        ) as r,
+    ):
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            data_str = line[6:].strip()
+            if data_str == "[DONE]":
+                break
+            try:
+                yield json.loads(data_str)
+            except json.JSONDecodeError:
+                continue
 
 
-def _ensure_collection(collection: str, dim: int):
+def _ensure_collection(collection: str, dim: int, profile: Optional[str] = None) -> Dict[str, Any]:
+    """
+    컬렉션이 없으면 생성 (profile 미지정 시 RAG_COLLECTION_PROFILE)하고 임베딩 모델/차원 기록
+    - 기록 없는 기존 컬렉션은 실제 벡터 차원을 기록 (현재 모델과 차원이 다르면 모델 미상)
+    - 기록된 모델이 설정과 다르면 재임베딩 시작 (RAG_EMBED_MIGRATION_AUTO)
+    반환: {"physical", "model", "dim"}
+    """
     assert qdrant is not None
+    target = _collection_target(collection)
+    physical = target["physical"] if target else collection
     existing = [c.name for c in qdrant.get_collections().collections]
-    if collection in existing:
-        return
-    qdrant.create_collection(
-        collection_name=collection,
-        vectors_config=qmodels.VectorParams(size=dim, distance=qmodels.Distance.COSINE),
+    if physical not in existing:
+        profile = profile or RAG_COLLECTION_PROFILE
+        qdrant.create_collection(
+            collection_name=physical,
+            **_create_kwargs(get_profile(profile) if profile else None, dim),
+        )
+        if profile:
+            _set_collection_profile(collection, profile)
+        target = _set_collection_target(collection, physical, RAG_EMBEDDING_MODEL, dim)
+    elif target is None:
+        size = _vector_size(physical) or dim
+        model = RAG_EMBEDDING_MODEL if size == dim else None
+        target = _set_collection_target(collection, physical, model, size)
+    if target["model"] != RAG_EMBEDDING_MODEL and RAG_EMBED_MIGRATION_AUTO:
+        _start_embedding_migration(collection)
+    return target
+
+
+def _create_kwargs(profile: Optional[CollectionProfile], dim: int) -> Dict[str, Any]:
+    if profile is None:
+        return {"vectors_config": qmodels.VectorParams(size=dim, distance=qmodels.Distance.COSINE)}
+    return create_collection_kwargs(profile, dim)
+
+
+def _vector_size(physical: str) -> Optional[int]:
+    """기존 Qdrant 컬렉션의 벡터 차원 (named vectors 등 읽을 수 없으면 None)"""
+    assert qdrant is not None
+    size = getattr(qdrant.get_collection(physical).config.params.vectors, "size", None)
+    return size if isinstance(size, int) else None
+
+
+# 컬렉션 이름(alias) → 실제 Qdrant 컬렉션/임베딩 모델/차원 (질의마다 DB를 읽지 않도록 캐시)
+_collection_targets: Dict[str, Dict[str, Any]] = {}
+
+# Qdrant alias → 실제 컬렉션 (교체의 기준: 컨테이너 DB 유실/여러 replica에도 유지)
+# collection_settings 행은 모델/차원 메타데이터, RAG_ALIAS_REFRESH_INTERVAL마다 다시 읽음
+_qdrant_aliases: Optional[Dict[str, str]] = None
+
+
+def _alias_map(refresh: bool = False) -> Dict[str, str]:
+    global _qdrant_aliases
+    if _qdrant_aliases is None or refresh:
+        assert qdrant is not None
+        _qdrant_aliases = {a.alias_name: a.collection_name for a in qdrant.get_aliases().aliases}
+    return _qdrant_aliases
+
+
+def _collection_target(collection: str) -> Optional[Dict[str, Any]]:
+    """기록된 {"physical", "model", "dim"} (아직 기록 전이면 None)"""
+    if collection not in _collection_targets:
+        settings = db.get_collection_settings(collection)
+        try:
+            alias = _alias_map().get(collection)
+        except Exception as e:
+            logger.warning(f"Failed to read Qdrant aliases: {e}")
+            alias = None
+        if alias is not None and (settings or {}).get("physical_collection") != alias:
+            # 기록이 없거나 어긋남 (DB 유실, 다른 replica의 교체) → alias 기준으로 다시 기록
+            return _adopt_alias(collection, alias, settings)
+        if not settings or not settings.get("embedding_dim"):
+            return None
+        _collection_targets[collection] = {
+            "physical": settings["physical_collection"] or collection,
+            "model": settings["embedding_model"],
+            "dim": settings["embedding_dim"],
+        }
+    return _collection_targets[collection]
+
+
+def _set_collection_target(
+    collection: str, physical: str, model: Optional[str], dim: int
+) -> Dict[str, Any]:
+    db.set_collection_embedding(collection, physical, model, dim)
+    _collection_targets[collection] = {"physical": physical, "model": model, "dim": dim}
+    return _collection_targets[collection]
+
+
+def _adopt_alias(
+    collection: str, physical: str, settings: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """alias가 가리키는 컬렉션을 대상으로 기록 (모델은 shadow 이름이 설정 모델의 것일 때만 추정)"""
+    shadow = shadow_collection_name(collection, RAG_EMBEDDING_MODEL)
+    if settings and settings.get("physical_collection") == physical:
+        model = settings["embedding_model"]
+    else:
+        model = RAG_EMBEDDING_MODEL if physical in (shadow, f"{shadow}_next") else None
+    dim = _vector_size(physical)
+    if not dim:
+        return None
+    logger.info(f"Collection {collection} follows Qdrant alias → {physical} (model {model})")
+    return _set_collection_target(collection, physical, model, dim)
+
+
+def _point_alias(collection: str, physical: str):
+    """
+    Qdrant alias collection → physical (기존 alias 삭제 + 생성을 한 요청으로 → 원자적 교체)
+    alias 도입 전 컬렉션(이름이 같은 실제 컬렉션)은 먼저 삭제해야 alias를 만들 수 있음
+    """
+    assert qdrant is not None
+    ops: List[Any] = []
+    if collection in _alias_map(refresh=True):
+        ops.append(
+            qmodels.DeleteAliasOperation(delete_alias=qmodels.DeleteAlias(alias_name=collection))
+        )
+    elif qdrant.collection_exists(collection):
+        logger.warning(f"Dropping pre-alias collection {collection} to alias it to {physical}")
+        qdrant.delete_collection(collection)
+        _payload_indexed.discard(collection)
+    ops.append(
+        qmodels.CreateAliasOperation(
+            create_alias=qmodels.CreateAlias(collection_name=physical, alias_name=collection)
+        )
+    )
+    qdrant.update_collection_aliases(change_aliases_operations=ops)
+    _alias_map()[collection] = physical
+
+
+def _refresh_collection_targets():
+    """
+    캐시된 대상을 Qdrant alias와 맞춤
+    - alias가 다른 컬렉션을 가리킴 (다른 replica의 교체) → 다시 읽고 답변 캐시 무효화
+    - 교체는 기록됐는데 alias가 없음 (alias 생성 실패) → 다시 생성
+    """
+    aliases = _alias_map(refresh=True)
+    for collection, target in list(_collection_targets.items()):
+        physical = aliases.get(collection)
+        if physical is None and target["physical"] != collection:
+            _point_alias(collection, target["physical"])
+        elif physical is not None and physical != target["physical"]:
+            _collection_targets.pop(collection, None)
+            _collection_target(collection)
+            db.bump_index_version(collection)
+
+
+async def _alias_refresh_loop():
+    while True:
+        await asyncio.sleep(RAG_ALIAS_REFRESH_INTERVAL)
+        try:
+            await asyncio.to_thread(_refresh_collection_targets)
+        except Exception as e:
+            logger.warning(f"Qdrant alias refresh failed: {e}")
+
+
+def _physical(collection: str) -> str:
+    """질의/색인이 실제로 사용할 Qdrant 컬렉션 (alias 교체 전까지 이전 컬렉션)"""
+    target = _collection_target(collection)
+    return target["physical"] if target else collection
+
+
+def _query_model(collection: str, target: Dict[str, Any]) -> str:
+    """컬렉션 벡터와 같은 모델로 질의를 임베딩 (모델 미상이면 재임베딩 전까지 409)"""
+    if target["model"] is None:
+        raise HTTPException(
+            status_code=409,
+            detail=(
+                f"Collection '{collection}' has {target['dim']}-dim vectors from an unknown "
+                f"embedding model; re-embed it with POST /collections/{collection}/migrate"
+            ),
+        )
+    return target["model"]
+
+
+# 컬렉션 → 적용된 프로파일 (질의마다 DB를 읽지 않도록 캐시)
+_collection_profiles: Dict[str, Optional[CollectionProfile]] = {}
+
+
+def _collection_profile(collection: str) -> Optional[CollectionProfile]:
+    if collection not in _collection_profiles:
+        settings = db.get_collection_settings(collection)
+        name = settings["profile"] if settings else None
+        _collection_profiles[collection] = PROFILES.get(name) if name else None
+    return _collection_profiles[collection]
+
+
+def _set_collection_profile(collection: str, profile: str):
+    db.set_collection_profile(collection, profile)
+    _collection_profiles[collection] = get_profile(profile)
+
+
+def _search_params(
+    collection: str, body: Optional[RetrievalOptions] = None
+) -> Optional[qmodels.SearchParams]:
+    """컬렉션 프로파일 기본값 + 요청별 hnsw_ef/exact override"""
+    return search_params(
+        _collection_profile(collection),
+        hnsw_ef=body.hnsw_ef if body is not None else None,
+        exact=body.exact if body is not None else None,
     )
 
 
 @retry(
-    stop=stop_after_attempt(QDRANT_MAX_RETRIES),
+    # deadline 안에 끝날 수 없는 재시도는 생략
+    stop=stop_after_attempt(QDRANT_MAX_RETRIES) | stop_before_deadline(QDRANT_RETRY_MIN_WAIT),
     wait=wait_exponential(multiplier=1, min=QDRANT_RETRY_MIN_WAIT, max=QDRANT_RETRY_MAX_WAIT),
     retry=retry_if_exception_type((ConnectionError, TimeoutError, Exception)),
     reraise=True,
@@ -273,27 +779,41 @@ def _upsert_points(collection: str, embeddings: List[List[float]], payloads: Lis
     assert qdrant is not None
     points = []
     for idx, (vec, pl) in enumerate(zip(embeddings, payloads)):
-        points.append(qmodels.PointStruct(id=pl["point_id"], vector=vec, payload=pl))
+        payload = {k: v for k, v in pl.items() if k != "point_id"}
+        points.append(qmodels.PointStruct(id=pl["point_id"], vector=vec, payload=payload))
     qdrant.upsert(collection_name=collection, points=points)
 
 
 @retry(
-    stop=stop_after_attempt(QDRANT_MAX_RETRIES),
+    # deadline 안에 끝날 수 없는 재시도는 생략
+    stop=stop_after_attempt(QDRANT_MAX_RETRIES) | stop_before_deadline(QDRANT_RETRY_MIN_WAIT),
     wait=wait_exponential(multiplier=1, min=QDRANT_RETRY_MIN_WAIT, max=QDRANT_RETRY_MAX_WAIT),
     retry=retry_if_exception_type((ConnectionError, TimeoutError, Exception)),
     reraise=True,
 )
-def _search(collection: str, query_vec: List[float], topk: int) -> List[Dict[str, Any]]:
+def _search(
+    collection: str,
+    query_vec: List[float],
+    topk: int,
+    params: Optional[qmodels.SearchParams] = None,
+    query_filter: Optional[qmodels.Filter] = None,
+) -> List[Dict[str, Any]]:
     """
     Qdrant search with automatic retry on connection/timeout errors
+    텍스트는 chunk store에서 최종 컨텍스트만 조회하므로 payload는 받지 않음
     """
     assert qdrant is not None
+    # 요청 deadline이 있으면 Qdrant 서버 측 타임아웃도 남은 시간으로 제한 (초 단위 정수)
+    deadline = current_deadline.get()
     res = qdrant.search(
         collection_name=collection,
         query_vector=query_vec,
         limit=topk,
-        with_payload=True,
+        with_payload=False,
         score_threshold=None,
+        search_params=params,
+        query_filter=query_filter,
+        timeout=max(1, math.ceil(deadline.remaining())) if deadline else None,
     )
     out = []
     for p in res:
@@ -306,6 +826,677 @@ def _search(collection: str, query_vec: List[float], topk: int) -> List[Dict[str
     return out
 
 
+# -------- Query pipeline --------
+SYSTEM_PROMPT = (
+    "You are a concise assistant. Use ONLY the provided context to answer. "
+    "If the answer is not in the context, say you don't know."
+)
+CONTEXT_TOKEN_BUDGET = 1200  # 프롬프트 컨텍스트 예산(모델 ctx 2048 기준 안전치)
+
+
+def _resolve_collections(body: "QueryRequest") -> List[str]:
+    """요청의 collection/collections → 중복 제거된 컬렉션 목록 (입력 순서 유지)"""
+    cols = body.collections or [body.collection or COLLECTION_DEFAULT]
+    return list(dict.fromkeys(c for c in cols if c))
+
+
+def _collection_key(cols: List[str]) -> str:
+    """캐시/분석용 컬렉션 집합 키 (순서 무관)"""
+    return ",".join(sorted(cols))
+
+
+async def _retrieve(
+    client: httpx.AsyncClient,
+    q: str,
+    cols: List[str],
+    topk: int,
+    body: Optional[RetrievalOptions] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """
+    질의 임베딩(1회) + 컬렉션별 검색을 동시에 실행. (hits, 단계별 소요시간 ms) 반환
+    - hybrid 모드: 컬렉션마다 dense/BM25 두 leg를 RRF로 융합,
+      score는 가중치 합 기준 최대 RRF로 정규화 (0~1)
+    - 여러 컬렉션의 hit은 score 기준으로 병합, 각 hit에 collection 기록
+      (dense 전용 모드는 컬렉션별 최대 score로 정규화해 병합, 원래 유사도는 dense_score)
+    """
+    global EMBED_DIM
+    # embed dim lazy init
+    if EMBED_DIM is None:
+        EMBED_DIM = await _probe_embedding_dim(client)
+
+    # ensure collection 존재 + 컬렉션별 실제 Qdrant 컬렉션/질의 임베딩 모델
+    targets = [_ensure_collection(col, EMBED_DIM) for col in cols]
+    models = [_query_model(col, target) for col, target in zip(cols, targets)]
+
+    hybrid, dense_weight, lexical_weight, candidates = _retrieval_options(body, topk)
+    query_filter = body.filter if body is not None else None
+    qdrant_filter = _qdrant_filter(query_filter)
+
+    timings: Dict[str, float] = {}
+    retrieval_start = time.time()
+
+    async def lexical_all(limit: int) -> List[List[Dict[str, Any]]]:
+        lexical_start = time.time()
+        try:
+            # deadline 초과 시 렉시컬 leg 없이 dense 결과만 사용
+            timeout = stage_timeout("lexical_search", None, share=RAG_DEADLINE_SEARCH_SHARE)
+            with _deadline_stage("lexical_search"):
+                lists = await asyncio.wait_for(
+                    asyncio.gather(*(_lexical_search(col, q, limit, query_filter) for col in cols)),
+                    timeout,
+                )
+        except DeadlineExceeded:
+            lists = [[] for _ in cols]
+        timings["lexical_search_time_ms"] = (time.time() - lexical_start) * 1000
+        return lists
+
+    limit = candidates if hybrid else topk
+    # 렉시컬 leg는 임베딩을 기다리지 않고 먼저 출발
+    lexical_task = asyncio.ensure_future(lexical_all(limit)) if hybrid else None
+
+    try:
+        # Time embedding (모델당 1회: 재임베딩 중에도 컬렉션마다 자기 모델 벡터로 검색)
+        embed_start = time.time()
+        distinct = list(dict.fromkeys(models))
+        vecs = await asyncio.gather(*(_embed_texts(client, [q], m) for m in distinct))
+        qvecs = {m: v[0] for m, v in zip(distinct, vecs)}
+        timings["embedding_time_ms"] = (time.time() - embed_start) * 1000
+
+        # Time vector search (컬렉션별 동시 실행)
+        search_start = time.time()
+        timeout = stage_timeout("vector_search", None, share=RAG_DEADLINE_SEARCH_SHARE)
+        with _deadline_stage("vector_search"):
+            dense_lists = await asyncio.wait_for(
+                asyncio.gather(
+                    *(
+                        asyncio.to_thread(
+                            _search,
+                            target["physical"],
+                            qvecs[model],
+                            limit,
+                            _search_params(col, body),
+                            qdrant_filter,
+                        )
+                        for col, target, model in zip(cols, targets, models)
+                    )
+                ),
+                timeout,
+            )
+        timings["vector_search_time_ms"] = (time.time() - search_start) * 1000
+    except BaseException:
+        if lexical_task is not None:
+            lexical_task.cancel()
+        raise
+
+    merged: List[Dict[str, Any]] = []
+    if not hybrid:
+        for col, hits in zip(cols, dense_lists):
+            hits = [{**h, "collection": col} for h in hits]
+            if len(cols) > 1:
+                _normalize_dense(hits)
+            merged.extend(hits)
+    else:
+        lexical_lists = await lexical_task
+        for col, dense_hits, lexical_hits in zip(cols, dense_lists, lexical_lists):
+            merged.extend(
+                _fuse_hits(col, dense_hits, lexical_hits, dense_weight, lexical_weight, topk)
+            )
+
+    if len(cols) > 1:
+        merged.sort(
+            key=lambda h: (h.get("score") or 0.0, h.get("dense_score") or 0.0), reverse=True
+        )
+    merged = merged[:topk]
+
+    await _fill_missing_payloads(merged)
+    timings["retrieval_time_ms"] = (time.time() - retrieval_start) * 1000
+    return merged, timings
+
+
+async def _lexical_search(
+    col: str, q: str, limit: int, query_filter: Optional[QueryFilter] = None
+) -> List[Dict[str, Any]]:
+    try:
+        return await asyncio.to_thread(
+            lexical.search, col, q, limit, **_lexical_filter(query_filter)
+        )
+    except Exception as e:
+        # 렉시컬 인덱스 장애는 dense 결과만으로 응답
+        logger.warning(f"Lexical search failed for {col}: {e}")
+        return []
+
+
+def _retrieval_options(
+    body: Optional[RetrievalOptions], topk: int
+) -> Tuple[bool, float, float, int]:
+    """요청 옵션 + 환경변수 기본값 → (hybrid, dense_weight, lexical_weight, candidates)"""
+    hybrid = RAG_HYBRID_ENABLED if body is None or body.hybrid is None else body.hybrid
+    dense_weight = RAG_DENSE_WEIGHT
+    lexical_weight = RAG_LEXICAL_WEIGHT
+    candidates = max(topk, RAG_HYBRID_CANDIDATES)
+    if body is not None:
+        if body.dense_weight is not None:
+            dense_weight = body.dense_weight
+        if body.lexical_weight is not None:
+            lexical_weight = body.lexical_weight
+        if body.candidates is not None:
+            candidates = max(topk, body.candidates)
+    hybrid = hybrid and (dense_weight > 0 or lexical_weight > 0)
+    return hybrid, dense_weight, lexical_weight, candidates
+
+
+def _context_selection_enabled(body: Optional[RetrievalOptions]) -> bool:
+    if body is None or body.select_context is None:
+        return RAG_CONTEXT_SELECTION
+    return body.select_context
+
+
+def _fetch_k(topk: int, body: Optional[RetrievalOptions]) -> int:
+    """컨텍스트 선택 시 over-fetch할 후보 수"""
+    if not _context_selection_enabled(body):
+        return topk
+    return topk * max(1, RAG_CONTEXT_OVERFETCH)
+
+
+def _select_context(
+    hits: List[Dict[str, Any]], topk: int, body: Optional[RetrievalOptions]
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    over-fetch된 hit(텍스트 포함) → 최종 컨텍스트 hit, 절감 통계
+    절감 토큰 = 상위 topk를 그대로 패킹했을 때 - 선택 후 패킹했을 때 (채팅 토크나이저 기준)
+    """
+    if not _context_selection_enabled(body):
+        return hits[:topk], {}
+    mmr_lambda = RAG_MMR_LAMBDA
+    min_relative_score = RAG_MIN_RELATIVE_SCORE
+    if body is not None:
+        if body.mmr_lambda is not None:
+            mmr_lambda = body.mmr_lambda
+        if body.min_relative_score is not None:
+            min_relative_score = body.min_relative_score
+    selected = select_context(hits, topk, mmr_lambda, min_relative_score)
+    baseline = sum(chat_tokens.count(t) for t in _pack_context(hits[:topk]))
+    used = sum(chat_tokens.count(t) for t in _pack_context(selected))
+    return selected, {
+        "context_candidates": len(hits),
+        "context_chunks": len(selected),
+        "context_tokens": used,
+        "context_tokens_saved": max(0, baseline - used),
+    }
+
+
+async def _expand_neighbors(
+    hits: List[Dict[str, Any]],
+    body: Optional[RetrievalOptions],
+    budget: int = CONTEXT_TOKEN_BUDGET,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    hit을 같은 문서의 앞뒤 이웃 청크로 확장 (컬렉션별 chunk store 조회 1회, 벡터 검색 없음)
+    - 순위 높은 hit부터, 가까운 이웃부터 예산이 허락하는 만큼만 추가
+    - 추가된 이웃은 hit과 하나의 span으로 병합. (확장된 hit, 추가한 청크 수) 반환
+    """
+    radius = RAG_NEIGHBOR_WINDOW if body is None or body.neighbors is None else body.neighbors
+    used = sum(chat_tokens.count(h.get("text", "")) for h in hits)
+    if radius <= 0 or not hits or used >= budget:
+        return hits, 0
+
+    anchors: Dict[str, List[Tuple[int, str, int, int]]] = {}
+    for h in hits:
+        chunk_ids = h.get("chunk_ids") or [h.get("chunk_id")]
+        if isinstance(h.get("id"), int) and h.get("doc_id") and None not in chunk_ids:
+            anchors.setdefault(h["collection"], []).append(
+                (h["id"], h["doc_id"], min(chunk_ids), max(chunk_ids))
+            )
+    if not anchors:
+        return hits, 0
+    fetched = await asyncio.gather(
+        *(
+            asyncio.to_thread(chunk_store.get_neighbors, col, col_anchors, radius)
+            for col, col_anchors in anchors.items()
+        )
+    )
+    neighbors = dict(zip(anchors.keys(), fetched))
+
+    extra: List[Dict[str, Any]] = []
+    for h in hits:
+        found = neighbors.get(h.get("collection"), {}).get(h.get("id"), [])
+        center = h.get("chunk_id") or 0
+        for n in sorted(found, key=lambda n: abs(n["chunk_id"] - center)):
+            cost = chat_tokens.count(n["text"])  # overlap 포함 → 보수적 추정
+            if used + cost > budget:
+                break
+            used += cost
+            extra.append({**n, "collection": h["collection"], "score": h.get("score")})
+    if not extra:
+        return hits, 0
+    return merge_adjacent(hits + extra), len(extra)
+
+
+def _fuse_hits(
+    col: str,
+    dense_hits: List[Dict[str, Any]],
+    lexical_hits: List[Dict[str, Any]],
+    dense_weight: float,
+    lexical_weight: float,
+    topk: int,
+) -> List[Dict[str, Any]]:
+    """한 컬렉션의 dense/BM25 결과를 RRF로 융합 (score: 최대 RRF 대비 0~1)"""
+    max_rrf = (dense_weight + lexical_weight) / (RAG_RRF_K + 1)
+    for h in dense_hits:
+        h["dense_score"] = h.pop("score", None)
+    for h in lexical_hits:
+        h["lexical_score"] = h.pop("score", None)
+    fused = reciprocal_rank_fusion(
+        [(dense_hits, dense_weight), (lexical_hits, lexical_weight)], k=RAG_RRF_K
+    )[:topk]
+    for h in fused:
+        h["score"] = h.pop("rrf_score") / max_rrf
+        h["collection"] = col
+    return fused
+
+
+def _normalize_dense(hits: List[Dict[str, Any]]):
+    """
+    한 컬렉션의 dense hit score를 최대값 대비 0~1로 정규화 (원래 유사도는 dense_score)
+    모델/프로파일/양자화가 다른 컬렉션끼리 유사도 분포 차이로 밀려나지 않도록 병합 전에 적용
+    """
+    top = max((h.get("score") or 0.0 for h in hits), default=0.0)
+    for h in hits:
+        h["dense_score"] = h.get("score")
+        if top > 0:
+            h["score"] = (h.get("score") or 0.0) / top
+
+
+async def _fill_missing_payloads(hits: List[Dict[str, Any]]):
+    """
+    최종 컨텍스트 hit의 텍스트/메타데이터를 컬렉션별 한 번의 chunk store 조회로 채움
+    chunk store에 없는 point(이전 방식으로 색인된 컬렉션)는 Qdrant payload로 대체
+    어디에도 원문이 없으면 503 (chunk store 유실 → 재색인 필요)
+    """
+    missing: Dict[str, List[Any]] = {}
+    for h in hits:
+        if "text" not in h:
+            missing.setdefault(h["collection"], []).append(h["id"])
+    if not missing:
+        return
+
+    def lookup(col: str, ids: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        found = chunk_store.get_chunks(col, ids)
+        legacy = [pid for pid in ids if pid not in found]
+        if legacy:
+            found.update(_retrieve_payloads(_physical(col), legacy))
+        return found
+
+    fetched = await asyncio.gather(
+        *(asyncio.to_thread(lookup, col, ids) for col, ids in missing.items())
+    )
+    payloads = dict(zip(missing.keys(), fetched))
+    lost: Dict[str, int] = {}
+    for h in hits:
+        if "text" not in h:
+            h.update(payloads[h["collection"]].get(h["id"], {}))
+        if "text" not in h:
+            lost[h["collection"]] = lost.get(h["collection"], 0) + 1
+    if lost:
+        # 벡터만 남고 원문이 없음 (chunk store 유실/불일치) → 빈 컨텍스트로 답하지 않고 재색인 요구
+        summary = ", ".join(f"{col}: {n}" for col, n in lost.items())
+        logger.error(f"Chunk text missing for retrieved points ({summary}); re-index required")
+        raise HTTPException(
+            status_code=503,
+            detail=(
+                f"Chunk text missing for retrieved points ({summary}); the chunk store "
+                f"({chunk_store.db_path}) is empty or out of date - re-index with POST /index"
+            ),
+        )
+
+
+def _pack_context(hits: List[Dict[str, Any]], budget: int = CONTEXT_TOKEN_BUDGET) -> List[str]:
+    """컨텍스트 구성: 채팅 모델 토큰 기준으로 예산에 정확히 맞춤"""
+    ctx_texts = []
+    total_tokens = 0
+    for h in hits:
+        t = h.get("text", "")
+        t_tokens = chat_tokens.count(t)
+        if total_tokens + t_tokens > budget:
+            # 남은 예산만큼 토큰 단위로 자르기
+            remain = budget - total_tokens
+            if remain <= 0:
+                break
+            t = chat_tokens.truncate(t, remain)
+            t_tokens = remain
+        ctx_texts.append(t)
+        total_tokens += t_tokens
+    return ctx_texts
+
+
+def _build_user_prompt(q: str, ctx_texts: List[str]) -> str:
+    return (
+        "Question:\n"
+        f"{q}\n\n"
+        "Context:\n"
+        + "\n\n".join([f"[{i+1}] {c}" for i, c in enumerate(ctx_texts)])
+        + "\n\nAnswer in Korean."
+    )
+
+
+# prefix_stable 레이아웃의 고정 시스템 블록 (요청마다 바뀌는 내용 없음)
+STABLE_SYSTEM_PROMPT = (
+    SYSTEM_PROMPT + " The context chunks are labelled [source#chunk]. "
+    "The question comes after the context. Answer in Korean."
+)
+
+
+def _build_prompt(
+    q: str, hits: List[Dict[str, Any]], ctx_texts: List[str]
+) -> Tuple[str, str, Optional[int]]:
+    """
+    (system, user, slot) 구성
+    - classic: 기존 레이아웃 (질문 → 관련도 순 컨텍스트)
+    - prefix_stable: 고정 시스템 블록 → (collection, doc_id, chunk_id) 순 컨텍스트 → 질문
+      같은 청크 집합이면 질문 앞까지 프롬프트가 바이트 단위로 동일 → KV 캐시 재사용
+    slot: RAG_LLM_SLOTS > 0이면 컨텍스트 집합 해시로 고른 llama.cpp 슬롯
+    """
+    if RAG_PROMPT_LAYOUT != "prefix_stable":
+        return SYSTEM_PROMPT, _build_user_prompt(q, ctx_texts), None
+
+    packed = sorted(
+        zip(hits, ctx_texts),
+        key=lambda pair: (
+            pair[0].get("collection") or "",
+            str(pair[0].get("doc_id") or ""),
+            pair[0].get("chunk_id") or 0,
+            str(pair[0].get("id")),
+        ),
+    )
+    blocks = [f"[{h.get('doc_id')}#{h.get('chunk_id', 0)}]\n{text}" for h, text in packed]
+    context = "Context:\n" + "\n\n".join(blocks) + "\n\n"
+    slot = None
+    if RAG_LLM_SLOTS > 0:
+        digest = hashlib.sha1(context.encode(), usedforsecurity=False).digest()
+        slot = int.from_bytes(digest[:4], "big") % RAG_LLM_SLOTS
+    return STABLE_SYSTEM_PROMPT, context + f"Question:\n{q}", slot
+
+
+def _context_out(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "score": h.get("score", 0.0),
+            "doc_id": h.get("doc_id"),
+            "chunk_id": h.get("chunk_id"),
+            "collection": h.get("collection"),
+            # 인접 청크를 병합한 span이면 구성 청크 목록
+            **({"chunk_ids": h["chunk_ids"]} if "chunk_ids" in h else {}),
+            # 같은 청크가 여러 문서에 있으면 모든 문서
+            **({"doc_ids": h["doc_ids"]} if "doc_ids" in h else {}),
+        }
+        for h in hits
+    ]
+
+
+def _search_out(hits: List[Dict[str, Any]], ctx_texts: List[str]) -> List[Dict[str, Any]]:
+    """패킹된 청크 → /search 결과 (예산에 맞춰 잘린 청크는 char_end도 맞춰 조정)"""
+    out = []
+    for h, text in zip(hits, ctx_texts):
+        char_start = h.get("char_start")
+        truncated = len(text) < len(h.get("text", ""))
+        char_end = h.get("char_end")
+        if truncated and char_start is not None:
+            char_end = char_start + len(text)
+        item = {
+            "score": h.get("score", 0.0),
+            "collection": h.get("collection"),
+            "doc_id": h.get("doc_id"),
+            "chunk_id": h.get("chunk_id"),
+            "char_start": char_start,
+            "char_end": char_end,
+            "text": text,
+            "truncated": truncated,
+        }
+        for key in ("chunk_ids", "doc_ids", "dense_score", "lexical_score"):
+            if key in h:
+                item[key] = h[key]
+        out.append(item)
+    return out
+
+
+def _record_answer(
+    q: str,
+    col: str,
+    answer: str,
+    ctx_out: List[Dict[str, Any]],
+    usage: Dict[str, Any],
+    hits: List[Dict[str, Any]],
+    ctx_texts: List[str],
+    timings: Dict[str, float],
+    total_time_ms: int,
+    cache_key: Optional[str] = None,
+):
+    """캐시/분석 기록은 백그라운드 writer로 위임 (응답 지연 없음)"""
+    # cache_key에 색인 버전이 포함되므로 긴 TTL 사용
+    analytics.cache_query(q, cache_key or col, answer, ctx_out, ttl_hours=RAG_CACHE_TTL_HOURS)
+
+    analytics.log_search(
+        collection=col,
+        query=q,
+        results_count=len(hits),
+        response_time_ms=total_time_ms,
+        llm_tokens_used=usage.get("total_tokens", 0),
+        embedding_time_ms=int(timings.get("embedding_time_ms", 0)),
+        vector_search_time_ms=int(timings.get("vector_search_time_ms", 0)),
+        llm_response_time_ms=int(timings.get("llm_response_time_ms", 0)),
+        context_length=len("\n".join(ctx_texts)),
+    )
+
+    # Track document access for analytics
+    for h in hits:
+        if h.get("doc_id"):
+            analytics.track_document_access(h["doc_id"])
+
+
+@retry(
+    # deadline 안에 끝날 수 없는 재시도는 생략
+    stop=stop_after_attempt(QDRANT_MAX_RETRIES) | stop_before_deadline(QDRANT_RETRY_MIN_WAIT),
+    wait=wait_exponential(multiplier=1, min=QDRANT_RETRY_MIN_WAIT, max=QDRANT_RETRY_MAX_WAIT),
+    retry=retry_if_exception_type((ConnectionError, TimeoutError, Exception)),
+    reraise=True,
+)
+def _search_batch(
+    collection: str,
+    query_vecs: List[List[float]],
+    topk: int,
+    params: Optional[qmodels.SearchParams] = None,
+    query_filter: Optional[qmodels.Filter] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Qdrant batch search (한 번의 요청으로 여러 질의) with retry
+    """
+    assert qdrant is not None
+    responses = qdrant.query_batch_points(
+        collection_name=collection,
+        requests=[
+            qmodels.QueryRequest(
+                query=vec, limit=topk, with_payload=False, params=params, filter=query_filter
+            )
+            for vec in query_vecs
+        ],
+    )
+    return [
+        [{"id": p.id, "score": p.score, **(p.payload or {})} for p in r.points] for r in responses
+    ]
+
+
+@retry(
+    # deadline 안에 끝날 수 없는 재시도는 생략
+    stop=stop_after_attempt(QDRANT_MAX_RETRIES) | stop_before_deadline(QDRANT_RETRY_MIN_WAIT),
+    wait=wait_exponential(multiplier=1, min=QDRANT_RETRY_MIN_WAIT, max=QDRANT_RETRY_MAX_WAIT),
+    retry=retry_if_exception_type((ConnectionError, TimeoutError, Exception)),
+    reraise=True,
+)
+def _retrieve_payloads(collection: str, ids: List[Any]) -> Dict[Any, Dict[str, Any]]:
+    """
+    point id 목록의 payload를 한 번에 조회 (벡터 제외)
+    """
+    assert qdrant is not None
+    points = qdrant.retrieve(
+        collection_name=collection, ids=ids, with_payload=True, with_vectors=False
+    )
+    return {p.id: dict(p.payload or {}) for p in points}
+
+
+def _delete_points(collection: str, ids: List[Any]):
+    assert qdrant is not None
+    qdrant.delete(collection_name=collection, points_selector=qmodels.PointIdsList(points=ids))
+
+
+# 필터용 payload 필드 → Qdrant payload 인덱스 타입
+PAYLOAD_INDEXES = {
+    "path_prefixes": qmodels.PayloadSchemaType.KEYWORD,
+    "ext": qmodels.PayloadSchemaType.KEYWORD,
+    "mtime": qmodels.PayloadSchemaType.FLOAT,
+    "checksum": qmodels.PayloadSchemaType.KEYWORD,
+}
+_payload_indexed: set = set()
+
+
+def _ensure_payload_indexes(collection: str):
+    """필터 필드 payload 인덱스 생성 (프로세스당 컬렉션별 1회, 이미 있으면 Qdrant가 무시)"""
+    if collection in _payload_indexed:
+        return
+    assert qdrant is not None
+    for field, schema in PAYLOAD_INDEXES.items():
+        qdrant.create_payload_index(
+            collection_name=collection, field_name=field, field_schema=schema
+        )
+    _payload_indexed.add(collection)
+
+
+def _path_prefixes(doc_id: str) -> List[str]:
+    """문서 경로의 상위 디렉토리 prefix 목록 (/a/b/c.md → /a, /a/b)"""
+    parts = posixpath.normpath(doc_id).split("/")[:-1]
+    prefixes = ["/".join(parts[: i + 1]) for i in range(len(parts))]
+    return [p for p in prefixes if p not in ("", ".")]
+
+
+def _extension(path: str) -> str:
+    return os.path.splitext(path)[1].lower().lstrip(".")
+
+
+def _qdrant_payload(
+    chunk: Dict[str, Any], duplicates: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Qdrant에 저장할 payload (필터용 필드만, 원문은 chunk store)
+    duplicates: 같은 청크를 포함한 다른 문서 위치 → 필드별로 모든 문서 값을 배열로 저장
+    (Qdrant는 배열 값 중 하나라도 조건을 만족하면 일치하므로 어느 문서 기준 필터에도 걸림)
+    """
+    if duplicates:
+        members = [chunk, *duplicates]
+        payload = {
+            "point_id": chunk["point_id"],
+            "path_prefixes": _unique(p for c in members for p in _path_prefixes(c["doc_id"])),
+            "ext": _unique(_extension(c["doc_id"]) for c in members),
+            "mtime": _unique(c.get("mtime") for c in members) or None,
+            "checksum": _unique(c.get("checksum") for c in members) or None,
+        }
+    else:
+        payload = {
+            "point_id": chunk["point_id"],
+            "path_prefixes": _path_prefixes(chunk["doc_id"]),
+            "ext": _extension(chunk["doc_id"]),
+            "mtime": chunk.get("mtime"),
+            "checksum": chunk.get("checksum"),
+        }
+    return {k: v for k, v in payload.items() if v is not None}
+
+
+def _unique(values) -> List[Any]:
+    return [v for v in dict.fromkeys(values) if v is not None]
+
+
+def _chunk_hash(text: str) -> str:
+    """중복 청크 판정 키: 유니코드 정규화(NFKC) + 공백 정리 후 해시"""
+    normalized = " ".join(unicodedata.normalize("NFKC", text).split())
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def _filter_path_variants(path_prefix: Optional[str]) -> List[str]:
+    """
+    필터 경로 정규화. 절대경로는 /index와 같이 HOST_ROOT 아래로도 매칭
+    (/proj/docs → /proj/docs, /mnt/host/proj/docs)
+    """
+    if not path_prefix or not path_prefix.strip():
+        return []
+    p = posixpath.normpath(path_prefix.strip())
+    if p in ("/", "."):
+        return []
+    variants = [p]
+    if p.startswith("/") and not (p == HOST_ROOT or p.startswith(HOST_ROOT + "/")):
+        variants.append(posixpath.join(HOST_ROOT, p.lstrip("/")))
+    return variants
+
+
+def _filter_extensions(f: QueryFilter) -> List[str]:
+    return [e.strip().lower().lstrip(".") for e in f.extensions or [] if e.strip(" .")]
+
+
+def _qdrant_filter(f: Optional[QueryFilter]) -> Optional[qmodels.Filter]:
+    """QueryFilter → Qdrant Filter (payload 인덱스 필드만 사용)"""
+    if f is None:
+        return None
+    must: List[qmodels.Condition] = []
+    paths = _filter_path_variants(f.path_prefix)
+    if paths:
+        must.append(qmodels.FieldCondition(key="path_prefixes", match=qmodels.MatchAny(any=paths)))
+    extensions = _filter_extensions(f)
+    if extensions:
+        must.append(qmodels.FieldCondition(key="ext", match=qmodels.MatchAny(any=extensions)))
+    if f.modified_after is not None or f.modified_before is not None:
+        must.append(
+            qmodels.FieldCondition(
+                key="mtime", range=qmodels.Range(gte=f.modified_after, lt=f.modified_before)
+            )
+        )
+    return qmodels.Filter(must=must) if must else None
+
+
+def _lexical_filter(f: Optional[QueryFilter]) -> Dict[str, Any]:
+    """QueryFilter → LexicalIndex.search 필터 인자"""
+    if f is None:
+        return {}
+    return {
+        "path_prefixes": _filter_path_variants(f.path_prefix),
+        "extensions": ["." + e for e in _filter_extensions(f)],
+        "modified_after": f.modified_after,
+        "modified_before": f.modified_before,
+    }
+
+
+# 캐시/single-flight 키에 포함되는 검색 옵션 (filter는 별도 직렬화)
+_SCOPE_OPTION_FIELDS = set(RetrievalOptions.model_fields) - {"filter"}
+
+
+def _cache_scope(cols: List[str], body: Optional[RetrievalOptions]) -> str:
+    """
+    캐시 키용 컬렉션 범위: 컬렉션별 색인 버전 포함 (a@v3,b@v1)
+    재색인 시 버전이 올라가 해당 컬렉션의 이전 답변만 자연히 무효화 (TTL로 정리)
+    필터가 있으면 필터별로, 검색 옵션(hybrid/가중치/topk/컨텍스트 선택 등)이 있으면 옵션별로 분리
+    """
+    versions = db.get_index_versions(cols)
+    scope = ",".join(f"{c}@v{versions[c]}" for c in sorted(versions))
+    if body is None:
+        return scope
+    f = body.filter
+    if f is not None and _qdrant_filter(f) is not None:
+        scope = f"{scope}?{f.model_dump_json(exclude_none=True)}"
+    options = body.model_dump(include=_SCOPE_OPTION_FIELDS, exclude_none=True)
+    topk = getattr(body, "topk", None)
+    if topk and topk != RAG_TOPK:
+        options["topk"] = topk
+    if options:
+        scope = f"{scope}#{json.dumps(options, sort_keys=True)}"
+    return scope
+
+
 def _read_documents(path: str) -> List[Tuple[str, str]]:
     """
     지정 폴더에서 텍스트 파일 읽기. (md/txt)
@@ -324,62 +1515,219 @@ def _read_documents(path: str) -> List[Tuple[str, str]]:
     return out
 
 
+# -------- Background jobs --------
+_background_tasks: List[asyncio.Task] = []
+
+
+async def _rollup_loop():
+    """search_logs를 주기적으로 시간별 rollup (밀린 로그는 배치 단위로 연속 처리)"""
+    while True:
+        try:
+            while True:
+                result = await asyncio.to_thread(db.rollup_search_logs, RAG_ROLLUP_BATCH_SIZE)
+                if result["rolled_up"] < RAG_ROLLUP_BATCH_SIZE:
+                    break
+        except Exception as e:
+            logger.warning(f"Analytics rollup failed: {e}")
+        await asyncio.sleep(RAG_ROLLUP_INTERVAL)
+
+
+async def _maintenance_loop():
+    """분석 DB 점진적 유지보수 (단계마다 짧게 커밋하므로 검색 로그 기록을 오래 막지 않음)"""
+    while True:
+        await asyncio.sleep(RAG_MAINTENANCE_INTERVAL)
+        await asyncio.to_thread(db.maintenance.run)
+
+
+# 컬렉션 → 진행 중이거나 마지막으로 실행한 재임베딩
+_embedding_migrations: Dict[str, EmbeddingMigration] = {}
+
+
+def _start_embedding_migration(collection: str, auto: bool = True) -> EmbeddingMigration:
+    """
+    설정된 임베딩 모델로 shadow 컬렉션에 재임베딩을 백그라운드로 시작
+    - 이미 실행 중이면 그 작업 반환, 자동 시작(auto)은 프로세스당 컬렉션별 1회 (실패 시 수동 재시도)
+    """
+    current = _embedding_migrations.get(collection)
+    if current is not None and (current.running or auto):
+        return current
+    assert qdrant is not None
+    source = _physical(collection)
+    shadow = shadow_collection_name(collection, RAG_EMBEDDING_MODEL, source)
+
+    def create(target: str, dim: int):
+        assert qdrant is not None
+        qdrant.create_collection(
+            collection_name=target, **_create_kwargs(_collection_profile(collection), dim)
+        )
+        _ensure_payload_indexes(target)
+
+    async def embed(texts: List[str]) -> List[List[float]]:
+        async with httpx.AsyncClient() as client:
+            return await _embed_texts(client, texts)
+
+    def texts(ids: List[Any], payloads: List[Dict[str, Any]]) -> List[Optional[str]]:
+        # 원문은 chunk store, 이전 방식으로 색인된 point는 Qdrant payload의 text
+        found = chunk_store.get_chunks(collection, ids)
+        return [
+            found[pid]["text"] if pid in found else pl.get("text") for pid, pl in zip(ids, payloads)
+        ]
+
+    def swap(dim: int):
+        # Qdrant alias 교체가 기준 (실패하면 아무것도 바뀌지 않음) → 이후 (실제 컬렉션, 모델, 차원) 기록
+        # alias 도입 전 컬렉션은 alias를 만들며 삭제되므로 기록을 먼저 남김 (alias는 재확인 때 재시도)
+        old = _physical(collection)
+        if old == collection:
+            _set_collection_target(collection, shadow, RAG_EMBEDDING_MODEL, dim)
+        _point_alias(collection, shadow)
+        _set_collection_target(collection, shadow, RAG_EMBEDDING_MODEL, dim)
+        # 검색 결과가 바뀌므로 이 컬렉션의 캐시된 답변 무효화 후 warm-up
+        db.bump_index_version(collection)
+        cache_warmup.schedule(collection)
+        if old not in (shadow, collection) and RAG_EMBED_MIGRATION_DROP_DELAY >= 0:
+            _background_tasks.append(asyncio.create_task(_drop_collection_later(old)))
+
+    migration = EmbeddingMigration(
+        collection,
+        source,
+        shadow,
+        RAG_EMBEDDING_MODEL,
+        qdrant,
+        create=create,
+        embed=embed,
+        texts=texts,
+        swap=swap,
+        page_size=RAG_EMBED_MIGRATION_PAGE,
+        check=lambda: _check_source_model(collection),
+    )
+    _embedding_migrations[collection] = migration
+    _background_tasks[:] = [t for t in _background_tasks if not t.done()]
+    _background_tasks.append(asyncio.create_task(migration.run()))
+    return migration
+
+
+async def _check_source_model(collection: str):
+    """
+    재임베딩 전 확인: 교체 전까지 질의가 쓸 이전 모델을 임베딩 서비스가 아직 제공하는지
+    (EMBEDDING_ALLOWED_MODELS에 없으면 400 → 재임베딩 동안 질의가 모두 실패하므로 시작 거부)
+    """
+    target = _collection_target(collection)
+    model = target["model"] if target else None
+    if model is None or model == RAG_EMBEDDING_MODEL:
+        return
+    try:
+        async with httpx.AsyncClient() as client:
+            await _probe_embedding_dim(client, model)
+    except Exception as e:
+        message = (
+            f"Embedding service rejects '{model}', the current model of '{collection}'; add it "
+            f"to EMBEDDING_ALLOWED_MODELS so queries keep working during the re-embed ({e})"
+        )
+        logger.error(f"Embedding migration {collection} not started: {message}")
+        raise RuntimeError(message) from e
+
+
+async def _drop_collection_later(physical: str):
+    """alias 교체 전에 시작된 질의가 끝나도록 기다린 뒤 이전 컬렉션 삭제"""
+    await asyncio.sleep(RAG_EMBED_MIGRATION_DROP_DELAY)
+    try:
+        assert qdrant is not None
+        await asyncio.to_thread(qdrant.delete_collection, physical)
+        _payload_indexed.discard(physical)
+    except Exception as e:
+        logger.warning(f"Failed to drop old collection {physical}: {e}")
+
+
+def _start_pending_migrations():
+    """기록된 임베딩 모델이 설정과 다른 컬렉션 재임베딩 (기동 시)"""
+    for settings in db.list_collection_settings():
+        if settings["embedding_dim"] and settings["embedding_model"] != RAG_EMBEDDING_MODEL:
+            _start_embedding_migration(settings["collection"])
+
+
+async def _probe_qdrant() -> Dict[str, Any]:
+    assert qdrant is not None
+    await asyncio.to_thread(qdrant.get_collections)
+    return {}
+
+
+async def _probe_embedding() -> Dict[str, Any]:
+    """임베딩 서비스 /health (추론 없이 모델 로드 상태와 차원만 확인)"""
+    async with httpx.AsyncClient(timeout=RAG_HEALTH_TIMEOUT) as client:
+        resp = await client.get(f"{EMBEDDING_URL}/health")
+    if resp.status_code != 200:
+        raise RuntimeError(f"HTTP {resp.status_code}")
+    data = resp.json()
+    if data.get("ok") is False:
+        raise RuntimeError(data.get("error") or "Embedding model is not loaded yet")
+    return {"dim": data.get("dim") or EMBED_DIM}
+
+
+async def _probe_gateway() -> Dict[str, Any]:
+    async with httpx.AsyncClient(timeout=RAG_HEALTH_TIMEOUT) as client:
+        resp = await client.get(f"{RAG_LLM_API_BASE.rstrip('/v1')}/health")
+    if resp.status_code != 200:
+        raise RuntimeError(f"HTTP {resp.status_code}")
+    return {}
+
+
 # -------- Lifespan --------
 @app.on_event("startup")
 async def on_startup():
     global qdrant, EMBED_DIM
     qdrant = QdrantClient(url=QDRANT_URL, timeout=30.0)
+    # 토크나이저 로드 실패 시 근사치로 동작
+    await asyncio.to_thread(embed_tokens.load)
+    await asyncio.to_thread(chat_tokens.load)
     async with httpx.AsyncClient() as client:
         try:
             EMBED_DIM = await _probe_embedding_dim(client)
         except Exception:
             # 임베딩 서버가 아직 안 떠 있을 수 있음 -> 지연 초기화
             EMBED_DIM = None
+    analytics.start()
+    if RAG_ROLLUP_INTERVAL > 0:
+        _background_tasks.append(asyncio.create_task(_rollup_loop()))
+    if RAG_MAINTENANCE_INTERVAL > 0:
+        _background_tasks.append(asyncio.create_task(_maintenance_loop()))
+    if RAG_ALIAS_REFRESH_INTERVAL > 0:
+        _background_tasks.append(asyncio.create_task(_alias_refresh_loop()))
+    if RAG_EMBED_MIGRATION_AUTO:
+        _start_pending_migrations()
+    health_prober.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
+    cache_warmup.stop()
+    health_prober.stop()
+    # 큐에 남은 분석 데이터 기록
+    analytics.stop()
 
 
 # -------- Routes --------
 @app.get("/health")
-async def health(llm: bool = Query(False, description="LLM까지 점검하려면 true")):
+async def health(
+    llm: bool = Query(False, description="LLM까지 점검하려면 true"),
+    deep: bool = Query(False, description="캐시 대신 의존성을 지금 점검하려면 true"),
+):
     """
     RAG 서비스 헬스체크 (의존성 포함)
     - Qdrant, Embedding, API Gateway 연결 상태 확인
+    - 백그라운드 점검(RAG_HEALTH_INTERVAL) 결과를 그대로 반환 (deep=true 또는 점검 비활성 시 즉시 점검)
     - 의존성 실패 시 503 반환
     """
     from fastapi.responses import JSONResponse
 
-    # Qdrant 체크
-    q_ok = False
-    q_error = None
-    try:
-        assert qdrant is not None
-        _ = qdrant.get_collections()
-        q_ok = True
-    except Exception as e:
-        q_ok = False
-        q_error = str(e)[:100]
-
-    # 임베딩 체크
-    e_ok = False
-    e_error = None
-    dim = None
-    try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            dim = await _probe_embedding_dim(client)
-            e_ok = dim > 0
-    except Exception as e:
-        e_ok = False
-        e_error = str(e)[:100]
-
-    # API Gateway 체크
-    gw_ok = False
-    gw_error = None
-    try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            resp = await client.get(f"{RAG_LLM_API_BASE.rstrip('/v1')}/health")
-            gw_ok = resp.status_code == 200
-    except Exception as e:
-        gw_ok = False
-        gw_error = str(e)[:100]
+    cached = health_prober.running and not deep
+    deps = health_prober.snapshot() if cached else await health_prober.probe()
+    q_ok, e_ok, gw_ok = (
+        deps.get(name, {}).get("status") == "healthy"
+        for name in ("qdrant", "embedding", "api_gateway")
+    )
 
     # LLM 체크(옵션)
     l_ok = None
@@ -397,23 +1745,18 @@ async def health(llm: bool = Query(False, description="LLM까지 점검하려면
     status = "healthy"
     if not q_ok or not e_ok or not gw_ok:
         status = "degraded"
+    # 점검이 예정보다 밀린 캐시는 신뢰하지 않음
+    if any(dep.get("stale") for dep in deps.values()):
+        status = "degraded"
     if llm and l_ok is False:
         status = "degraded"
 
     response_body = {
         "status": status,
         "service": "rag",
+        "cached": cached,
         "dependencies": {
-            "qdrant": {"status": "healthy" if q_ok else "unhealthy", "error": q_error},
-            "embedding": {
-                "status": "healthy" if e_ok else "unhealthy",
-                "dim": dim,
-                "error": e_error,
-            },
-            "api_gateway": {
-                "status": "healthy" if gw_ok else "unhealthy",
-                "error": gw_error,
-            },
+            **deps,
             "llm": {
                 "status": (
                     "healthy" if l_ok else ("unhealthy" if l_ok is False else "not_checked")
@@ -427,6 +1770,11 @@ async def health(llm: bool = Query(False, description="LLM까지 점검하려면
             "RAG_CHUNK_OVERLAP": RAG_CHUNK_OVERLAP,
             "RAG_LLM_TIMEOUT": RAG_LLM_TIMEOUT,
             "RAG_LLM_MAX_TOKENS": RAG_LLM_MAX_TOKENS,
+            "RAG_HYBRID_ENABLED": RAG_HYBRID_ENABLED,
+            "RAG_COLLECTION_PROFILE": RAG_COLLECTION_PROFILE or None,
+            "RAG_PROMPT_LAYOUT": RAG_PROMPT_LAYOUT,
+            "embed_tokenizer": embed_tokens.backend,
+            "chat_tokenizer": chat_tokens.backend,
         },
     }
 
@@ -445,11 +1793,14 @@ async def health(llm: bool = Query(False, description="LLM까지 점검하려면
 async def index(
     collection: Optional[str] = Query(None, description="컬렉션 이름"),
     path: Optional[str] = Query(None, description="인덱싱할 경로 (절대경로 또는 상대경로)"),
+    profile: Optional[str] = Query(None, description="새 컬렉션 튜닝 프로파일"),
 ):
     """
     지정된 경로의 문서들을 인덱싱 - 전역 파일시스템 지원
     """
     col = collection or COLLECTION_DEFAULT
+    if profile and profile not in PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown profile '{profile}'")
 
     # 경로 결정: path가 주어지면 해당 경로, 아니면 기본 DOCUMENTS_DIR
     if path:
@@ -462,6 +1813,13 @@ async def index(
     else:
         target_dir = DOCUMENTS_DIR
 
+    migration = _embedding_migrations.get(col)
+    if migration is not None and migration.running:
+        # 재임베딩은 시작 시점의 point를 옮기므로 그 사이 색인은 교체 후 유실됨
+        raise HTTPException(
+            status_code=409, detail=f"Collection '{col}' is being re-embedded; retry after the swap"
+        )
+
     docs = _read_documents(target_dir)
 
     if not docs:
@@ -473,58 +1831,99 @@ async def index(
         if EMBED_DIM is None:
             EMBED_DIM = await _probe_embedding_dim(client)
 
-        _ensure_collection(col, EMBED_DIM)
+        # 교체 전이면 이전 컬렉션/모델로 색인 (재임베딩 시 함께 옮겨짐)
+        target = _ensure_collection(col, EMBED_DIM, profile)
+        embedding_model = _query_model(col, target)
+        _ensure_payload_indexes(target["physical"])
 
         all_chunks: List[str] = []
-        payloads: List[Dict[str, Any]] = []
+        payloads: List[Dict[str, Any]] = []  # chunk store 행 (원문 + 메타데이터)
 
-        chunk_tokens = RAG_CHUNK_SIZE
-        overlap_tokens = min(RAG_CHUNK_OVERLAP, RAG_CHUNK_SIZE - 8)
+        # 임베딩 모델 토큰 기준 (특수 토큰 [CLS]/[SEP] 여유분 제외)
+        chunk_tokens = min(RAG_CHUNK_SIZE, RAG_EMBED_MAX_TOKENS - 2)
+        overlap_tokens = min(RAG_CHUNK_OVERLAP, chunk_tokens - 8)
 
         pid = 0
+        canonical: Dict[str, int] = {}  # 정규화 텍스트 해시 → 대표 point id
         for doc_id, text in docs:
-            # Calculate document metadata
-            file_size = len(text.encode("utf-8"))
+            # 필터용 메타데이터 (checksum은 자르기 전 원문 기준)
             checksum = hashlib.sha256(text.encode()).hexdigest()[:16]
+            try:
+                mtime = os.path.getmtime(doc_id)
+            except OSError:
+                mtime = None
 
             # 너무 큰 문서 방어적 컷(선택)
-            if _approx_tokens(text) > 200_000:
-                text = text[:800_000]  # 대략 컷
-
-            # 1) 먼저 문장 단위로 전처리 (한국어 품질 향상)
-            sentences = _split_sentences_ko(text, max_chars=400)
-            text = "\n".join(sentences)
-
-            # 2) 기존 슬라이딩 청크 적용
-            chunks = _sliding_chunks(text, chunk_tokens, overlap_tokens)
-            for i, ch in enumerate(chunks):
-                all_chunks.append(ch)
-                payloads.append(
-                    {
-                        "point_id": pid,  # Use integer ID instead of string
-                        "doc_id": doc_id,
-                        "chunk_id": i,
-                        "text": ch,
-                        "source": doc_id,
-                    }
-                )
+            if len(text) > 800_000:
+                text = text[:800_000]
+
+            # 토큰 오프셋 기반 청킹 (문장 경계 스냅, 원문 char 오프셋 기록)
+            spans = embed_tokens.chunk_spans(text, chunk_tokens, overlap_tokens)
+            for i, (char_start, char_end) in enumerate(spans):
+                ch = text[char_start:char_end]
+                payload = {
+                    "point_id": pid,  # Use integer ID instead of string
+                    "doc_id": doc_id,
+                    "chunk_id": i,
+                    "text": ch,
+                    "source": doc_id,
+                    "char_start": char_start,
+                    "char_end": char_end,
+                    "mtime": mtime,
+                    "checksum": checksum,
+                }
+                # 라이선스 헤더/템플릿 등 이미 나온 청크는 임베딩 없이 대표 point 참조만
+                # (point id는 문서 내 위치 번호로 계속 증가 → 이웃 청크 확장 유지)
+                key = _chunk_hash(ch)
+                if key in canonical:
+                    payload["canonical_id"] = canonical[key]
+                else:
+                    canonical[key] = pid
+                    all_chunks.append(ch)
+                payloads.append(payload)
                 pid += 1
 
         if not all_chunks:
             return IndexResponse(collection=col, chunks=0)
 
+        unique = [pl for pl in payloads if "canonical_id" not in pl]
+        duplicates: Dict[int, List[Dict[str, Any]]] = {}
+        for pl in payloads:
+            if "canonical_id" in pl:
+                duplicates.setdefault(pl["canonical_id"], []).append(pl)
+
         # 임베딩 (배치 처리)
         # 너무 길면 끊어서
         batch = 64
         embeddings: List[List[float]] = []
         for i in range(0, len(all_chunks), batch):
-            eb = await _embed_texts(client, all_chunks[i : i + batch])
+            eb = await _embed_texts(client, all_chunks[i : i + batch], embedding_model)
             embeddings.extend(eb)
 
-        _upsert_points(col, embeddings, payloads)
+        # 원문은 chunk store에 (중복 청크는 참조만), Qdrant에는 벡터 + 필터용 필드만
+        chunk_store.put_chunks(col, payloads)
+        _upsert_points(
+            target["physical"],
+            embeddings,
+            [_qdrant_payload(pl, duplicates.get(pl["point_id"])) for pl in unique],
+        )
+
+        # 렉시컬(BM25) 인덱스에도 동일 point_id로 색인
+        lexical.index_chunks(
+            col, [(pl["point_id"], pl["doc_id"], pl["text"], pl["mtime"]) for pl in unique]
+        )
+
+        # 이전 색인에서 같은 자리에 남은 point/렉시컬 행 제거 (중복 자리는 벡터가 없어야 함)
+        ref_ids = [pl["point_id"] for pl in payloads if "canonical_id" in pl]
+        if ref_ids:
+            _delete_points(target["physical"], ref_ids)
+            lexical.delete_points(col, ref_ids)
+
+        # 색인 버전 증가 → 이 컬렉션의 캐시된 답변만 무효화, 자주 묻는 질의는 다시 채움
+        db.bump_index_version(col)
+        cache_warmup.schedule(col)
 
         # Update document metadata for each processed document
-        embedding_model = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
         doc_chunks = {}
         for pl in payloads:
             doc_id = pl["doc_id"]
@@ -546,24 +1945,37 @@ async def index(
                     checksum=checksum,
                 )
 
-        return IndexResponse(collection=col, chunks=len(all_chunks))
+        return IndexResponse(
+            collection=col,
+            chunks=len(payloads),
+            unique_chunks=len(unique),
+            dedup_ratio=round(1 - len(unique) / len(payloads), 4),
+        )
 
 
 @app.post("/query", response_model=QueryResponse)
-async def query(body: QueryRequest):
+async def query(
+    body: QueryRequest,
+    deadline_ms: Optional[str] = Header(None, alias=DEADLINE_HEADER),
+):
     """
     질의 → 임베딩 → Qdrant 검색 → 컨텍스트 구성 → LLM 답변
     Performance optimized with caching and analytics
+    X-Request-Deadline-Ms: 남은 시간(ms). 단계별 예산을 그 안에서 배분하고,
+    LLM 예산이 모자라면 답변 없이 컨텍스트만 degraded=true로 반환
     """
     start_time = time.time()
-    col = body.collection or COLLECTION_DEFAULT
+    _deadline_from_header(deadline_ms)
+    cols = _resolve_collections(body)
+    col = _collection_key(cols)
+    cache_key = _cache_scope(cols, body)
     topk = body.topk or RAG_TOPK
     q = (body.query or "").strip()
     if not q:
         return QueryResponse(answer="", context=[], usage={"error": "empty query"})
 
     # Check cache first
-    cached_result = db.get_cached_query(q, col)
+    cached_result = db.get_cached_query(q, cache_key)
     if cached_result:
         response_time_ms = int((time.time() - start_time) * 1000)
         return QueryResponse(
@@ -574,102 +1986,883 @@ async def query(body: QueryRequest):
             response_time_ms=response_time_ms,
         )
 
-    async with httpx.AsyncClient() as client:
-        # embed dim lazy init
-        global EMBED_DIM
-        if EMBED_DIM is None:
-            EMBED_DIM = await _probe_embedding_dim(client)
+    flight_key = _flight_key(q, cache_key)
 
-        # ensure collection 존재
-        _ensure_collection(col, EMBED_DIM)
+    async def generate() -> QueryResponse:
+        async with httpx.AsyncClient() as client:
+            hits, timings = await _retrieve(client, q, cols, _fetch_k(topk, body), body)
+            hits, selection = _select_context(hits, topk, body)
+            hits, selection["neighbor_chunks"] = await _expand_neighbors(hits, body)
+            ctx_texts = _pack_context(hits)
 
-        # Time embedding
-        embed_start = time.time()
-        qvec = (await _embed_texts(client, [q]))[0]
-        embed_time_ms = (time.time() - embed_start) * 1000
+            # Time LLM response
+            llm_start = time.time()
+            system, user, slot = _build_prompt(q, hits, ctx_texts)
+            # 자기 deadline이 먼저 끝난 대기자는 이 검색 결과로 degraded 응답을 만듦
+            _flight_retrievals[flight_key] = (hits, ctx_texts, timings)
+            try:
+                with _deadline_stage("llm"):
+                    answer, usage = await _llm_answer(
+                        client, system, user, slot, timeout=_llm_timeout()
+                    )
+            except DeadlineExceeded as e:
+                # degraded 응답은 공유/linger하지 않고 호출자별로 생성
+                raise _LLMDeadlineExceeded(e.stage, hits, ctx_texts, timings) from e
+            finally:
+                _flight_retrievals.pop(flight_key, None)
+            timings["llm_response_time_ms"] = int((time.time() - llm_start) * 1000)
+            usage = {**usage, **selection}
+
+            # Calculate total response time
+            total_time_ms = int((time.time() - start_time) * 1000)
+
+            # 응답에 참고 문맥 정보 반환
+            ctx_out = _context_out(hits)
+            _record_answer(
+                q, col, answer, ctx_out, usage, hits, ctx_texts, timings, total_time_ms, cache_key
+            )
+
+            return QueryResponse(
+                answer=answer,
+                context=ctx_out,
+                usage=usage,
+                cached=False,
+                response_time_ms=total_time_ms,
+            )
+
+    # 같은 질의가 동시에 들어오면 생성 1회를 공유 (대기는 호출자별 deadline까지)
+    try:
+        response, shared = await _coalesced(flight_key, generate)
+    except LimiterFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except _LLMDeadlineExceeded as e:
+        return _degraded_response(e.hits, e.ctx_texts, e.timings, start_time, e.stage)
+    except DeadlineExceeded as e:
+        # 검색 단계에서 deadline 초과: 돌려줄 컨텍스트도 없음
+        raise HTTPException(status_code=504, detail=str(e))
+    if shared:
+        return response.model_copy(
+            update={
+                "usage": {**response.usage, "coalesced": True},
+                "response_time_ms": int((time.time() - start_time) * 1000),
+            }
+        )
+    return response
 
-        # Time vector search
-        search_start = time.time()
-        hits = _search(col, qvec, topk)
-        search_time_ms = (time.time() - search_start) * 1000
-
-        # 컨텍스트 구성(길이 제한 방어)
-        ctx_texts = []
-        total_tokens = 0
-        budget = 1200  # 프롬프트 컨텍스트 예산(모델 ctx 2048 기준 안전치)
-        for h in hits:
-            t = h.get("text", "")
-            t_tokens = _approx_tokens(t)
-            if total_tokens + t_tokens > budget:
-                # 너무 길면 자르기
-                remain = max(0, budget - total_tokens)
-                if remain > 0:
-                    approx_chars = remain * 4
-                    t = t[:approx_chars]
-                    t_tokens = _approx_tokens(t)
-                else:
-                    break
-            ctx_texts.append(t)
-            total_tokens += t_tokens
 
-        system_msg = (
-            "You are a concise assistant. Use ONLY the provided context to answer. "
-            "If the answer is not in the context, say you don't know."
-        )
-        user_msg = (
-            "Question:\n"
-            f"{q}\n\n"
-            "Context:\n"
-            + "\n\n".join([f"[{i+1}] {c}" for i, c in enumerate(ctx_texts)])
-            + "\n\nAnswer in Korean."
-        )
+class _LLMDeadlineExceeded(DeadlineExceeded):
+    """LLM 단계 deadline 초과: 호출자별 degraded 응답을 만들 검색 결과를 함께 전달"""
 
-        # Time LLM response
-        llm_start = time.time()
-        answer, usage = await _llm_answer(client, system_msg, user_msg)
-        llm_time_ms = int((time.time() - llm_start) * 1000)
+    def __init__(
+        self,
+        stage: str,
+        hits: List[Dict[str, Any]],
+        ctx_texts: List[str],
+        timings: Dict[str, float],
+    ):
+        super().__init__(stage)
+        self.hits = hits
+        self.ctx_texts = ctx_texts
+        self.timings = timings
 
-        # Calculate total response time
-        total_time_ms = int((time.time() - start_time) * 1000)
 
-        # 응답에 참고 문맥 정보 반환
-        ctx_out = [
-            {
-                "score": h.get("score", 0.0),
-                "doc_id": h.get("doc_id"),
-                "chunk_id": h.get("chunk_id"),
-            }
-            for h in hits
-        ]
+# single-flight 키 → 리더의 검색 결과 (LLM 생성 중에만 유지)
+_flight_retrievals: Dict[str, Tuple[List[Dict[str, Any]], List[str], Dict[str, float]]] = {}
 
-        # Cache the result for future queries
-        db.cache_query(q, col, answer, ctx_out, ttl_hours=6)  # Cache for 6 hours
 
-        # Log search analytics
-        db.log_search(
-            collection=col,
-            query=q,
-            results_count=len(hits),
-            response_time_ms=total_time_ms,
-            llm_tokens_used=usage.get("total_tokens", 0),
-            embedding_time_ms=int(embed_time_ms),
-            vector_search_time_ms=int(search_time_ms),
-            llm_response_time_ms=llm_time_ms,
-            context_length=len("\n".join(ctx_texts)),
-        )
+async def _coalesced(
+    key: str, generate: Callable[[], Awaitable[QueryResponse]]
+) -> Tuple[QueryResponse, bool]:
+    """
+    llm_flights로 생성 1회를 공유하되 deadline은 호출자별로 적용
+    - 대기는 자기 LLM 예산까지만: 넘으면 리더의 검색 결과로 _LLMDeadlineExceeded
+      (검색 전이면 DeadlineExceeded)
+    - 리더의 LLM deadline 초과는 결과로 공유/linger되지 않음:
+      자기 예산이 남은 대기자(deadline 없음 포함)는 새 flight로 한 번 더 시도
+    """
+    retries = 1
+    while True:
+        deadline = current_deadline.get()
+        try:
+            # 예약분 없이 남은 시간 전체: 리더는 자기 LLM 타임아웃(예약분 제외)이 먼저 발동
+            timeout = stage_timeout("llm", None)
+            return await asyncio.wait_for(llm_flights.do(key, generate), timeout)
+        except asyncio.TimeoutError:
+            if deadline is None:
+                raise
+            record_miss("llm")
+            retrieval = _flight_retrievals.get(key)
+            if retrieval is None:
+                raise DeadlineExceeded("llm")
+            raise _LLMDeadlineExceeded("llm", *retrieval)
+        except _LLMDeadlineExceeded:
+            budget_left = (RAG_DEADLINE_LLM_MIN_MS + RAG_DEADLINE_RESERVE_MS) / 1000
+            if retries == 0 or (deadline is not None and deadline.remaining() <= budget_left):
+                raise
+            retries -= 1
+
+
+def _degraded_response(
+    hits: List[Dict[str, Any]],
+    ctx_texts: List[str],
+    timings: Dict[str, float],
+    start_time: float,
+    stage: str,
+) -> QueryResponse:
+    """LLM 예산 부족: 답변 없이 검색 컨텍스트(원문/오프셋 포함)만 반환, 캐시하지 않음"""
+    return QueryResponse(
+        answer="",
+        context=_search_out(hits, ctx_texts),
+        usage={
+            "degraded": True,
+            "deadline_stage": stage,
+            **{k: int(v) for k, v in timings.items()},
+        },
+        cached=False,
+        degraded=True,
+        response_time_ms=int((time.time() - start_time) * 1000),
+    )
+
 
-        # Track document access for analytics
-        for h in hits:
-            if h.get("doc_id"):
-                db.track_document_access(h["doc_id"])
+def _flight_key(q: str, cache_key: str) -> str:
+    """single-flight 키: 캐시 키와 같은 기준 (컬렉션 범위 + 대소문자 무시 질의)"""
+    return f"{cache_key}::{q.lower()}"
 
+
+async def _warm_answer(q: str, cols: List[str]) -> bool:
+    """
+    cache warm-up: 기본 옵션 질의의 답변을 미리 만들어 캐시에만 기록 (search_logs에는 남기지 않음)
+    - 이미 캐시돼 있으면 False, 같은 질의가 진행 중이면 그 결과를 공유
+    - LLM 대기열 상한 없이 대기 (warm-up은 사용자 호출이 없을 때만 시작)
+    """
+    body = QueryRequest(query=q, collections=cols)
+    cache_key = _cache_scope(cols, body)
+    if db.get_cached_query(q, cache_key):
+        return False
+    topk = RAG_TOPK
+
+    async def generate() -> QueryResponse:
+        start_time = time.time()
+        async with httpx.AsyncClient() as client:
+            hits, _ = await _retrieve(client, q, cols, _fetch_k(topk, body), body)
+            hits, selection = _select_context(hits, topk, body)
+            hits, selection["neighbor_chunks"] = await _expand_neighbors(hits, body)
+            ctx_texts = _pack_context(hits)
+            answer, usage = await _llm_answer(
+                client, *_build_prompt(q, hits, ctx_texts), bounded=False
+            )
+        ctx_out = _context_out(hits)
+        analytics.cache_query(q, cache_key, answer, ctx_out, ttl_hours=RAG_CACHE_TTL_HOURS)
         return QueryResponse(
             answer=answer,
             context=ctx_out,
-            usage=usage,
-            cached=False,
-            response_time_ms=total_time_ms,
+            usage={**usage, **selection},
+            response_time_ms=int((time.time() - start_time) * 1000),
+        )
+
+    await _coalesced(_flight_key(q, cache_key), generate)
+    return True
+
+
+def _sse(data: Any, event: Optional[str] = None) -> str:
+    """Server-sent event 한 건 직렬화"""
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {payload}\n\n"
+
+
+@app.post("/query/stream")
+async def query_stream(
+    body: QueryRequest,
+    deadline_ms: Optional[str] = Header(None, alias=DEADLINE_HEADER),
+):
+    """
+    /query의 SSE 스트리밍 버전
+    - event: context → 검색된 컨텍스트 메타데이터
+    - data: {...}    → 게이트웨이 토큰 델타 (OpenAI chunk 포맷 그대로 전달)
+    - event: usage   → 사용량/지연시간 (deadline 초과 시 degraded=true, 캐시하지 않음)
+    - data: [DONE]
+    - 헤더 전송 후 오류(409, 게이트웨이 오류/연결 끊김 등)는 error usage 이벤트 + [DONE]으로 종료
+    """
+    start_time = time.time()
+    cols = _resolve_collections(body)
+    col = _collection_key(cols)
+    cache_key = _cache_scope(cols, body)
+    topk = body.topk or RAG_TOPK
+    q = (body.query or "").strip()
+
+    async def events() -> AsyncIterator[str]:
+        _deadline_from_header(deadline_ms)
+        if not q:
+            yield _sse({"usage": {"error": "empty query"}}, event="usage")
+            yield _sse("[DONE]")
+            return
+
+        cached_result = db.get_cached_query(q, cache_key)
+        if cached_result:
+            yield _sse({"context": cached_result["context_data"], "cached": True}, "context")
+            yield _sse({"choices": [{"index": 0, "delta": {"content": cached_result["response"]}}]})
+            yield _sse(
+                {
+                    "usage": {"cached": True, "cached_at": cached_result["cached_at"]},
+                    "cached": True,
+                    "response_time_ms": int((time.time() - start_time) * 1000),
+                },
+                event="usage",
+            )
+            yield _sse("[DONE]")
+            return
+
+        async with httpx.AsyncClient() as client:
+            try:
+                hits, timings = await _retrieve(client, q, cols, _fetch_k(topk, body), body)
+            except DeadlineExceeded as e:
+                yield _sse({"usage": {"error": str(e)}, "degraded": True}, event="usage")
+                yield _sse("[DONE]")
+                return
+            hits, selection = _select_context(hits, topk, body)
+            hits, selection["neighbor_chunks"] = await _expand_neighbors(hits, body)
+            ctx_texts = _pack_context(hits)
+            ctx_out = _context_out(hits)
+            yield _sse({"context": ctx_out, "cached": False}, event="context")
+
+            llm_start = time.time()
+            first_token_ms = None
+            parts: List[str] = []
+            usage: Dict[str, Any] = {}
+            system, user, slot = _build_prompt(q, hits, ctx_texts)
+            degraded_stage = None
+            deadline = current_deadline.get()
+            try:
+                with _deadline_stage("llm"):
+                    stream = _llm_stream(client, system, user, slot, _llm_timeout())
+                    async with aclosing(stream):
+                        async for chunk in stream:
+                            if chunk.get("usage"):
+                                usage = _with_cached_tokens(chunk["usage"], chunk)
+                            for choice in chunk.get("choices") or []:
+                                delta = (choice.get("delta") or {}).get("content")
+                                if delta:
+                                    if first_token_ms is None:
+                                        first_token_ms = int((time.time() - start_time) * 1000)
+                                    parts.append(delta)
+                            if chunk.get("choices"):
+                                yield _sse(chunk)
+                            if deadline and deadline.remaining() <= RAG_DEADLINE_RESERVE_MS / 1000:
+                                # 남은 생성은 버리고 여기까지 보낸 부분 답변으로 종료
+                                record_miss("llm")
+                                degraded_stage = "llm"
+                                break
+            except LimiterFull as e:
+                # 스트림 시작 전 대기열 초과: 이미 보낸 context 이후 오류 usage로 종료
+                yield _sse({"usage": {"error": str(e)}, "cached": False}, event="usage")
+                yield _sse("[DONE]")
+                return
+            except DeadlineExceeded as e:
+                degraded_stage = e.stage
+            if degraded_stage:
+                yield _sse(
+                    {
+                        "usage": {**usage, "deadline_stage": degraded_stage},
+                        "cached": False,
+                        "degraded": True,
+                        "time_to_first_token_ms": first_token_ms,
+                        "response_time_ms": int((time.time() - start_time) * 1000),
+                    },
+                    event="usage",
+                )
+                yield _sse("[DONE]")
+                return
+            timings["llm_response_time_ms"] = int((time.time() - llm_start) * 1000)
+            usage = {**usage, **selection}
+
+            total_time_ms = int((time.time() - start_time) * 1000)
+            answer = "".join(parts)
+            # 스트림이 끝까지 완료된 경우에만 캐시 기록
+            _record_answer(
+                q, col, answer, ctx_out, usage, hits, ctx_texts, timings, total_time_ms, cache_key
+            )
+
+            yield _sse(
+                {
+                    "usage": usage,
+                    "cached": False,
+                    "time_to_first_token_ms": first_token_ms,
+                    "response_time_ms": total_time_ms,
+                },
+                event="usage",
+            )
+            yield _sse("[DONE]")
+
+    async def guarded() -> AsyncIterator[str]:
+        stream = events()
+        async with aclosing(stream):
+            try:
+                async for event in stream:
+                    yield event
+            except Exception as e:
+                error = getattr(e, "detail", None) or str(e) or type(e).__name__
+                logger.warning(f"Query stream failed after headers were sent: {error}")
+                yield _sse(
+                    {
+                        "usage": {"error": error},
+                        "cached": False,
+                        "response_time_ms": int((time.time() - start_time) * 1000),
+                    },
+                    event="usage",
+                )
+                yield _sse("[DONE]")
+
+    return StreamingResponse(
+        guarded(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/query/batch")
+async def query_batch(body: BatchQueryRequest):
+    """
+    오프라인 평가/대량 Q&A용 배치 질의 (NDJSON 스트리밍, 입력 순서 유지)
+    - RAG_BATCH_WINDOW개 질의마다 임베딩 1회 + Qdrant batch search 1회
+    - LLM 답변은 concurrency 만큼 동시 실행
+    - 줄마다 {"index", "query", "answer", "context", "usage", "cached", "error"}
+    """
+    col = body.collection or COLLECTION_DEFAULT
+    cache_key = _cache_scope([col], body)
+    qdrant_filter = _qdrant_filter(body.filter)
+    topk = body.topk or RAG_TOPK
+    queries = [(q or "").strip() for q in body.queries]
+    semaphore = asyncio.Semaphore(body.concurrency or RAG_BATCH_CONCURRENCY)
+    fetch_k = _fetch_k(topk, body)
+    hybrid, dense_weight, lexical_weight, candidates = _retrieval_options(body, fetch_k)
+    results: Dict[int, asyncio.Future] = {}  # index → NDJSON line
+    tasks: List[asyncio.Task] = []
+
+    def line(index: int, **fields) -> str:
+        row = {
+            "index": index,
+            "query": queries[index],
+            "answer": "",
+            "context": [],
+            "usage": {},
+            "cached": False,
+            "error": None,
+        }
+        row.update(fields)
+        return json.dumps(row, ensure_ascii=False) + "\n"
+
+    async def answer_one(
+        client: httpx.AsyncClient, index: int, hits: List[Dict[str, Any]], timings: Dict
+    ) -> str:
+        q = queries[index]
+        start_time = time.time()
+        try:
+            await _fill_missing_payloads(hits)
+            hits, selection = _select_context(hits, topk, body)
+            hits, selection["neighbor_chunks"] = await _expand_neighbors(hits, body)
+            ctx_texts = _pack_context(hits)
+            async with semaphore:
+                llm_start = time.time()
+                answer, usage = await _llm_answer(
+                    client, *_build_prompt(q, hits, ctx_texts), bounded=False
+                )
+            timings = {**timings, "llm_response_time_ms": (time.time() - llm_start) * 1000}
+            usage = {**usage, **selection}
+            ctx_out = _context_out(hits)
+            total_time_ms = int((time.time() - start_time) * 1000)
+            _record_answer(
+                q, col, answer, ctx_out, usage, hits, ctx_texts, timings, total_time_ms, cache_key
+            )
+            return line(index, answer=answer, context=ctx_out, usage=usage)
+        except Exception as e:
+            return line(index, error=str(e)[:200])
+
+    async def produce(client: httpx.AsyncClient, out: asyncio.Queue):
+        """윈도우 단위로 검색하고 질의별 답변 task를 입력 순서대로 큐에 넣음"""
+        global EMBED_DIM
+        try:
+            if EMBED_DIM is None:
+                EMBED_DIM = await _probe_embedding_dim(client)
+            target = _ensure_collection(col, EMBED_DIM)
+            model = _query_model(col, target)
+        except Exception as e:
+            for i in range(len(queries)):
+                await out.put(line(i, error=str(e)[:200]))
+            await out.put(None)
+            return
+
+        # 예외로 중단돼도 모든 질의에 한 줄씩 내보내고 종료 표시(None)는 항상 넣음
+        queued = 0  # 큐에 넣은 질의 수 (입력 순서)
+        scheduled: Set[int] = set()  # 답변 task가 results[i]를 채울 질의
+        try:
+            for start in range(0, len(queries), RAG_BATCH_WINDOW):
+                window = list(range(start, min(start + RAG_BATCH_WINDOW, len(queries))))
+                pending: List[int] = []
+                for i in window:
+                    if not queries[i]:
+                        await out.put(line(i, usage={"error": "empty query"}))
+                        queued = i + 1
+                        continue
+                    cached = db.get_cached_query(queries[i], cache_key) if body.use_cache else None
+                    if cached:
+                        await out.put(
+                            line(
+                                i,
+                                answer=cached["response"],
+                                context=cached["context_data"],
+                                usage={"cached": True, "cached_at": cached["cached_at"]},
+                                cached=True,
+                            )
+                        )
+                        queued = i + 1
+                        continue
+                    pending.append(i)
+                    # 순서 유지를 위해 index 자리 표시를 먼저 큐에 넣음 (결과는 results[i])
+                    await out.put(i)
+                    queued = i + 1
+
+                if not pending:
+                    continue
+                texts = [queries[i] for i in pending]
+                lexical_task = (
+                    asyncio.gather(
+                        *(_lexical_search(col, t, candidates, body.filter) for t in texts)
+                    )
+                    if hybrid
+                    else None
+                )
+                try:
+                    embed_start = time.time()
+                    vecs = await _embed_texts(client, texts, model)
+                    embed_ms = (time.time() - embed_start) * 1000
+                    search_start = time.time()
+                    dense_lists = await asyncio.to_thread(
+                        _search_batch,
+                        target["physical"],
+                        vecs,
+                        candidates if hybrid else fetch_k,
+                        _search_params(col, body),
+                        qdrant_filter,
+                    )
+                    search_ms = (time.time() - search_start) * 1000
+                    lexical_lists = await lexical_task if lexical_task else None
+                except Exception as e:
+                    if lexical_task is not None:
+                        lexical_task.cancel()
+                    for i in pending:
+                        results[i].set_result(line(i, error=str(e)[:200]))
+                    continue
+
+                timings = {
+                    "embedding_time_ms": embed_ms / len(pending),
+                    "vector_search_time_ms": search_ms / len(pending),
+                }
+                for n, i in enumerate(pending):
+                    if hybrid:
+                        hits = _fuse_hits(
+                            col,
+                            dense_lists[n],
+                            lexical_lists[n],
+                            dense_weight,
+                            lexical_weight,
+                            fetch_k,
+                        )
+                    else:
+                        hits = [{**h, "collection": col} for h in dense_lists[n][:fetch_k]]
+                    task = asyncio.ensure_future(answer_one(client, i, hits, timings))
+                    tasks.append(task)
+                    scheduled.add(i)
+                    task.add_done_callback(
+                        lambda t, i=i: results[i].done()
+                        or results[i].set_result(
+                            t.result() if not t.cancelled() else line(i, error="cancelled")
+                        )
+                    )
+        except Exception as e:
+            error = str(e)[:200]
+            logger.warning(f"Batch query producer failed at query {queued}: {error}")
+            for i in range(queued):
+                if i not in scheduled and not results[i].done():
+                    results[i].set_result(line(i, error=error))
+            for i in range(queued, len(queries)):
+                await out.put(line(i, error=error))
+        finally:
+            await out.put(None)
+
+    async def stream() -> AsyncIterator[str]:
+        out: asyncio.Queue = asyncio.Queue()
+        async with httpx.AsyncClient() as client:
+            loop = asyncio.get_running_loop()
+            for i in range(len(queries)):
+                results[i] = loop.create_future()
+            producer = asyncio.ensure_future(produce(client, out))
+            try:
+                while True:
+                    item = await out.get()
+                    if item is None:
+                        break
+                    yield item if isinstance(item, str) else await results[item]
+            finally:
+                # 클라이언트가 끊기면 남은 LLM 호출도 중단
+                producer.cancel()
+                for task in tasks:
+                    task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/search", response_model=SearchResponse)
+async def search(
+    body: SearchRequest,
+    deadline_ms: Optional[str] = Header(None, alias=DEADLINE_HEADER),
+):
+    """
+    검색 전용: 임베딩 → (hybrid) 검색 → 컨텍스트 패킹까지만 수행하고 LLM은 호출하지 않음
+    - 점수/원문/오프셋이 포함된 청크 반환 (도구 호출, CLI용)
+    - 답변 캐시와 별도 키("search|...")로 캐시
+    - X-Request-Deadline-Ms 안에 검색을 끝내지 못하면 504
+    """
+    start_time = time.time()
+    _deadline_from_header(deadline_ms)
+    cols = _resolve_collections(body)
+    topk = body.topk or RAG_TOPK
+    budget = body.budget or CONTEXT_TOKEN_BUDGET
+    q = (body.query or "").strip()
+    if not q:
+        return SearchResponse(results=[], usage={"error": "empty query"})
+
+    cache_key = f"search|{_cache_scope(cols, body)}|{topk}|{budget}"
+    cached_result = db.get_cached_query(q, cache_key)
+    if cached_result:
+        return SearchResponse(
+            results=cached_result["context_data"],
+            usage={"cached": True, "cached_at": cached_result["cached_at"]},
+            cached=True,
+            response_time_ms=int((time.time() - start_time) * 1000),
+        )
+
+    try:
+        async with httpx.AsyncClient() as client:
+            hits, timings = await _retrieve(client, q, cols, _fetch_k(topk, body), body)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    hits, selection = _select_context(hits, topk, body)
+    hits, selection["neighbor_chunks"] = await _expand_neighbors(hits, body, budget)
+    results = _search_out(hits, _pack_context(hits, budget))
+    analytics.cache_query(q, cache_key, "", results, ttl_hours=RAG_CACHE_TTL_HOURS)
+
+    return SearchResponse(
+        results=results,
+        usage={"total_tokens": 0, **{k: int(v) for k, v in timings.items()}, **selection},
+        cached=False,
+        response_time_ms=int((time.time() - start_time) * 1000),
+    )
+
+
+@app.get("/collections/profiles")
+async def list_collection_profiles():
+    """사용 가능한 컬렉션 튜닝 프로파일"""
+    return {"default": RAG_COLLECTION_PROFILE or None, "profiles": PROFILES}
+
+
+@app.post("/collections/{name}/profile")
+async def apply_collection_profile(
+    name: str, profile: str = Query(..., description="latency / balanced / memory")
+):
+    """
+    기존 컬렉션에 튜닝 프로파일 적용 (관리용)
+    - HNSW/on-disk/양자화 설정 변경, 재색인은 Qdrant optimizer가 백그라운드로 수행
+    - 이후 질의는 프로파일의 hnsw_ef/rescore 기본값 사용
+    """
+    if profile not in PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown profile '{profile}'")
+    assert qdrant is not None
+    physical = _physical(name)
+    if not qdrant.collection_exists(physical):
+        raise HTTPException(status_code=404, detail=f"Collection '{name}' not found")
+    qdrant.update_collection(
+        collection_name=physical, **update_collection_kwargs(get_profile(profile))
+    )
+    _set_collection_profile(name, profile)
+    return {"collection": name, "profile": PROFILES[profile]}
+
+
+@app.get("/collections/{name}/embedding")
+async def collection_embedding(name: str):
+    """컬렉션의 임베딩 모델/차원/실제 Qdrant 컬렉션과 재임베딩 진행 상황"""
+    migration = _embedding_migrations.get(name)
+    return {
+        "collection": name,
+        "configured_model": RAG_EMBEDDING_MODEL,
+        "current": _collection_target(name),
+        "migration": migration.progress() if migration else None,
+    }
+
+
+@app.post("/collections/{name}/migrate")
+async def migrate_collection(name: str):
+    """
+    설정된 임베딩 모델(EMBEDDING_MODEL)로 재임베딩 시작 (관리용)
+    - shadow 컬렉션에 재임베딩 후 alias 교체, 교체 전까지 질의는 이전 컬렉션/모델 사용
+    - 진행 상황은 GET /collections/{name}/embedding
+    """
+    global EMBED_DIM
+    assert qdrant is not None
+    current = _collection_target(name)
+    if current is None:
+        # 모델/차원 기록 전의 기존 컬렉션은 지금 기록
+        if not qdrant.collection_exists(name):
+            raise HTTPException(status_code=404, detail=f"Collection '{name}' not found")
+        if EMBED_DIM is None:
+            async with httpx.AsyncClient() as client:
+                EMBED_DIM = await _probe_embedding_dim(client)
+        current = _ensure_collection(name, EMBED_DIM)
+    if current["model"] == RAG_EMBEDDING_MODEL:
+        return {"message": "Already on the configured model", "current": current}
+    running = _embedding_migrations.get(name)
+    if running is None or not running.running:
+        try:
+            await _check_source_model(name)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    migration = _start_embedding_migration(name, auto=False)
+    return {"message": "Migration started", **migration.progress()}
+
+
+# 스냅샷 documents 블록 필드 (document_metadata 행)
+SNAPSHOT_DOCUMENT_FIELDS = (
+    "doc_id",
+    "filename",
+    "file_size",
+    "chunk_count",
+    "indexed_at",
+    "last_accessed",
+    "access_count",
+    "embedding_model",
+    "checksum",
+)
+
+
+def _export_snapshot(name: str, path: str) -> Dict[str, Any]:
+    """
+    컬렉션 → 스냅샷 파일 (Qdrant 벡터/payload, chunk store 원문/참조, document_metadata)
+    - Qdrant는 RAG_SNAPSHOT_PAGE개씩 scroll, chunk store도 페이지 단위 → 메모리는 페이지 크기
+    """
+    assert qdrant is not None
+    target = _collection_target(name)
+    physical = target["physical"] if target else name
+    if not qdrant.collection_exists(physical):
+        raise HTTPException(status_code=404, detail=f"Collection '{name}' not found")
+    dim = target["dim"] if target else _vector_size(physical)
+    if not dim:
+        raise HTTPException(status_code=422, detail=f"Collection '{name}' vector size is unknown")
+    settings = db.get_collection_settings(name) or {}
+    doc_ids: set = set()
+    counts = {"chunks": 0, "chunk_refs": 0, "documents": 0}
+    with SnapshotWriter(path, dim) as writer:
+        offset = None
+        while True:
+            points, offset = qdrant.scroll(
+                collection_name=physical,
+                limit=RAG_SNAPSHOT_PAGE,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            if points:
+                writer.add_points(
+                    [p.id for p in points],
+                    [p.vector for p in points],
+                    [dict(p.payload or {}) for p in points],
+                )
+            if offset is None:
+                break
+        for rows in chunk_store.iter_rows(name, RAG_SNAPSHOT_PAGE):
+            block = "chunk_refs" if "canonical_id" in rows[0] else "chunks"
+            writer.add_block(block, rows, list(rows[0]))
+            counts[block] += len(rows)
+            doc_ids.update(row["doc_id"] for row in rows)
+        documents = db.get_documents_metadata(sorted(doc_ids))
+        for i in range(0, len(documents), RAG_SNAPSHOT_PAGE):
+            writer.add_block(
+                "documents", documents[i : i + RAG_SNAPSHOT_PAGE], SNAPSHOT_DOCUMENT_FIELDS
+            )
+        counts["documents"] = len(documents)
+        meta = {
+            "collection": name,
+            "model": target["model"] if target else None,
+            "profile": settings.get("profile"),
+            "created_at": datetime.utcnow().isoformat(),
+            **counts,
+        }
+        writer.finish(meta)
+    return {**meta, "dim": dim, "points": writer.count}
+
+
+def _snapshot_upload(physical: str, reader: SnapshotReader, start: int, payloads: List[Dict]):
+    """스냅샷의 [start, start + len(payloads)) 구간을 그대로 upsert (mmap에서 필요한 행만 읽음)"""
+    assert qdrant is not None
+    end = start + len(payloads)
+    qdrant.upsert(
+        collection_name=physical,
+        points=[
+            qmodels.PointStruct(id=pid, vector=vec, payload=pl)
+            for pid, vec, pl in zip(reader.ids(start, end), reader.vectors(start, end), payloads)
+        ],
+    )
+
+
+def _restore_snapshot_rows(name: str, reader: SnapshotReader, mtimes: Dict[int, Any]):
+    """chunk store 원문/참조 + 렉시컬 인덱스(원문에서 재생성) + document_metadata 복원"""
+    for rows in reader.blocks("chunks"):
+        chunk_store.put_chunks(name, rows)
+        lexical.index_chunks(
+            name,
+            [(r["point_id"], r["doc_id"], r["text"], mtimes.get(r["point_id"])) for r in rows],
+        )
+    for rows in reader.blocks("chunk_refs"):
+        chunk_store.put_chunks(name, rows)
+    for rows in reader.blocks("documents"):
+        db.put_documents_metadata(rows)
+
+
+async def _import_snapshot(
+    name: str, reader: SnapshotReader, replace: bool, profile: Optional[str]
+) -> Dict[str, Any]:
+    assert qdrant is not None
+    started = time.perf_counter()
+    meta = reader.meta
+    physical = _physical(name)
+    if await asyncio.to_thread(qdrant.collection_exists, physical):
+        if not replace:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Collection '{name}' already exists; pass replace=true to overwrite it",
+            )
+        await asyncio.to_thread(qdrant.delete_collection, physical)
+        _payload_indexed.discard(physical)
+        await asyncio.to_thread(chunk_store.delete_collection, name)
+        await asyncio.to_thread(lexical.delete_collection, name)
+    profile = profile or meta.get("profile")
+    await asyncio.to_thread(
+        qdrant.create_collection,
+        collection_name=physical,
+        **_create_kwargs(get_profile(profile) if profile else None, reader.dim),
+    )
+    if profile:
+        _set_collection_profile(name, profile)
+    await asyncio.to_thread(_ensure_payload_indexes, physical)
+    # 스냅샷을 만든 모델로 기록 → 질의도 그 모델로 임베딩 (설정과 다르면 재임베딩 대상)
+    _set_collection_target(name, physical, meta.get("model"), reader.dim)
+
+    # 벡터는 그대로 병렬 배치 upsert (임베딩 서비스 호출 없음)
+    semaphore = asyncio.Semaphore(max(1, RAG_SNAPSHOT_PARALLEL))
+    mtimes: Dict[int, Any] = {}
+
+    async def upload(start: int, payloads: List[Dict]):
+        async with semaphore:
+            await asyncio.to_thread(_snapshot_upload, physical, reader, start, payloads)
+
+    uploads = []
+    start = 0
+    batch = max(1, RAG_SNAPSHOT_BATCH)
+    for rows in reader.blocks("payloads"):
+        for pid, pl in zip(reader.ids(start, start + len(rows)), rows):
+            mtime = pl.get("mtime")
+            # 중복 제거된 청크는 문서별 값 배열 → 렉시컬 인덱스에는 대표 문서 값
+            mtimes[pid] = mtime[0] if isinstance(mtime, list) and mtime else mtime
+        for i in range(0, len(rows), batch):
+            uploads.append(upload(start + i, rows[i : i + batch]))
+        start += len(rows)
+    await asyncio.gather(*uploads)
+    await asyncio.to_thread(_restore_snapshot_rows, name, reader, mtimes)
+
+    db.bump_index_version(name)
+    cache_warmup.schedule(name)
+    return {
+        "collection": name,
+        "physical": physical,
+        "model": meta.get("model"),
+        "dim": reader.dim,
+        "points": reader.count,
+        "chunks": meta.get("chunks", 0),
+        "chunk_refs": meta.get("chunk_refs", 0),
+        "documents": meta.get("documents", 0),
+        "duration_ms": int((time.perf_counter() - started) * 1000),
+    }
+
+
+@app.get("/collections/{name}/export")
+async def export_collection(name: str):
+    """
+    컬렉션 스냅샷 다운로드 (관리용)
+    - float32 벡터 배열 + 열(column) 단위 압축 메타데이터, mmap으로 바로 읽을 수 있는 형식
+    - 임베딩 모델/차원/프로파일 포함 → 다른 노드에서 POST /collections/{name}/import로 복원
+    """
+    fd, path = tempfile.mkstemp(prefix="rag_snapshot_", suffix=".ragsnap")
+    os.close(fd)
+    try:
+        summary = await asyncio.to_thread(_export_snapshot, name, path)
+    except Exception:
+        os.unlink(path)
+        raise
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename=f"{name}.ragsnap",
+        headers={"X-Snapshot-Points": str(summary["points"])},
+        background=BackgroundTask(os.unlink, path),
+    )
+
+
+@app.post("/collections/{name}/import")
+async def import_collection(
+    request: Request,
+    name: str,
+    path: Optional[str] = Query(
+        None, description="RAG_SNAPSHOT_DIR 안의 스냅샷 파일 (없으면 본문)"
+    ),
+    replace: bool = Query(False, description="기존 컬렉션을 지우고 복원"),
+    profile: Optional[str] = Query(None, description="스냅샷의 프로파일 대신 적용"),
+):
+    """
+    스냅샷 복원 (관리용): 요청 본문(export 파일) 또는 서버의 스냅샷 파일
+    - 재임베딩 없이 벡터를 병렬 배치로 upsert, 렉시컬 인덱스는 원문에서 재생성
+    """
+    if profile and profile not in PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown profile '{profile}'")
+    migration = _embedding_migrations.get(name)
+    if migration is not None and migration.running:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Collection '{name}' is being re-embedded; retry after the swap",
         )
+    upload_path = None
+    if path:
+        root = os.path.realpath(RAG_SNAPSHOT_DIR) if RAG_SNAPSHOT_DIR else None
+        snapshot_path = os.path.realpath(os.path.join(root or "", path))
+        if root is None or os.path.commonpath([root, snapshot_path]) != root:
+            raise HTTPException(status_code=400, detail="path must be inside RAG_SNAPSHOT_DIR")
+        if not os.path.isfile(snapshot_path):
+            raise HTTPException(status_code=404, detail=f"Snapshot '{path}' not found")
+    else:
+        # 본문은 메모리에 올리지 않고 임시 파일로 받아 mmap
+        fd, upload_path = tempfile.mkstemp(prefix="rag_snapshot_", suffix=".ragsnap")
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in request.stream():
+                f.write(chunk)
+        snapshot_path = upload_path
+    try:
+        try:
+            reader = SnapshotReader(snapshot_path)
+        except SnapshotError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid snapshot: {e}")
+        with reader:
+            return await _import_snapshot(name, reader, replace, profile)
+    finally:
+        if upload_path:
+            os.unlink(upload_path)
 
 
 @app.post("/prewarm")
@@ -689,16 +2882,53 @@ async def prewarm():
 
 @app.get("/analytics", response_model=AnalyticsResponse)
 async def get_analytics(hours: int = Query(24, description="Hours to look back")):
-    """Get search analytics for the specified time period"""
-    analytics = db.get_search_analytics(hours)
-    return AnalyticsResponse(**analytics)
+    """Get search analytics for the specified time period (시간별 rollup 기준)"""
+    stats = await asyncio.to_thread(db.get_rollup_analytics, hours)
+    return AnalyticsResponse(**stats)
+
+
+@app.get("/analytics/latency")
+async def analytics_latency(
+    hours: int = Query(24, ge=1, description="Hours to look back"),
+    collection: Optional[str] = Query(None, description="컬렉션 (미지정 시 전체)"),
+):
+    """
+    단계별(embed / vector_search / llm / total) 지연 분위수
+    - 시간별 rollup sketch를 병합해 count, mean, p50, p95, p99 계산
+    - buckets: 시간 버킷별 같은 통계 (대시보드 시계열용)
+    """
+    return await asyncio.to_thread(db.get_latency_rollups, hours, collection)
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """LLM 동시성 제한 / single-flight 상태"""
+    return {"limiter": llm_limiter.stats(), "single_flight": llm_flights.stats()}
+
+
+@app.get("/analytics/writer")
+async def analytics_writer_stats():
+    """Analytics writer queue depth and drop counters"""
+    return analytics.stats()
 
 
 @app.post("/optimize")
 async def optimize_database():
-    """Run database optimization and cleanup"""
-    result = db.optimize_database()
-    return {"message": "Database optimized", **result}
+    """
+    Start database maintenance in the background and return its progress
+    - 진행 상황은 GET /maintenance로 조회
+    """
+    if db.maintenance.running:
+        return {"message": "Maintenance already running", **db.maintenance.progress()}
+    _background_tasks[:] = [t for t in _background_tasks if not t.done()]
+    _background_tasks.append(asyncio.create_task(asyncio.to_thread(db.maintenance.run)))
+    return {"message": "Maintenance started", **db.maintenance.progress()}
+
+
+@app.get("/maintenance")
+async def maintenance_progress():
+    """분석 DB 유지보수 진행 상황 (단계, 삭제 행 수, 반환한 페이지 수, WAL 체크포인트 결과)"""
+    return db.maintenance.progress()
 
 
 @app.get("/cache/stats")
@@ -720,6 +2950,27 @@ async def cache_stats():
     return stats
 
 
+@app.get("/cache/warmup")
+async def cache_warmup_progress():
+    """캐시 warm-up 상태 (예약된 컬렉션, 질의 수, 새로 답변/이미 캐시/실패 수)"""
+    return {
+        "top_n": RAG_WARMUP_TOP_N,
+        "hours": RAG_WARMUP_HOURS,
+        "delay": RAG_WARMUP_DELAY,
+        "enabled": cache_warmup.enabled,
+        **cache_warmup.progress(),
+    }
+
+
+@app.post("/cache/warmup")
+async def start_cache_warmup(collection: Optional[str] = Query(None, description="컬렉션 이름")):
+    """컬렉션의 상위 질의 캐시 warm-up을 바로 시작 (관리용)"""
+    if not cache_warmup.enabled:
+        raise HTTPException(status_code=400, detail="Cache warm-up is disabled")
+    cache_warmup.schedule(collection or COLLECTION_DEFAULT, delay=0)
+    return await cache_warmup_progress()
+
+
 @app.delete("/cache")
 async def clear_cache():
     """Clear query cache"""
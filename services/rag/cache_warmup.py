@@ -0,0 +1,111 @@
+"""
+RAG 답변 캐시 warm-up
+- 재색인(색인 버전 증가)으로 캐시가 무효화된 컬렉션의 자주 묻는 질의를 미리 답변해 캐시에 기록
+- 질의 목록은 search_logs rollup(top_queries)에서 컬렉션별 상위 N개
+- 재색인 후 delay초 기다렸다가 시작 (연속 재색인은 한 번으로 합침)
+- 낮은 우선순위: 사용자 LLM 호출이 진행 중이거나 대기 중이면 비워질 때까지 기다린 뒤 1개씩 실행
+- 진행 상황은 progress()로 조회
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmup:
+    """
+    top_queries: 컬렉션 → [{"query", "collection"(컬렉션 집합 키), "count"}] (빈도순)
+    warm: (질의, 컬렉션 목록) → 새로 답변했으면 True, 이미 캐시돼 있으면 False (async)
+    idle: 사용자 LLM 호출이 없으면 True
+    """
+
+    def __init__(
+        self,
+        top_queries: Callable[[str], List[Dict[str, Any]]],
+        warm: Callable[[str, List[str]], Awaitable[bool]],
+        idle: Callable[[], bool],
+        delay: float = 60.0,
+        poll_interval: float = 0.5,
+    ):
+        self._top_queries = top_queries
+        self._warm = warm
+        self._idle = idle
+        self.delay = delay
+        self.poll_interval = poll_interval
+        self._pending: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._progress: Dict[str, Any] = {"state": "idle", "runs": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.delay >= 0
+
+    def progress(self) -> Dict[str, Any]:
+        return {**self._progress, "pending": sorted(self._pending)}
+
+    def schedule(self, collection: str, delay: Optional[float] = None):
+        """컬렉션 warm-up 예약 (이벤트 루프에서 호출). 진행 중이면 현재 실행이 끝난 뒤 이어서"""
+        if not self.enabled:
+            return
+        self._pending.add(collection)
+        if delay is not None and self._progress["state"] == "scheduled" and self._task is not None:
+            # 대기 중인 예약을 새 delay로 다시 시작 (답변 중인 실행은 중단하지 않음)
+            self._task.cancel()
+            self._task = None
+        if self._task is None or self._task.done():
+            self._progress["state"] = "scheduled"
+            self._task = asyncio.create_task(self._run(self.delay if delay is None else delay))
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self, delay: float):
+        while self._pending:
+            await asyncio.sleep(delay)
+            collections, self._pending = sorted(self._pending), set()
+            try:
+                await self._warm_collections(collections)
+            except Exception as e:
+                logger.warning(f"Cache warm-up failed: {e}")
+                self._progress["error"] = str(e)[:200]
+            finally:
+                self._progress["state"] = "scheduled" if self._pending else "idle"
+                self._progress["runs"] += 1
+                self._progress["finished_at"] = datetime.utcnow().isoformat()
+            delay = self.delay
+
+    async def _warm_collections(self, collections: List[str]):
+        # 여러 컬렉션에 걸친 같은 질의(같은 컬렉션 집합)는 한 번만
+        queries: Dict[Any, Dict[str, Any]] = {}
+        for collection in collections:
+            rows = await asyncio.to_thread(self._top_queries, collection)
+            for row in rows:
+                queries.setdefault((row["query"], row["collection"]), row)
+        self._progress.update(
+            state="running",
+            collections=collections,
+            started_at=datetime.utcnow().isoformat(),
+            finished_at=None,
+            error=None,
+            total=len(queries),
+            done=0,
+            warmed=0,
+            cached=0,
+            failed=0,
+        )
+        for (query, key), _ in sorted(queries.items(), key=lambda kv: -kv[1].get("count", 0)):
+            # 사용자 질의가 LLM을 쓰는 동안은 양보
+            while not self._idle():
+                await asyncio.sleep(self.poll_interval)
+            try:
+                warmed = await self._warm(query, key.split(","))
+                self._progress["warmed" if warmed else "cached"] += 1
+            except Exception as e:
+                logger.debug(f"Cache warm-up for {query!r} failed: {e}")
+                self._progress["failed"] += 1
+            self._progress["done"] += 1
@@ -0,0 +1,275 @@
+"""
+RAG Chunk Store
+- 청크 원문/메타데이터를 Qdrant payload 대신 로컬 SQLite에 저장 (point id 키)
+- Qdrant에는 벡터 + 필터용 필드만 남겨 RAM/스냅샷 크기 절감
+- 최종 컨텍스트에 쓰일 청크만 한 번의 배치 조회로 가져옴 (mmap 읽기)
+- 색인 시 중복 제거된 청크: 원문은 대표 point에 한 번만, 다른 문서의 같은 청크는 chunk_refs에 위치만 기록
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlite_store import SQLiteStore, sibling_db_path
+
+# SQLite 바인딩 변수 한도(구버전 999) 이하로 IN 절 분할
+_MAX_IN_PARAMS = 900
+
+
+def default_chunk_db_path() -> str:
+    """RAG_CHUNK_DB_PATH 또는 RAG_DB_PATH와 같은 디렉토리의 rag_chunks.db"""
+    return sibling_db_path("RAG_CHUNK_DB_PATH", "rag_chunks.db")
+
+
+class ChunkStore(SQLiteStore):
+    pragmas = ("mmap_size=268435456", "cache_size=-65536")
+
+    def __init__(self, db_path: Optional[str] = None):
+        super().__init__(db_path or default_chunk_db_path())
+
+    def _init_schema(self):
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    collection TEXT NOT NULL,
+                    point_id INTEGER NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    chunk_id INTEGER NOT NULL,
+                    char_start INTEGER,
+                    char_end INTEGER,
+                    text TEXT NOT NULL,
+                    PRIMARY KEY (collection, point_id)
+                ) WITHOUT ROWID
+            """
+            )
+            # 문서 내 청크 순서 (이웃 청크 확장용)
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_chunks_doc_order
+                ON chunks(collection, doc_id, chunk_id)
+            """
+            )
+            # 중복 청크 참조: 문서 내 위치(point_id는 벡터 없는 자리 번호) → 대표 point
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunk_refs (
+                    collection TEXT NOT NULL,
+                    point_id INTEGER NOT NULL,
+                    canonical_id INTEGER NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    chunk_id INTEGER NOT NULL,
+                    char_start INTEGER,
+                    char_end INTEGER,
+                    PRIMARY KEY (collection, point_id)
+                ) WITHOUT ROWID
+            """
+            )
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_chunk_refs_canonical
+                ON chunk_refs(collection, canonical_id)
+            """
+            )
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_chunk_refs_doc_order
+                ON chunk_refs(collection, doc_id, chunk_id)
+            """
+            )
+
+    def put_chunks(self, collection: str, chunks: Iterable[Dict[str, Any]]) -> int:
+        """
+        청크 저장. chunks: point_id, doc_id, chunk_id, text, (char_start, char_end)
+        canonical_id가 있으면 중복 청크 → 원문 없이 대표 point 참조만 저장
+        반환: 원문을 저장한 청크 수
+        """
+        rows, refs = [], []
+        for c in chunks:
+            position = (c["doc_id"], c.get("chunk_id", 0), c.get("char_start"), c.get("char_end"))
+            if c.get("canonical_id") is None:
+                rows.append((collection, c["point_id"], *position, c["text"]))
+            else:
+                refs.append((collection, c["point_id"], c["canonical_id"], *position))
+        if not rows and not refs:
+            return 0
+        with self.transaction() as conn:
+            # 같은 자리가 이전 색인에서 다른 종류였으면 제거
+            conn.executemany(
+                "DELETE FROM chunk_refs WHERE collection = ? AND point_id = ?",
+                [row[:2] for row in rows],
+            )
+            conn.executemany(
+                "DELETE FROM chunks WHERE collection = ? AND point_id = ?",
+                [ref[:2] for ref in refs],
+            )
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO chunks
+                (collection, point_id, doc_id, chunk_id, char_start, char_end, text)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+                rows,
+            )
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO chunk_refs
+                (collection, point_id, canonical_id, doc_id, chunk_id, char_start, char_end)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+                refs,
+            )
+        return len(rows)
+
+    def get_chunks(self, collection: str, point_ids: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        """point id 목록 → {point_id: payload} (한 번의 트랜잭션, 없는 id는 생략)"""
+        ids = [pid for pid in dict.fromkeys(point_ids) if isinstance(pid, int)]
+        out: Dict[Any, Dict[str, Any]] = {}
+        if not ids:
+            return out
+        with self.transaction() as conn:
+            for i in range(0, len(ids), _MAX_IN_PARAMS):
+                part = ids[i : i + _MAX_IN_PARAMS]
+                placeholders = ",".join("?" * len(part))
+                cursor = conn.execute(
+                    f"""
+                    SELECT point_id, doc_id, chunk_id, char_start, char_end, text
+                    FROM chunks
+                    WHERE collection = ? AND point_id IN ({placeholders})
+                """,  # nosec B608 - placeholders only
+                    (collection, *part),
+                )
+                for row in cursor:
+                    out[row["point_id"]] = {
+                        "doc_id": row["doc_id"],
+                        "source": row["doc_id"],
+                        "chunk_id": row["chunk_id"],
+                        "char_start": row["char_start"],
+                        "char_end": row["char_end"],
+                        "text": row["text"],
+                    }
+            found = list(out)
+            for i in range(0, len(found), _MAX_IN_PARAMS):
+                part = found[i : i + _MAX_IN_PARAMS]
+                placeholders = ",".join("?" * len(part))
+                cursor = conn.execute(
+                    f"""
+                    SELECT canonical_id, doc_id FROM chunk_refs
+                    WHERE collection = ? AND canonical_id IN ({placeholders})
+                    ORDER BY canonical_id, doc_id, chunk_id
+                """,  # nosec B608 - placeholders only
+                    (collection, *part),
+                )
+                # 같은 청크를 포함한 모든 문서 (대표 문서 먼저)
+                for row in cursor:
+                    payload = out[row["canonical_id"]]
+                    doc_ids = payload.setdefault("doc_ids", [payload["doc_id"]])
+                    if row["doc_id"] not in doc_ids:
+                        doc_ids.append(row["doc_id"])
+        return out
+
+    def get_neighbors(
+        self, collection: str, anchors: List[Tuple[int, str, int, int]], radius: int
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        anchor 청크의 앞뒤 radius개 이웃을 한 번의 조회로 반환
+        anchors: (point_id, doc_id, 첫 chunk_id, 마지막 chunk_id) — 병합 span이면 범위
+        반환: {anchor point_id: [이웃 payload(id 포함), chunk_id 순]} (anchor 범위 자체는 제외)
+        같은 색인 실행에서 한 문서의 point id는 연속이므로 point_id - chunk_id로 묶어
+        이전 색인의 잔여 청크와 섞이지 않게 함 (중복 청크 자리는 chunk_refs → 대표 원문)
+        """
+        out: Dict[int, List[Dict[str, Any]]] = {a[0]: [] for a in anchors}
+        if radius <= 0 or not anchors:
+            return out
+        # 같은 문서의 여러 anchor는 base가 같으므로 목록으로 보관
+        by_base: Dict[Tuple[str, int], List[Tuple[int, int, int]]] = {}
+        for point_id, doc_id, first, last in anchors:
+            by_base.setdefault((doc_id, point_id - first), []).append((point_id, first, last))
+        # anchor당 바인딩 4개
+        step = _MAX_IN_PARAMS // 4
+        with self.transaction() as conn:
+            for i in range(0, len(anchors), step):
+                part = anchors[i : i + step]
+                clauses = " OR ".join(
+                    "(doc_id = ? AND chunk_id BETWEEN ? AND ? AND point_id - chunk_id = ?)"
+                    for _ in part
+                )
+                params: List[Any] = [collection]
+                for point_id, doc_id, first, last in part:
+                    params += [doc_id, first - radius, last + radius, point_id - first]
+                cursor = conn.execute(
+                    f"""
+                    WITH positions AS (
+                        SELECT collection, point_id, doc_id, chunk_id, char_start, char_end, text
+                        FROM chunks
+                        UNION ALL
+                        SELECT r.collection, r.point_id, r.doc_id, r.chunk_id,
+                               r.char_start, r.char_end, c.text
+                        FROM chunk_refs r
+                        JOIN chunks c
+                          ON c.collection = r.collection AND c.point_id = r.canonical_id
+                    )
+                    SELECT point_id, doc_id, chunk_id, char_start, char_end, text
+                    FROM positions
+                    WHERE collection = ? AND ({clauses})
+                    ORDER BY doc_id, chunk_id
+                """,  # nosec B608 - clauses are fixed strings, values are bound
+                    params,
+                )
+                for row in cursor:
+                    chunk_id = row["chunk_id"]
+                    group = by_base.get((row["doc_id"], row["point_id"] - chunk_id), [])
+                    if any(first <= chunk_id <= last for _, first, last in group):
+                        continue  # 이미 컨텍스트에 있는 청크
+                    # 여러 anchor의 창에 걸치면 가장 가까운 anchor에 배정
+                    distance, anchor_id = min(
+                        (max(first - chunk_id, chunk_id - last), anchor_id)
+                        for anchor_id, first, last in group
+                    )
+                    if distance > radius:
+                        continue
+                    out[anchor_id].append(
+                        {
+                            "id": row["point_id"],
+                            "doc_id": row["doc_id"],
+                            "source": row["doc_id"],
+                            "chunk_id": row["chunk_id"],
+                            "char_start": row["char_start"],
+                            "char_end": row["char_end"],
+                            "text": row["text"],
+                        }
+                    )
+        return out
+
+    def iter_rows(self, collection: str, batch: int = 5000) -> Iterator[List[Dict[str, Any]]]:
+        """
+        컬렉션의 청크 행을 point_id 순으로 batch개씩 (스냅샷 export용)
+        원문 행은 text, 중복 자리 행은 canonical_id를 가지므로 그대로 put_chunks에 다시 넣을 수 있음
+        """
+        queries = (
+            "SELECT point_id, doc_id, chunk_id, char_start, char_end, text FROM chunks",
+            "SELECT point_id, canonical_id, doc_id, chunk_id, char_start, char_end FROM chunk_refs",
+        )
+        for query in queries:
+            last = -1
+            while True:
+                with self.transaction() as conn:
+                    rows = conn.execute(
+                        f"{query} WHERE collection = ? AND point_id > ? ORDER BY point_id LIMIT ?",
+                        (collection, last, batch),
+                    ).fetchall()
+                if not rows:
+                    break
+                yield [dict(row) for row in rows]
+                last = rows[-1]["point_id"]
+
+    def delete_collection(self, collection: str) -> int:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM chunk_refs WHERE collection = ?", (collection,))
+            return conn.execute("DELETE FROM chunks WHERE collection = ?", (collection,)).rowcount
+
+    def count(self, collection: Optional[str] = None) -> int:
+        with self.transaction() as conn:
+            if collection is None:
+                return conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            return conn.execute(
+                "SELECT COUNT(*) FROM chunks WHERE collection = ?", (collection,)
+            ).fetchone()[0]
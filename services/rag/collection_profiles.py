@@ -0,0 +1,140 @@
+"""
+RAG Collection Profiles
+- 컬렉션 생성/변경 시 적용할 HNSW / on-disk / 양자화 설정 묶음
+  - latency:  큰 그래프(m=32) + 원본 벡터 RAM + int8 스칼라 양자화
+  - balanced: 원본 벡터 디스크 + int8 양자화 벡터 RAM, 2배 oversampling 후 원본으로 rescore
+  - memory:   벡터/그래프/payload 모두 디스크 + binary 양자화 RAM, 3배 oversampling rescore
+- 질의 시 기본 search params (hnsw_ef, rescore)도 프로파일에서 결정, 요청별 ef/exact로 덮어씀
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from qdrant_client.http import models as qmodels
+
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    name: str
+    m: int
+    ef_construct: int
+    hnsw_ef: int
+    on_disk_vectors: bool
+    on_disk_payload: bool
+    on_disk_hnsw: bool
+    quantization: Optional[str]  # "scalar" | "binary" | None
+    rescore: bool = True
+    oversampling: float = 1.0
+
+
+PROFILES: Dict[str, CollectionProfile] = {
+    "latency": CollectionProfile(
+        name="latency",
+        m=32,
+        ef_construct=256,
+        hnsw_ef=96,
+        on_disk_vectors=False,
+        on_disk_payload=False,
+        on_disk_hnsw=False,
+        quantization="scalar",
+        rescore=True,
+        oversampling=1.0,
+    ),
+    "balanced": CollectionProfile(
+        name="balanced",
+        m=16,
+        ef_construct=128,
+        hnsw_ef=128,
+        on_disk_vectors=True,
+        on_disk_payload=False,
+        on_disk_hnsw=False,
+        quantization="scalar",
+        rescore=True,
+        oversampling=2.0,
+    ),
+    "memory": CollectionProfile(
+        name="memory",
+        m=16,
+        ef_construct=100,
+        hnsw_ef=128,
+        on_disk_vectors=True,
+        on_disk_payload=True,
+        on_disk_hnsw=True,
+        quantization="binary",
+        rescore=True,
+        oversampling=3.0,
+    ),
+}
+
+
+def get_profile(name: str) -> CollectionProfile:
+    """프로파일 이름 → 설정. 알 수 없는 이름은 ValueError"""
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown collection profile '{name}' (choose from {sorted(PROFILES)})")
+
+
+def _hnsw_config(profile: CollectionProfile) -> qmodels.HnswConfigDiff:
+    return qmodels.HnswConfigDiff(
+        m=profile.m, ef_construct=profile.ef_construct, on_disk=profile.on_disk_hnsw
+    )
+
+
+def _quantization_config(profile: CollectionProfile):
+    # 양자화 벡터는 항상 RAM에 두고 원본(디스크일 수 있음)은 rescore에만 사용
+    if profile.quantization == "scalar":
+        return qmodels.ScalarQuantization(
+            scalar=qmodels.ScalarQuantizationConfig(
+                type=qmodels.ScalarType.INT8, quantile=0.99, always_ram=True
+            )
+        )
+    if profile.quantization == "binary":
+        return qmodels.BinaryQuantization(binary=qmodels.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def create_collection_kwargs(profile: CollectionProfile, dim: int) -> Dict[str, Any]:
+    """qdrant.create_collection에 넘길 설정"""
+    return {
+        "vectors_config": qmodels.VectorParams(
+            size=dim, distance=qmodels.Distance.COSINE, on_disk=profile.on_disk_vectors
+        ),
+        "hnsw_config": _hnsw_config(profile),
+        "on_disk_payload": profile.on_disk_payload,
+        "quantization_config": _quantization_config(profile),
+    }
+
+
+def update_collection_kwargs(profile: CollectionProfile) -> Dict[str, Any]:
+    """qdrant.update_collection에 넘길 설정 (기존 컬렉션에 프로파일 적용, 재색인은 Qdrant가 백그라운드 수행)"""
+    return {
+        # 이름 없는 기본 벡터는 "" 키
+        "vectors_config": {"": qmodels.VectorParamsDiff(on_disk=profile.on_disk_vectors)},
+        "hnsw_config": _hnsw_config(profile),
+        "collection_params": qmodels.CollectionParamsDiff(on_disk_payload=profile.on_disk_payload),
+        "quantization_config": _quantization_config(profile) or qmodels.Disabled.DISABLED,
+    }
+
+
+def search_params(
+    profile: Optional[CollectionProfile],
+    hnsw_ef: Optional[int] = None,
+    exact: Optional[bool] = None,
+) -> Optional[qmodels.SearchParams]:
+    """
+    프로파일 기본값 + 요청별 override → Qdrant SearchParams
+    프로파일도 override도 없으면 None (Qdrant 기본값)
+    """
+    if profile is None and hnsw_ef is None and exact is None:
+        return None
+    quantization = None
+    if profile is not None and profile.quantization:
+        quantization = qmodels.QuantizationSearchParams(
+            rescore=profile.rescore, oversampling=profile.oversampling
+        )
+    return qmodels.SearchParams(
+        hnsw_ef=hnsw_ef if hnsw_ef is not None else (profile.hnsw_ef if profile else None),
+        exact=bool(exact),
+        quantization=quantization,
+    )
@@ -0,0 +1,152 @@
+"""
+RAG Context Selection
+- 검색 후 컨텍스트 후보를 줄여 프롬프트 토큰 절감
+  1. score-gap cutoff: 최고 점수 대비 min_relative_score 미만 후보 제거
+  2. MMR (maximal marginal relevance): 관련도와 이미 고른 청크와의 중복도를 함께 고려
+     중복도는 단어 집합 유사도 (+ 같은 문서의 char 범위 겹침) → 벡터 없는 렉시컬 hit에도 적용
+  3. 같은 문서의 겹치거나 맞닿은 청크를 하나의 span으로 병합 (overlap 중복 텍스트 제거)
+"""
+
+import re
+from typing import Any, Dict, FrozenSet, List, Optional
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _words(text: str) -> FrozenSet[str]:
+    return frozenset(w.lower() for w in _WORD_RE.findall(text or ""))
+
+
+def _span(h: Dict[str, Any]):
+    start, end = h.get("char_start"), h.get("char_end")
+    if start is None or end is None:
+        return None
+    return start, end
+
+
+def similarity(a: Dict[str, Any], b: Dict[str, Any], words: Dict[int, FrozenSet[str]]) -> float:
+    """두 hit의 중복도 (0~1): 단어 Jaccard, 같은 문서면 char 범위 겹침 비율과 중 큰 값"""
+    wa, wb = words[id(a)], words[id(b)]
+    union = len(wa | wb)
+    sim = len(wa & wb) / union if union else 0.0
+    if (a.get("collection"), a.get("doc_id")) == (b.get("collection"), b.get("doc_id")):
+        sa, sb = _span(a), _span(b)
+        if sa and sb:
+            overlap = min(sa[1], sb[1]) - max(sa[0], sb[0])
+            shorter = min(sa[1] - sa[0], sb[1] - sb[0])
+            if overlap > 0 and shorter > 0:
+                sim = max(sim, overlap / shorter)
+    return sim
+
+
+def score_gap_cutoff(hits: List[Dict[str, Any]], min_relative_score: float) -> List[Dict[str, Any]]:
+    """최고 점수 × min_relative_score 미만 hit 제거 (점수 없는 hit은 유지)"""
+    scores = [h["score"] for h in hits if h.get("score") is not None]
+    if not scores or min_relative_score <= 0:
+        return list(hits)
+    best = max(scores)
+    if best <= 0:
+        return list(hits)
+    floor = best * min_relative_score
+    return [h for h in hits if h.get("score") is None or h["score"] >= floor]
+
+
+def mmr(hits: List[Dict[str, Any]], k: int, lambda_: float) -> List[Dict[str, Any]]:
+    """
+    MMR 선택: argmax λ·relevance − (1−λ)·max_sim(selected)
+    relevance는 최고 점수 대비 정규화, 결과는 선택 순서 (관련도 높은 순에 가까움)
+    """
+    if k <= 0 or not hits:
+        return []
+    best = max((h.get("score") or 0.0) for h in hits) or 1.0
+    words = {id(h): _words(h.get("text", "")) for h in hits}
+    remaining = list(hits)
+    selected: List[Dict[str, Any]] = []
+    max_sim = {id(h): 0.0 for h in hits}
+    while remaining and len(selected) < k:
+        pick = max(
+            remaining,
+            key=lambda h: lambda_ * (h.get("score") or 0.0) / best - (1 - lambda_) * max_sim[id(h)],
+        )
+        remaining.remove(pick)
+        selected.append(pick)
+        for h in remaining:
+            max_sim[id(h)] = max(max_sim[id(h)], similarity(h, pick, words))
+    return selected
+
+
+def merge_adjacent(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    같은 (collection, doc_id)에서 char 범위가 겹치거나 맞닿은 청크를 하나로 병합
+    - 텍스트는 겹친 부분을 한 번만 포함, 점수는 최댓값, chunk_ids에 원래 청크 기록
+    - 병합 span은 구성 청크 중 가장 앞 순위 위치에 놓임
+    """
+    groups: Dict[Any, List[int]] = {}
+    for i, h in enumerate(hits):
+        if _span(h) is not None and h.get("text") is not None:
+            groups.setdefault((h.get("collection"), h.get("doc_id")), []).append(i)
+
+    replaced: Dict[int, Optional[Dict[str, Any]]] = {}
+    for indexes in groups.values():
+        if len(indexes) < 2:
+            continue
+        ordered = sorted(indexes, key=lambda i: hits[i]["char_start"])
+        runs: List[List[int]] = [[ordered[0]]]
+        for i in ordered[1:]:
+            prev_end = max(hits[j]["char_end"] for j in runs[-1])
+            if hits[i]["char_start"] <= prev_end:
+                runs[-1].append(i)
+            else:
+                runs.append([i])
+        for run in runs:
+            if len(run) < 2:
+                continue
+            merged = _merge_run([hits[i] for i in run])
+            first = min(run)
+            for i in run:
+                replaced[i] = merged if i == first else None
+
+    out = []
+    for i, h in enumerate(hits):
+        if i not in replaced:
+            out.append(h)
+        elif replaced[i] is not None:
+            out.append(replaced[i])
+    return out
+
+
+def _merge_run(run: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """char_start 순으로 정렬된 청크들의 텍스트를 겹침 없이 이어 붙임"""
+    first = run[0]
+    text = first["text"]
+    end = first["char_end"]
+    for h in run[1:]:
+        if h["char_end"] <= end:
+            continue
+        text += h["text"][max(0, end - h["char_start"]) :]
+        end = h["char_end"]
+    # 이미 병합된 span이 다시 병합될 수 있으므로 chunk_ids도 합침
+    chunk_ids = sorted(
+        {c for h in run for c in (h.get("chunk_ids") or [h.get("chunk_id")]) if c is not None}
+    )
+    return {
+        **max(run, key=lambda h: h.get("score") or 0.0),
+        # id/chunk_id는 span의 첫 청크 기준 (이웃 확장 시 point_id - chunk_id로 문서 위치 계산)
+        "id": first.get("id"),
+        "text": text,
+        "chunk_id": chunk_ids[0] if chunk_ids else first.get("chunk_id"),
+        "chunk_ids": chunk_ids,
+        "char_start": first["char_start"],
+        "char_end": end,
+    }
+
+
+def select_context(
+    hits: List[Dict[str, Any]],
+    k: int,
+    lambda_: float = 0.7,
+    min_relative_score: float = 0.0,
+) -> List[Dict[str, Any]]:
+    """over-fetch된 후보 → score-gap cutoff → MMR로 k개 → 인접 청크 병합"""
+    candidates = score_gap_cutoff(hits, min_relative_score)
+    return merge_adjacent(mmr(candidates, k, lambda_))
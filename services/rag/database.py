@@ -8,12 +8,42 @@ RAG Database Layer with SQLite
 import sqlite3
 import json
 import os
+from collections import Counter
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 import hashlib
 import threading
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
+
+from latency_sketch import LatencySketch
+from sqlite_maintenance import RetentionRule, SQLiteMaintenance, enable_incremental_auto_vacuum
+
+_NULL_LOCK = nullcontext()
+
+# rollup 단계 (performance_metrics.metric_type) → search_logs 컬럼
+ROLLUP_STAGES = {
+    "embed": "embedding_time_ms",
+    "vector_search": "vector_search_time_ms",
+    "llm": "llm_response_time_ms",
+    "total": "response_time_ms",
+}
+
+# 시간별 rollup에 추가된 컬럼 (기존 DB는 ALTER TABLE로 마이그레이션)
+_PERFORMANCE_ROLLUP_COLUMNS = {
+    "bucket_start": "TEXT",  # 'YYYY-MM-DD HH:00:00' (UTC)
+    "p50_response_time_ms": "REAL",
+    "p99_response_time_ms": "REAL",
+    "sum_response_time_ms": "REAL",
+    "sum_results_count": "INTEGER",
+    "sum_tokens": "INTEGER",
+    "sketch": "TEXT",  # LatencySketch JSON (병합용)
+}
+
+
+# 보존 기간 (일)
+SEARCH_LOG_RETENTION_DAYS = 30
+ROLLUP_RETENTION_DAYS = 90  # rollup은 원본 로그보다 오래 보관
 
 
 class RAGDatabase:
@@ -28,15 +58,34 @@ class RAGDatabase:
         if db_path != ":memory:":
             Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         self._local = threading.local()
+        self._shared_connection: Optional[sqlite3.Connection] = None
+        self._shared_lock = threading.RLock()
         self._init_schema()
+        self.maintenance = SQLiteMaintenance(
+            "rag_analytics",
+            self.transaction,
+            self.retention_rules,
+            delete_batch=int(os.getenv("RAG_MAINTENANCE_DELETE_BATCH", "5000")),
+            vacuum_pages=int(os.getenv("RAG_MAINTENANCE_VACUUM_PAGES", "1000")),
+        )
 
     def _get_connection(self):
         """Thread-safe connection handling"""
+        if self.db_path == ":memory:":
+            # 스레드별 연결이면 :memory: DB가 스레드마다 따로 생기므로 하나를 공유
+            if self._shared_connection is None:
+                self._shared_connection = sqlite3.connect(
+                    self.db_path, check_same_thread=False, timeout=30.0
+                )
+                self._shared_connection.row_factory = sqlite3.Row
+            return self._shared_connection
         if not hasattr(self._local, "connection"):
             self._local.connection = sqlite3.connect(
                 self.db_path, check_same_thread=False, timeout=30.0
             )
             self._local.connection.row_factory = sqlite3.Row
+            # 새 DB는 생성 시점부터 incremental auto_vacuum (기존 DB는 maintenance가 전환)
+            enable_incremental_auto_vacuum(self._local.connection)
             # Performance optimizations
             self._local.connection.execute("PRAGMA journal_mode=WAL")
             self._local.connection.execute("PRAGMA synchronous=NORMAL")
@@ -47,12 +96,14 @@ class RAGDatabase:
     def transaction(self):
         """Transaction context manager"""
         conn = self._get_connection()
-        try:
-            yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
+        # 공유 연결(:memory:)은 스레드 간 트랜잭션이 섞이지 않도록 직렬화
+        with self._shared_lock if conn is self._shared_connection else _NULL_LOCK:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
 
     def _init_schema(self):
         """Initialize database schema"""
@@ -134,6 +185,57 @@ class RAGDatabase:
             """
             )
 
+            self._add_missing_columns(conn, "performance_metrics", _PERFORMANCE_ROLLUP_COLUMNS)
+
+            # 시간별 질의 빈도 (top_queries용 rollup)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS query_rollups (
+                    bucket_start TEXT NOT NULL,
+                    collection TEXT NOT NULL,
+                    query_hash TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (bucket_start, collection, query_hash)
+                ) WITHOUT ROWID
+            """
+            )
+
+            # rollup 진행 위치 (마지막으로 집계한 search_logs.id)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rollup_state (
+                    name TEXT PRIMARY KEY,
+                    last_id INTEGER NOT NULL
+                )
+            """
+            )
+
+            # 컬렉션별 설정 (튜닝 프로파일, 임베딩 모델/차원, 실제 Qdrant 컬렉션)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS collection_settings (
+                    collection TEXT PRIMARY KEY,
+                    profile TEXT,
+                    index_version INTEGER NOT NULL DEFAULT 0,
+                    embedding_model TEXT,
+                    embedding_dim INTEGER,
+                    physical_collection TEXT,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+            )
+            self._add_missing_columns(
+                conn,
+                "collection_settings",
+                {
+                    "index_version": "INTEGER NOT NULL DEFAULT 0",
+                    "embedding_model": "TEXT",
+                    "embedding_dim": "INTEGER",
+                    "physical_collection": "TEXT",
+                },
+            )
+
             # Create indexes for performance
             conn.execute(
                 "CREATE INDEX IF NOT EXISTS idx_search_logs_timestamp ON search_logs(timestamp)"
@@ -156,6 +258,23 @@ class RAGDatabase:
             conn.execute(
                 "CREATE INDEX IF NOT EXISTS idx_performance_date_hour ON performance_metrics(date, hour)"
             )
+            conn.execute(
+                """
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_performance_bucket
+                ON performance_metrics(metric_type, collection, bucket_start)
+            """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_query_rollups_bucket ON query_rollups(bucket_start)"
+            )
+
+    @staticmethod
+    def _add_missing_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]):
+        """Schema migration: add columns that older databases lack"""
+        existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for column, column_type in columns.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
 
     def _query_hash(self, query: str, collection: str) -> str:
         """Generate hash for query + collection"""
@@ -202,6 +321,39 @@ class RAGDatabase:
 
             return cursor.lastrowid
 
+    def log_searches_bulk(self, rows: List[Dict[str, Any]]) -> int:
+        """Log many search queries in a single transaction"""
+        params = [
+            (
+                r["collection"],
+                r["query"],
+                self._query_hash(r["query"], r["collection"]),
+                r.get("results_count", 0),
+                r.get("response_time_ms", 0),
+                r.get("llm_tokens_used", 0),
+                r.get("embedding_time_ms", 0),
+                r.get("vector_search_time_ms", 0),
+                r.get("llm_response_time_ms", 0),
+                r.get("context_length", 0),
+            )
+            for r in rows
+        ]
+        if not params:
+            return 0
+
+        with self.transaction() as conn:
+            conn.executemany(
+                """
+                INSERT INTO search_logs
+                (collection, query, query_hash, results_count, response_time_ms,
+                 llm_tokens_used, embedding_time_ms, vector_search_time_ms,
+                 llm_response_time_ms, context_length)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                params,
+            )
+        return len(params)
+
     def get_cached_query(self, query: str, collection: str) -> Optional[Dict[str, Any]]:
         """Get cached query result if exists and not expired"""
         query_hash = self._query_hash(query, collection)
@@ -247,7 +399,8 @@ class RAGDatabase:
     ):
         """Cache query result"""
         query_hash = self._query_hash(query, collection)
-        expires_at = datetime.now() + timedelta(hours=ttl_hours)
+        # Compared against CURRENT_TIMESTAMP, which is UTC
+        expires_at = datetime.utcnow() + timedelta(hours=ttl_hours)
 
         with self.transaction() as conn:
             conn.execute(
@@ -266,6 +419,34 @@ class RAGDatabase:
                 ),
             )
 
+    def cache_queries_bulk(self, entries: List[Dict[str, Any]]) -> int:
+        """Cache many query results in a single transaction"""
+        now = datetime.utcnow()  # compared against CURRENT_TIMESTAMP (UTC)
+        params = [
+            (
+                self._query_hash(e["query"], e["collection"]),
+                e["collection"],
+                e["query"],
+                e["response"],
+                json.dumps(e.get("context_data") or []),
+                now + timedelta(hours=e.get("ttl_hours", 24)),
+            )
+            for e in entries
+        ]
+        if not params:
+            return 0
+
+        with self.transaction() as conn:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO query_cache
+                (query_hash, collection, query, response, context_data, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """,
+                params,
+            )
+        return len(params)
+
     def update_document_metadata(
         self,
         doc_id: str,
@@ -286,6 +467,139 @@ class RAGDatabase:
                 (doc_id, filename, file_size, chunk_count, embedding_model, checksum),
             )
 
+    def get_documents_metadata(self, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        """Metadata rows for the given documents (unknown ids are skipped)"""
+        out: List[Dict[str, Any]] = []
+        ids = list(dict.fromkeys(doc_ids))
+        with self.transaction() as conn:
+            for i in range(0, len(ids), 900):
+                part = ids[i : i + 900]
+                placeholders = ",".join("?" * len(part))
+                rows = conn.execute(
+                    f"""
+                    SELECT doc_id, filename, file_size, chunk_count, indexed_at, last_accessed,
+                           access_count, embedding_model, checksum
+                    FROM document_metadata WHERE doc_id IN ({placeholders})
+                """,  # nosec B608 - placeholders only
+                    part,
+                ).fetchall()
+                out.extend(dict(row) for row in rows)
+        return out
+
+    def put_documents_metadata(self, rows: List[Dict[str, Any]]) -> int:
+        """Bulk restore document metadata rows (e.g. from a collection snapshot)"""
+        params = [
+            (
+                row["doc_id"],
+                row.get("filename") or os.path.basename(row["doc_id"]),
+                row.get("file_size"),
+                row.get("chunk_count"),
+                row.get("indexed_at"),
+                row.get("last_accessed"),
+                row.get("access_count") or 0,
+                row.get("embedding_model"),
+                row.get("checksum"),
+            )
+            for row in rows
+        ]
+        if not params:
+            return 0
+        with self.transaction() as conn:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO document_metadata
+                (doc_id, filename, file_size, chunk_count, indexed_at, last_accessed,
+                 access_count, embedding_model, checksum)
+                VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?)
+            """,
+                params,
+            )
+        return len(params)
+
+    def get_collection_settings(self, collection: str) -> Optional[Dict[str, Any]]:
+        """Get per-collection settings (None if never recorded)"""
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM collection_settings WHERE collection = ?", (collection,)
+            ).fetchone()
+            return dict(row) if row else None
+
+    def set_collection_profile(self, collection: str, profile: Optional[str]):
+        """Record the tuning profile applied to a collection"""
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO collection_settings (collection, profile) VALUES (?, ?)
+                ON CONFLICT(collection) DO UPDATE SET
+                    profile = excluded.profile,
+                    updated_at = CURRENT_TIMESTAMP
+            """,
+                (collection, profile),
+            )
+
+    def set_collection_embedding(
+        self,
+        collection: str,
+        physical_collection: str,
+        embedding_model: Optional[str],
+        embedding_dim: int,
+    ):
+        """
+        Record the Qdrant collection, embedding model and dimension behind a collection name
+        - 한 행 UPDATE이므로 임베딩 모델 교체 시 alias 전환이 원자적
+        """
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO collection_settings
+                (collection, physical_collection, embedding_model, embedding_dim)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(collection) DO UPDATE SET
+                    physical_collection = excluded.physical_collection,
+                    embedding_model = excluded.embedding_model,
+                    embedding_dim = excluded.embedding_dim,
+                    updated_at = CURRENT_TIMESTAMP
+            """,
+                (collection, physical_collection, embedding_model, embedding_dim),
+            )
+
+    def list_collection_settings(self) -> List[Dict[str, Any]]:
+        """All recorded per-collection settings"""
+        with self.transaction() as conn:
+            rows = conn.execute("SELECT * FROM collection_settings ORDER BY collection").fetchall()
+            return [dict(row) for row in rows]
+
+    def get_index_versions(self, collections: List[str]) -> Dict[str, int]:
+        """Current index version per collection (0 if never indexed)"""
+        versions = {c: 0 for c in collections}
+        if not versions:
+            return versions
+        placeholders = ",".join("?" * len(versions))
+        with self.transaction() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT collection, index_version FROM collection_settings
+                WHERE collection IN ({placeholders})
+            """,  # nosec B608 - placeholders only
+                list(versions),
+            ).fetchall()
+        versions.update({row["collection"]: row["index_version"] for row in rows})
+        return versions
+
+    def bump_index_version(self, collection: str) -> int:
+        """Increment a collection's index version (invalidates its cached answers)"""
+        with self.transaction() as conn:
+            return conn.execute(
+                """
+                INSERT INTO collection_settings (collection, index_version) VALUES (?, 1)
+                ON CONFLICT(collection) DO UPDATE SET
+                    index_version = index_version + 1,
+                    updated_at = CURRENT_TIMESTAMP
+                RETURNING index_version
+            """,
+                (collection,),
+            ).fetchone()[0]
+
     def track_document_access(self, doc_id: str):
         """Track document access for analytics"""
         with self.transaction() as conn:
@@ -299,6 +613,24 @@ class RAGDatabase:
                 (doc_id,),
             )
 
+    def track_document_access_bulk(self, access_counts: Dict[str, int]) -> int:
+        """Apply aggregated access-count increments ({doc_id: count}) in one transaction"""
+        params = [(count, doc_id) for doc_id, count in access_counts.items() if count > 0]
+        if not params:
+            return 0
+
+        with self.transaction() as conn:
+            conn.executemany(
+                """
+                UPDATE document_metadata
+                SET access_count = access_count + ?,
+                    last_accessed = CURRENT_TIMESTAMP
+                WHERE doc_id = ?
+            """,
+                params,
+            )
+        return len(params)
+
     def get_search_analytics(self, hours: int = 24) -> Dict[str, Any]:
         """Get search analytics for the last N hours"""
         since = datetime.now() - timedelta(hours=hours)
@@ -348,6 +680,248 @@ class RAGDatabase:
 
             return stats
 
+    def rollup_search_logs(self, batch_size: int = 50000) -> Dict[str, Any]:
+        """
+        Aggregate new search_logs rows into hourly per-collection/stage buckets
+        - incremental: only rows after the last rolled-up id are read
+        - existing buckets are merged via their stored sketch
+        """
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT last_id FROM rollup_state WHERE name = 'search_logs'"
+            ).fetchone()
+            last_id = row["last_id"] if row else 0
+            logs = conn.execute(
+                f"""
+                SELECT id, strftime('%Y-%m-%d %H:00:00', timestamp) AS bucket_start,
+                       collection, query, query_hash, results_count, llm_tokens_used,
+                       {", ".join(ROLLUP_STAGES.values())}
+                FROM search_logs
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            """,  # nosec B608 - fixed column names
+                (last_id, batch_size),
+            ).fetchall()
+            if not logs:
+                return {"rolled_up": 0, "buckets": 0, "last_id": last_id}
+
+            groups: Dict[tuple, Dict[str, Any]] = {}
+            query_counts: Counter = Counter()
+            query_text: Dict[tuple, str] = {}
+            for r in logs:
+                key = (r["bucket_start"], r["collection"])
+                group = groups.get(key)
+                if group is None:
+                    group = {
+                        "sketches": {stage: LatencySketch() for stage in ROLLUP_STAGES},
+                        "results": 0,
+                        "tokens": 0,
+                    }
+                    groups[key] = group
+                for stage, column in ROLLUP_STAGES.items():
+                    group["sketches"][stage].add(r[column] or 0)
+                group["results"] += r["results_count"] or 0
+                group["tokens"] += r["llm_tokens_used"] or 0
+                qkey = (r["bucket_start"], r["collection"], r["query_hash"])
+                query_counts[qkey] += 1
+                query_text[qkey] = r["query"]
+
+            for (bucket_start, collection), group in groups.items():
+                for stage, sketch in group["sketches"].items():
+                    existing = conn.execute(
+                        """
+                        SELECT sketch, sum_results_count, sum_tokens FROM performance_metrics
+                        WHERE metric_type = ? AND collection = ? AND bucket_start = ?
+                    """,
+                        (stage, collection, bucket_start),
+                    ).fetchone()
+                    results, tokens = group["results"], group["tokens"]
+                    if existing:
+                        sketch.merge(LatencySketch.from_json(existing["sketch"]))
+                        results += existing["sum_results_count"] or 0
+                        tokens += existing["sum_tokens"] or 0
+                    if stage != "total":
+                        results = tokens = None
+                    summary = sketch.summary()
+                    conn.execute(
+                        """
+                        INSERT INTO performance_metrics
+                        (metric_type, collection, bucket_start, date, hour, total_requests,
+                         avg_response_time_ms, p50_response_time_ms, p95_response_time_ms,
+                         p99_response_time_ms, sum_response_time_ms, sum_results_count,
+                         sum_tokens, sketch)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(metric_type, collection, bucket_start) DO UPDATE SET
+                            total_requests = excluded.total_requests,
+                            avg_response_time_ms = excluded.avg_response_time_ms,
+                            p50_response_time_ms = excluded.p50_response_time_ms,
+                            p95_response_time_ms = excluded.p95_response_time_ms,
+                            p99_response_time_ms = excluded.p99_response_time_ms,
+                            sum_response_time_ms = excluded.sum_response_time_ms,
+                            sum_results_count = excluded.sum_results_count,
+                            sum_tokens = excluded.sum_tokens,
+                            sketch = excluded.sketch,
+                            created_at = CURRENT_TIMESTAMP
+                    """,
+                        (
+                            stage,
+                            collection,
+                            bucket_start,
+                            bucket_start[:10],
+                            int(bucket_start[11:13]),
+                            sketch.count,
+                            summary["mean"],
+                            summary["p50"],
+                            summary["p95"],
+                            summary["p99"],
+                            sketch.total,
+                            results,
+                            tokens,
+                            sketch.to_json(),
+                        ),
+                    )
+
+            conn.executemany(
+                """
+                INSERT INTO query_rollups (bucket_start, collection, query_hash, query, count)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(bucket_start, collection, query_hash) DO UPDATE SET
+                    count = count + excluded.count
+            """,
+                [(*key, query_text[key], n) for key, n in query_counts.items()],
+            )
+
+            last_id = logs[-1]["id"]
+            conn.execute(
+                """
+                INSERT INTO rollup_state (name, last_id) VALUES ('search_logs', ?)
+                ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id
+            """,
+                (last_id,),
+            )
+            return {"rolled_up": len(logs), "buckets": len(groups), "last_id": last_id}
+
+    def get_rollup_analytics(self, hours: int = 24) -> Dict[str, Any]:
+        """Search analytics for the last N hours from hourly rollups (O(buckets))"""
+        with self.transaction() as conn:
+            since = self._bucket_cutoff(conn, hours)
+            cursor = conn.execute(
+                """
+                SELECT
+                    COALESCE(SUM(total_requests), 0) as total_searches,
+                    COALESCE(SUM(sum_response_time_ms) / SUM(total_requests), 0)
+                        as avg_response_time,
+                    COALESCE(SUM(sum_results_count) * 1.0 / SUM(total_requests), 0)
+                        as avg_results_count,
+                    COALESCE(SUM(sum_tokens), 0) as total_tokens
+                FROM performance_metrics
+                WHERE metric_type = 'total' AND bucket_start >= ?
+            """,
+                (since,),
+            )
+            stats = dict(cursor.fetchone())
+
+            cursor = conn.execute(
+                """
+                SELECT query, SUM(count) as count
+                FROM query_rollups
+                WHERE bucket_start >= ?
+                GROUP BY collection, query_hash
+                ORDER BY count DESC
+                LIMIT 10
+            """,
+                (since,),
+            )
+            stats["top_queries"] = [dict(row) for row in cursor.fetchall()]
+
+            cursor = conn.execute(
+                """
+                SELECT collection, SUM(total_requests) as count
+                FROM performance_metrics
+                WHERE metric_type = 'total' AND bucket_start >= ?
+                GROUP BY collection
+                ORDER BY count DESC
+            """,
+                (since,),
+            )
+            stats["collection_usage"] = [dict(row) for row in cursor.fetchall()]
+
+            return stats
+
+    def get_top_queries(
+        self, collection: str, hours: int = 168, limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Most frequent queries that searched a collection (from hourly rollups)
+        - 이 컬렉션을 포함한 여러 컬렉션 질의도 포함 (행의 collection은 컬렉션 집합 키 "a,b")
+        """
+        with self.transaction() as conn:
+            since = self._bucket_cutoff(conn, hours)
+            rows = conn.execute(
+                """
+                SELECT query, collection, SUM(count) as count
+                FROM query_rollups
+                WHERE bucket_start >= ? AND instr(',' || collection || ',', ?) > 0
+                GROUP BY collection, query_hash
+                ORDER BY count DESC
+                LIMIT ?
+            """,
+                (since, f",{collection},", limit),
+            ).fetchall()
+            return [dict(row) for row in rows]
+
+    def get_latency_rollups(
+        self, hours: int = 24, collection: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Per-stage latency percentiles for the last N hours, merged from hourly sketches"""
+        with self.transaction() as conn:
+            since = self._bucket_cutoff(conn, hours)
+            params: List[Any] = [since]
+            where = "bucket_start >= ?"
+            if collection:
+                where += " AND collection = ?"
+                params.append(collection)
+            rows = conn.execute(
+                f"""
+                SELECT metric_type, bucket_start, sketch
+                FROM performance_metrics
+                WHERE {where} AND sketch IS NOT NULL
+                ORDER BY bucket_start
+            """,  # nosec B608 - fixed conditions
+                params,
+            ).fetchall()
+
+        stages = {stage: LatencySketch() for stage in ROLLUP_STAGES}
+        buckets: Dict[str, Dict[str, LatencySketch]] = {}
+        for row in rows:
+            sketch = LatencySketch.from_json(row["sketch"])
+            stages.setdefault(row["metric_type"], LatencySketch()).merge(sketch)
+            per_bucket = buckets.setdefault(row["bucket_start"], {})
+            if row["metric_type"] in per_bucket:
+                per_bucket[row["metric_type"]].merge(sketch)
+            else:
+                per_bucket[row["metric_type"]] = sketch
+        return {
+            "hours": hours,
+            "collection": collection,
+            "stages": {stage: sketch.summary() for stage, sketch in stages.items()},
+            "buckets": [
+                {
+                    "bucket_start": bucket_start,
+                    "stages": {stage: sketch.summary() for stage, sketch in per_stage.items()},
+                }
+                for bucket_start, per_stage in buckets.items()
+            ],
+        }
+
+    @staticmethod
+    def _bucket_cutoff(conn: sqlite3.Connection, hours: int) -> str:
+        """First hourly bucket (UTC, same clock as CURRENT_TIMESTAMP) inside the window"""
+        return conn.execute(
+            "SELECT strftime('%Y-%m-%d %H:00:00', 'now', ?)", (f"-{int(hours)} hours",)
+        ).fetchone()[0]
+
     def cleanup_expired_cache(self):
         """Clean up expired cache entries"""
         with self.transaction() as conn:
@@ -359,20 +933,34 @@ class RAGDatabase:
             )
             return cursor.rowcount
 
-    def optimize_database(self):
-        """Run database maintenance tasks"""
+    def retention_rules(self) -> List[RetentionRule]:
+        """Rows the maintenance task deletes in batches (UTC, same clock as CURRENT_TIMESTAMP)"""
         with self.transaction() as conn:
-            # Clean up old logs (keep 30 days)
-            cutoff = datetime.now() - timedelta(days=30)
-            conn.execute("DELETE FROM search_logs WHERE timestamp < ?", (cutoff,))
-
-            # Clean up expired cache
-            deleted_cache = self.cleanup_expired_cache()
+            rollup_cutoff = self._bucket_cutoff(conn, ROLLUP_RETENTION_DAYS * 24)
+        return [
+            RetentionRule(
+                "search_logs",
+                "timestamp < datetime('now', ?)",
+                (f"-{SEARCH_LOG_RETENTION_DAYS} days",),
+            ),
+            RetentionRule("query_cache", "expires_at < CURRENT_TIMESTAMP"),
+            RetentionRule(
+                "query_rollups",
+                "bucket_start < ?",
+                (rollup_cutoff,),
+                key="(bucket_start, collection, query_hash)",
+            ),
+            RetentionRule("performance_metrics", "bucket_start < ?", (rollup_cutoff,)),
+        ]
 
-            # Vacuum database
-            conn.execute("VACUUM")
-
-            return {"cleaned_cache_entries": deleted_cache, "database_optimized": True}
+    def optimize_database(self):
+        """Run database maintenance tasks (batched deletes + incremental vacuum, no full VACUUM)"""
+        result = self.maintenance.run()
+        return {
+            "cleaned_cache_entries": result.get("deleted", {}).get("query_cache", 0),
+            "database_optimized": result["state"] == "idle",
+            "maintenance": result,
+        }
 
 
 # Global instance
@@ -0,0 +1,101 @@
+"""
+RAG 요청 deadline 전파
+- 호출자가 X-Request-Deadline-Ms(남은 시간, ms)를 보내면 단계별 예산을 그 안에서 계산
+- 요청 컨텍스트(ContextVar)에 두므로 asyncio.to_thread로 넘긴 Qdrant 호출/재시도에서도 조회 가능
+- 단계별 deadline 초과 횟수 기록 (Prometheus gauge로 노출)
+"""
+
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+DEADLINE_STAGES = ("embed", "lexical_search", "vector_search", "llm")
+
+# 단계별 deadline 초과 횟수
+misses: Counter = Counter()
+
+
+class DeadlineExceeded(Exception):
+    """stage를 시작하거나 끝내기에 남은 시간이 부족"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000
+
+    @classmethod
+    def from_header(cls, value: Optional[str]) -> Optional["Deadline"]:
+        """헤더 값(ms) → Deadline. 없거나 잘못된 값이면 None (기존 고정 타임아웃 사용)"""
+        try:
+            budget_ms = float(value) if value else 0.0
+        except ValueError:
+            return None
+        return cls(budget_ms) if budget_ms > 0 else None
+
+    def remaining(self) -> float:
+        """남은 시간 (초, 음수 가능)"""
+        return self.expires_at - time.monotonic()
+
+    def budget(
+        self,
+        stage: str,
+        default: Optional[float],
+        share: float = 1.0,
+        reserve: float = 0.0,
+        minimum: float = 0.0,
+    ) -> float:
+        """
+        stage 타임아웃 (초) = min(기본 타임아웃, (남은 시간 - 예약분) × share)
+        minimum 이하만 남았으면 (시작해도 끝낼 수 없음) 기록 후 DeadlineExceeded
+        """
+        budget = (self.remaining() - reserve) * share
+        if default is not None:
+            budget = min(default, budget)
+        if budget <= minimum:
+            record_miss(stage)
+            raise DeadlineExceeded(stage)
+        return budget
+
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("rag_deadline", default=None)
+
+
+def stage_timeout(
+    stage: str,
+    default: Optional[float],
+    share: float = 1.0,
+    reserve: float = 0.0,
+    minimum: float = 0.0,
+) -> Optional[float]:
+    """현재 요청의 stage 타임아웃 (deadline이 없으면 default)"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return default
+    return deadline.budget(stage, default, share, reserve, minimum)
+
+
+def record_miss(stage: str):
+    misses[stage] += 1
+
+
+def stop_before_deadline(min_sleep: float):
+    """
+    tenacity stop: 다음 대기 후 재시도할 시간이 deadline 안에 남지 않으면 재시도 중단
+    (tenacity 8.x는 stop 판단 시점에 upcoming_sleep이 0이므로 최소 대기 시간으로 추정)
+    """
+
+    def stop(retry_state) -> bool:
+        deadline = current_deadline.get()
+        if deadline is None:
+            return False
+        sleep = getattr(retry_state, "upcoming_sleep", 0) or min_sleep
+        return sleep >= deadline.remaining()
+
+    return stop
@@ -0,0 +1,169 @@
+"""
+RAG 임베딩 모델 교체 (무중단 재임베딩)
+- 컬렉션 이름은 Qdrant alias (교체 후), collection_settings에는 (실제 컬렉션, 임베딩 모델, 차원) 메타데이터
+- 새 모델이 설정되면 shadow 컬렉션을 만들고 기존 point를 페이지 단위로 재임베딩
+  scroll(payload만) → chunk store 원문 → 새 모델 임베딩 → 같은 point id로 upsert
+  (이전 페이지 upsert와 다음 페이지 scroll/임베딩을 겹쳐 실행, 메모리는 페이지 2개분)
+- 끝나면 swap()으로 alias를 한 번에 교체 → 그 전까지 질의는 이전 컬렉션/모델 사용
+- 진행 상황은 progress()로 조회
+"""
+
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+logger = logging.getLogger(__name__)
+
+
+def shadow_collection_name(collection: str, model: str, current: Optional[str] = None) -> str:
+    """새 모델용 실제 컬렉션 이름: {collection}__{모델 slug} (현재 컬렉션과 겹치면 접미사)"""
+    slug = re.sub(r"[^a-z0-9]+", "_", model.lower()).strip("_") or "model"
+    name = f"{collection}__{slug}"
+    return f"{name}_next" if name == current else name
+
+
+class EmbeddingMigration:
+    """
+    source → target 재임베딩 1회 실행
+    create: (target, 차원) → 빈 target 컬렉션 생성 (프로파일/payload 인덱스 포함)
+    embed: 텍스트 목록 → 새 모델 벡터 (async)
+    texts: (point id 목록, payload 목록) → 원문 목록 (없는 point는 None, 건너뜀)
+    swap: 재임베딩이 끝난 뒤 차원을 받아 alias 교체 (실패 시 alias는 그대로)
+    check: 시작 전 확인 (예외 시 아무것도 만들지 않고 failed)
+    """
+
+    def __init__(
+        self,
+        collection: str,
+        source: str,
+        target: str,
+        model: str,
+        qdrant: QdrantClient,
+        create: Callable[[str, int], None],
+        embed: Callable[[List[str]], Awaitable[List[List[float]]]],
+        texts: Callable[[List[Any], List[Dict[str, Any]]], List[Optional[str]]],
+        swap: Callable[[int], None],
+        page_size: int = 256,
+        check: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        self.collection = collection
+        self.source = source
+        self.target = target
+        self.model = model
+        self._qdrant = qdrant
+        self._create = create
+        self._embed = embed
+        self._texts = texts
+        self._swap = swap
+        self._check = check
+        self.page_size = max(1, page_size)
+        self._progress: Dict[str, Any] = {
+            "collection": collection,
+            "source": source,
+            "target": target,
+            "model": model,
+            "dim": None,
+            "state": "pending",
+            "total": None,
+            "migrated": 0,
+            "skipped": 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._progress["state"] in ("pending", "running")
+
+    def progress(self) -> Dict[str, Any]:
+        return dict(self._progress)
+
+    async def run(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        self._progress.update(state="running", started_at=datetime.utcnow().isoformat())
+        try:
+            if self._check is not None:
+                await self._check()
+            # 새 모델 차원은 한 번 임베딩해 확인
+            dim = len((await self._embed(["dimension probe"]))[0])
+            self._progress["dim"] = dim
+            await asyncio.to_thread(self._create_target, dim)
+            await self._copy()
+            self._swap(dim)
+            self._progress["state"] = "swapped"
+            logger.info(
+                f"Embedding migration {self.collection}: {self.source} → {self.target} "
+                f"({self._progress['migrated']} points, model {self.model})"
+            )
+        except Exception as e:
+            logger.warning(f"Embedding migration {self.collection} failed: {e}")
+            self._progress.update(state="failed", error=str(e)[:200])
+        finally:
+            self._progress["finished_at"] = datetime.utcnow().isoformat()
+            self._progress["duration_ms"] = int((time.perf_counter() - started) * 1000)
+        return self.progress()
+
+    def _create_target(self, dim: int):
+        # 이전 실패/이전 모델의 잔여 shadow는 새로 만듦
+        if self._qdrant.collection_exists(self.target):
+            self._qdrant.delete_collection(self.target)
+        self._create(self.target, dim)
+        self._progress["total"] = self._qdrant.count(collection_name=self.source, exact=True).count
+
+    def _scroll(self, offset: Any) -> Tuple[List[Any], Any]:
+        return self._qdrant.scroll(
+            collection_name=self.source,
+            limit=self.page_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=False,
+        )
+
+    async def _embed_page(self, points: List[Any]) -> Tuple[List[Any], List[List[float]]]:
+        """페이지 → (원문이 있는 point, 벡터)"""
+        ids = [p.id for p in points]
+        payloads = [dict(p.payload or {}) for p in points]
+        texts = await asyncio.to_thread(self._texts, ids, payloads)
+        kept = [(p, t) for p, t in zip(points, texts) if t is not None]
+        self._progress["skipped"] += len(points) - len(kept)
+        if not kept:
+            return [], []
+        vectors = await self._embed([t for _, t in kept])
+        return [p for p, _ in kept], vectors
+
+    def _upsert(self, points: List[Any], vectors: List[List[float]]):
+        self._qdrant.upsert(
+            collection_name=self.target,
+            points=[
+                qmodels.PointStruct(id=p.id, vector=vec, payload=dict(p.payload or {}))
+                for p, vec in zip(points, vectors)
+            ],
+        )
+
+    async def _copy(self):
+        offset = None
+        upsert: Optional[asyncio.Future] = None
+        upserting = 0
+        try:
+            while True:
+                points, offset = await asyncio.to_thread(self._scroll, offset)
+                kept, vectors = await self._embed_page(points) if points else ([], [])
+                if upsert is not None:
+                    await upsert
+                    self._progress["migrated"] += upserting
+                    upsert = None
+                if kept:
+                    upsert = asyncio.ensure_future(asyncio.to_thread(self._upsert, kept, vectors))
+                    upserting = len(kept)
+                if offset is None:
+                    break
+            if upsert is not None:
+                await upsert
+                self._progress["migrated"] += upserting
+        finally:
+            if upsert is not None and not upsert.done():
+                upsert.cancel()
@@ -0,0 +1,112 @@
+"""
+의존성 헬스 백그라운드 점검
+- /health 요청마다 Qdrant/임베딩/게이트웨이를 호출하지 않도록 interval마다 점검해 결과를 캐시
+- 실패한 의존성은 지수 backoff (interval × 2^(연속 실패-1), 최대 max_backoff)로 점검 간격을 늘림
+- snapshot()은 I/O 없이 캐시만 반환 (점검 시각/경과 시간 포함, 예정 점검이 밀리면 stale)
+- probe()는 즉시 점검 후 캐시 갱신 (/health?deep=true)
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class HealthProber:
+    """
+    probes: 의존성 이름 → 점검 함수 (async, 정상이면 추가 필드 dict, 실패 시 예외)
+    """
+
+    def __init__(
+        self,
+        probes: Dict[str, Callable[[], Awaitable[Dict[str, Any]]]],
+        interval: float = 10.0,
+        max_backoff: float = 120.0,
+        timeout: float = 5.0,
+    ):
+        self._probes = probes
+        self.interval = interval
+        self.max_backoff = max(max_backoff, interval)
+        self.timeout = timeout
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._checked: Dict[str, float] = {}  # 이름 → 마지막 점검 monotonic 시각
+        self._next: Dict[str, float] = {}  # 이름 → 다음 점검 monotonic 시각
+        self._failures: Dict[str, int] = {name: 0 for name in probes}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """백그라운드 점검 시작 (이벤트 루프에서 호출, interval <= 0이면 비활성)"""
+        if self.interval > 0 and not self.running:
+            self._task = asyncio.create_task(self._loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """캐시된 점검 결과 + 경과 시간 (예정 점검이 timeout + interval 넘게 밀리면 stale)"""
+        now = time.monotonic()
+        out = {}
+        for name, result in self._results.items():
+            overdue = now - self._next[name]
+            out[name] = {
+                **result,
+                "age_s": round(now - self._checked[name], 3),
+                "next_probe_in_s": round(max(-overdue, 0.0), 3),
+                "stale": overdue > self.timeout + self.interval,
+            }
+        return out
+
+    async def probe(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """지정한(기본: 전체) 의존성을 동시에 즉시 점검하고 캐시 갱신"""
+        names = list(self._probes if names is None else names)
+        await asyncio.gather(*(self._probe_one(name) for name in names))
+        return self.snapshot()
+
+    def _delay(self, failures: int) -> float:
+        if failures == 0:
+            return self.interval
+        return min(self.interval * 2 ** min(failures - 1, 16), self.max_backoff)
+
+    async def _probe_one(self, name: str):
+        error = None
+        info: Dict[str, Any] = {}
+        try:
+            info = await asyncio.wait_for(self._probes[name](), self.timeout) or {}
+        except asyncio.TimeoutError:
+            error = f"Timed out after {self.timeout}s"
+        except Exception as e:
+            error = str(e)[:100] or type(e).__name__
+        failures = self._failures[name] + 1 if error else 0
+        if failures == 1:
+            logger.warning(f"Dependency {name} unhealthy: {error}")
+        elif error is None and self._failures[name]:
+            logger.info(f"Dependency {name} recovered after {self._failures[name]} failures")
+        self._failures[name] = failures
+        now = time.monotonic()
+        self._checked[name] = now
+        self._next[name] = now + self._delay(failures)
+        self._results[name] = {
+            "status": "unhealthy" if error else "healthy",
+            "error": error,
+            **info,
+            "checked_at": datetime.utcnow().isoformat(),
+            "failures": failures,
+        }
+
+    async def _loop(self):
+        while True:
+            now = time.monotonic()
+            due = [name for name in self._probes if self._next.get(name, 0.0) <= now]
+            if due:
+                await self.probe(due)
+            wait = min(self._next.values(), default=now + self.interval) - time.monotonic()
+            await asyncio.sleep(max(wait, 0.05))
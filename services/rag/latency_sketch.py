@@ -0,0 +1,99 @@
+"""
+Mergeable latency sketch (DDSketch 방식 로그 버킷 히스토그램)
+- 상대 오차 relative_accuracy 이내의 분위수 (기본 1%)
+- 버킷 카운트를 더하기만 하면 병합되므로 시간별 rollup을 임의 구간으로 합산 가능
+- JSON 직렬화해 performance_metrics.sketch 컬럼에 저장
+"""
+
+import json
+import math
+from typing import Dict, Iterable, Optional
+
+
+class LatencySketch:
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0  # 0 이하 값 (캐시 히트 등 측정되지 않은 단계)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float, n: int = 1):
+        if value is None:
+            return
+        self.count += n
+        self.total += value * n
+        if value <= 0:
+            self.zero_count += n
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + n
+
+    def extend(self, values: Iterable[float]):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "LatencySketch") -> "LatencySketch":
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, n in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        return self
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """q 분위수 (0~1). 비어 있으면 None"""
+        if not self.count:
+            return None
+        # nearest-rank: 누적 개수가 ceil(q * n) 이상이 되는 첫 버킷
+        rank = max(1, math.ceil(q * self.count))
+        seen = self.zero_count
+        if rank <= seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank <= seen:
+                # 버킷 (γ^(k-1), γ^k] 의 대표값
+                return 2 * self._gamma**key / (self._gamma + 1)
+        return 2 * self._gamma ** max(self.buckets) / (self._gamma + 1)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "a": self.relative_accuracy,
+                "z": self.zero_count,
+                "n": self.count,
+                "s": self.total,
+                "b": self.buckets,
+            },
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_json(cls, data: Optional[str]) -> "LatencySketch":
+        if not data:
+            return cls()
+        raw = json.loads(data)
+        sketch = cls(raw["a"])
+        sketch.zero_count = raw["z"]
+        sketch.count = raw["n"]
+        sketch.total = raw["s"]
+        sketch.buckets = {int(k): v for k, v in raw["b"].items()}
+        return sketch
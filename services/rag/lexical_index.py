@@ -0,0 +1,231 @@
+"""
+RAG Lexical Index (SQLite FTS5 / BM25)
+- 벡터 검색이 놓치는 식별자, 에러 코드, 한국어 복합어 검색용
+- rag_analytics.db 옆의 별도 SQLite 파일에 청크 텀 저장
+- 한글 토큰은 음절 bigram을 함께 색인해 복합어 부분 일치 지원
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlite_store import SQLiteStore, sibling_db_path
+
+# 한글 연속 구간 / 그 외 유니코드 단어(밑줄 포함 식별자)
+_TERM_RE = re.compile(r"[가-힣]+|[^\W가-힣]+")
+_HANGUL_RE = re.compile(r"^[가-힣]+$")
+
+
+def lexical_terms(text: str) -> List[str]:
+    """텍스트 → 색인/질의용 텀 목록 (소문자, 한글 bigram 확장)"""
+    terms: List[str] = []
+    for tok in _TERM_RE.findall(text.lower()):
+        terms.append(tok)
+        if len(tok) > 2 and _HANGUL_RE.match(tok):
+            terms.extend(tok[i : i + 2] for i in range(len(tok) - 1))
+        elif "_" in tok.strip("_"):
+            # snake_case 식별자는 구성 단어로도 검색 가능하게
+            terms.extend(part for part in tok.split("_") if part)
+    return terms
+
+
+def default_lexical_db_path() -> str:
+    """RAG_LEXICAL_DB_PATH 또는 RAG_DB_PATH와 같은 디렉토리의 rag_lexical.db"""
+    return sibling_db_path("RAG_LEXICAL_DB_PATH", "rag_lexical.db")
+
+
+class LexicalIndex(SQLiteStore):
+    def __init__(self, db_path: Optional[str] = None):
+        super().__init__(db_path or default_lexical_db_path())
+
+    def _init_schema(self):
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS lexical_chunks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    collection TEXT NOT NULL,
+                    point_id INTEGER NOT NULL,
+                    doc_id TEXT,
+                    terms TEXT NOT NULL,
+                    mtime REAL,
+                    UNIQUE(collection, point_id)
+                )
+            """
+            )
+            # 기존 DB 마이그레이션: 필터용 mtime 컬럼
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(lexical_chunks)")}
+            if "mtime" not in columns:
+                conn.execute("ALTER TABLE lexical_chunks ADD COLUMN mtime REAL")
+            # External-content FTS5: 텀은 lexical_chunks에 한 번만 저장
+            conn.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS lexical_fts USING fts5(
+                    terms,
+                    content='lexical_chunks',
+                    content_rowid='id',
+                    tokenize="unicode61 tokenchars '_'"
+                )
+            """
+            )
+            conn.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS lexical_chunks_ai AFTER INSERT ON lexical_chunks
+                BEGIN
+                    INSERT INTO lexical_fts(rowid, terms) VALUES (new.id, new.terms);
+                END
+            """
+            )
+            conn.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS lexical_chunks_ad AFTER DELETE ON lexical_chunks
+                BEGIN
+                    INSERT INTO lexical_fts(lexical_fts, rowid, terms)
+                    VALUES ('delete', old.id, old.terms);
+                END
+            """
+            )
+
+    def index_chunks(self, collection: str, chunks: Iterable[Tuple]) -> int:
+        """(point_id, doc_id, text[, mtime]) 목록 색인. 같은 point_id는 교체"""
+        rows = []
+        for chunk in chunks:
+            pid, doc_id, text, mtime = (*chunk, None)[:4]
+            rows.append((collection, pid, doc_id, " ".join(lexical_terms(text)), mtime))
+        if not rows:
+            return 0
+        with self.transaction() as conn:
+            conn.executemany(
+                "DELETE FROM lexical_chunks WHERE collection = ? AND point_id = ?",
+                [(collection, row[1]) for row in rows],
+            )
+            conn.executemany(
+                """
+                INSERT INTO lexical_chunks (collection, point_id, doc_id, terms, mtime)
+                VALUES (?, ?, ?, ?, ?)
+            """,
+                rows,
+            )
+        return len(rows)
+
+    def delete_points(self, collection: str, point_ids: Iterable[int]) -> int:
+        """point_id 목록 색인 제거 (중복 제거로 대표 point에 합쳐진 자리 등)"""
+        with self.transaction() as conn:
+            return conn.executemany(
+                "DELETE FROM lexical_chunks WHERE collection = ? AND point_id = ?",
+                [(collection, pid) for pid in point_ids],
+            ).rowcount
+
+    def delete_collection(self, collection: str) -> int:
+        with self.transaction() as conn:
+            return conn.execute(
+                "DELETE FROM lexical_chunks WHERE collection = ?", (collection,)
+            ).rowcount
+
+    def search(
+        self,
+        collection: str,
+        query: str,
+        limit: int,
+        path_prefixes: Optional[Sequence[str]] = None,
+        extensions: Optional[Sequence[str]] = None,
+        modified_after: Optional[float] = None,
+        modified_before: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25 검색. score는 클수록 관련도 높음
+        필터(경로 prefix / 확장자 / mtime 구간)는 LIMIT 전에 SQL에서 적용
+        """
+        terms = list(dict.fromkeys(lexical_terms(query)))
+        if not terms:
+            return []
+        match = " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+        clauses, params = _filter_clauses(
+            path_prefixes, extensions, modified_after, modified_before
+        )
+        where = "".join(f" AND {c}" for c in clauses)
+        with self.transaction() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT c.point_id, c.doc_id, bm25(lexical_fts) AS rank
+                FROM lexical_fts
+                JOIN lexical_chunks c ON c.id = lexical_fts.rowid
+                WHERE lexical_fts MATCH ? AND c.collection = ?{where}
+                ORDER BY rank
+                LIMIT ?
+            """,  # nosec B608 - clauses are fixed strings, values are bound
+                (match, collection, *params, limit),
+            ).fetchall()
+        return [{"id": pid, "doc_id": doc_id, "score": -rank} for pid, doc_id, rank in rows]
+
+    def count(self, collection: Optional[str] = None) -> int:
+        with self.transaction() as conn:
+            if collection is None:
+                return conn.execute("SELECT COUNT(*) FROM lexical_chunks").fetchone()[0]
+            return conn.execute(
+                "SELECT COUNT(*) FROM lexical_chunks WHERE collection = ?", (collection,)
+            ).fetchone()[0]
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _filter_clauses(
+    path_prefixes: Optional[Sequence[str]],
+    extensions: Optional[Sequence[str]],
+    modified_after: Optional[float],
+    modified_before: Optional[float],
+) -> Tuple[List[str], List[Any]]:
+    """검색 필터 → (SQL 조건 목록, 바인딩 값)"""
+    clauses: List[str] = []
+    params: List[Any] = []
+    if path_prefixes:
+        clauses.append(
+            "(" + " OR ".join("c.doc_id LIKE ? ESCAPE '\\'" for _ in path_prefixes) + ")"
+        )
+        params.extend(_like_escape(p.rstrip("/")) + "/%" for p in path_prefixes)
+    if extensions:
+        clauses.append(
+            "(" + " OR ".join("lower(c.doc_id) LIKE ? ESCAPE '\\'" for _ in extensions) + ")"
+        )
+        params.extend("%" + _like_escape(ext) for ext in extensions)
+    if modified_after is not None:
+        clauses.append("c.mtime >= ?")
+        params.append(modified_after)
+    if modified_before is not None:
+        clauses.append("c.mtime < ?")
+        params.append(modified_before)
+    return clauses, params
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[Tuple[List[Dict[str, Any]], float]], k: int = 60
+) -> List[Dict[str, Any]]:
+    """
+    RRF: score(d) = Σ weight / (k + rank)
+    ranked_lists: [(hits, weight), ...] — hits는 "id" 키로 식별, 앞쪽이 상위
+    반환: 융합 점수 내림차순, 각 항목에 rrf_score와 leg별 rank 포함
+    """
+    fused: Dict[Any, Dict[str, Any]] = {}
+    for leg, (hits, weight) in enumerate(ranked_lists):
+        if weight <= 0:
+            continue
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.get(hit["id"])
+            if entry is None:
+                entry = {"hit": dict(hit), "rrf_score": 0.0, "ranks": {}}
+                fused[hit["id"]] = entry
+            else:
+                # 앞선 leg의 payload를 유지하고 빠진 필드만 보충
+                for key, value in hit.items():
+                    entry["hit"].setdefault(key, value)
+            entry["rrf_score"] += weight / (k + rank)
+            entry["ranks"][leg] = rank
+    ordered = sorted(fused.values(), key=lambda e: e["rrf_score"], reverse=True)
+    out = []
+    for e in ordered:
+        hit = e["hit"]
+        hit["rrf_score"] = e["rrf_score"]
+        hit["ranks"] = e["ranks"]
+        out.append(hit)
+    return out
@@ -0,0 +1,137 @@
+"""
+RAG LLM 호출 제어
+- ConcurrencyLimiter: 동시 LLM 호출 수 제한 + 대기열 길이/대기 시간 상한 (초과 시 LimiterFull)
+- SingleFlight: 같은 키로 진행 중인 작업이 있으면 새로 실행하지 않고 결과 공유
+"""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+
+class LimiterFull(Exception):
+    """LLM 대기열이 가득 찼거나 대기 시간 초과"""
+
+
+class ConcurrencyLimiter:
+    """
+    asyncio 세마포어 + 대기열 상한
+    - 슬롯 반납 시 가장 오래 기다린 요청에 바로 넘김 (FIFO)
+    - 이벤트 루프에 묶이는 객체는 대기 시점에만 생성 (모듈 전역으로 사용 가능)
+    """
+
+    def __init__(self, max_concurrent: int, max_waiting: int, wait_timeout: Optional[float] = None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_waiting = max(0, max_waiting)
+        self.wait_timeout = wait_timeout or None
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for f in self._waiters if not f.done())
+
+    async def acquire(self, bounded: bool = True):
+        """슬롯 획득. bounded=False면 대기열 상한/시간 제한 없이 대기 (배치 작업용)"""
+        if self.in_flight < self.max_concurrent and not self.waiting:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if bounded and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise LimiterFull(f"LLM queue full ({self.max_waiting} waiting)")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            if bounded and self.wait_timeout:
+                await asyncio.wait_for(waiter, self.wait_timeout)
+            else:
+                await waiter
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # 슬롯을 넘겨받은 직후 취소됨 → 다음 대기자에게 반납
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+                raise LimiterFull(f"LLM queue wait exceeded {self.wait_timeout}s") from e
+            raise
+        self.admitted += 1
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # in_flight 유지한 채 슬롯 인계
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, bounded: bool = True):
+        await self.acquire(bounded)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_waiting": self.max_waiting,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+class SingleFlight:
+    """
+    키별 진행 중 작업 공유. 먼저 온 요청이 끊겨도 작업은 끝까지 실행 (캐시 기록 포함)
+    linger: 성공한 결과를 완료 후에도 잠시 공유 (비동기 캐시 기록이 반영되기 전 공백 방지)
+    """
+
+    def __init__(self, linger: float = 0.0):
+        self.linger = linger
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        return sum(1 for t in self._calls.values() if not t.done())
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """(결과, 공유 여부) 반환. 실패도 같은 키의 대기자 모두에게 전달"""
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self.started += 1
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task), shared
+
+    def _done(self, key: str, task: asyncio.Future):
+        failed = task.cancelled() or task.exception() is not None  # 미회수 예외 경고 방지
+        if self.linger > 0 and not failed:
+            asyncio.get_running_loop().call_later(self.linger, self._forget, key, task)
+        else:
+            self._forget(key, task)
+
+    def _forget(self, key: str, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": self.in_flight, "started": self.started, "coalesced": self.coalesced}
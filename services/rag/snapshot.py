@@ -0,0 +1,190 @@
+"""
+RAG 컬렉션 스냅샷 (임베딩 없이 복원 가능한 이식용 파일)
+파일 구조 (정수는 little-endian):
+  [0:8]    MAGIC "RAGSNAP1"
+  [8:64]   0 패딩 (벡터 영역 64바이트 정렬)
+  vectors  float32 × count × dim (연속 영역 → mmap 후 필요한 행 범위만 읽음)
+  ids      int64 × count (vectors와 같은 순서)
+  blocks   zlib 압축 JSON 열(column) 블록: {"필드": [값, ...]} (payloads / chunks / refs / documents)
+  footer   JSON: 메타데이터(컬렉션, 모델, 차원, 개수) + 영역/블록 offset
+  [-16:-8] footer 길이 (uint64)
+  [-8:]    MAGIC
+- 쓰기는 스트리밍: 벡터는 본 파일에, ids/블록은 임시 파일에 모았다가 마지막에 이어 붙임
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+MAGIC = b"RAGSNAP1"
+VECTORS_OFFSET = 64
+FORMAT_VERSION = 1
+_TRAILER = struct.Struct("<Q8s")
+
+
+class SnapshotError(Exception):
+    """스냅샷 파일이 아니거나 손상됨"""
+
+
+def _to_le(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _columns(rows: Sequence[Dict[str, Any]], fields: Sequence[str]) -> Dict[str, List[Any]]:
+    return {f: [row.get(f) for row in rows] for f in fields}
+
+
+def _rows(columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+class SnapshotWriter:
+    """
+    with SnapshotWriter(path, dim) as w:
+        w.add_points(ids, vectors, payloads)   # 페이지 단위로 반복
+        w.add_block("chunks", rows, fields)
+        w.finish(meta)
+    """
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self.count = 0
+        self._file = open(path, "wb")
+        self._file.write(MAGIC.ljust(VECTORS_OFFSET, b"\0"))
+        self._ids = array("q")
+        self._tail = tempfile.TemporaryFile()
+        self._blocks: Dict[str, List[Tuple[int, int]]] = {}
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._tail.close()
+        self._file.close()
+
+    def add_points(
+        self, ids: Sequence[int], vectors: Sequence[Sequence[float]], payloads: Sequence[Dict]
+    ):
+        values = array("f")
+        for vec in vectors:
+            if len(vec) != self.dim:
+                raise SnapshotError(f"Vector dimension {len(vec)} != {self.dim}")
+            values.extend(vec)
+        self._file.write(_to_le(values))
+        self._ids.extend(ids)
+        self.count += len(ids)
+        # payload는 필드 집합이 점마다 다를 수 있어 블록 안에서 필드 합집합으로 열 구성
+        fields = list(dict.fromkeys(k for pl in payloads for k in pl))
+        self.add_block("payloads", payloads, fields)
+
+    def add_block(self, name: str, rows: Sequence[Dict[str, Any]], fields: Sequence[str]):
+        if not rows:
+            return
+        data = zlib.compress(json.dumps(_columns(rows, fields)).encode(), 6)
+        self._blocks.setdefault(name, []).append((self._tail.tell(), len(data)))
+        self._tail.write(data)
+
+    def finish(self, meta: Dict[str, Any]):
+        ids_offset = self._file.tell()
+        self._file.write(_to_le(self._ids))
+        blocks_offset = self._file.tell()
+        self._tail.seek(0)
+        while True:
+            chunk = self._tail.read(1 << 20)
+            if not chunk:
+                break
+            self._file.write(chunk)
+        footer = {
+            **meta,
+            "version": FORMAT_VERSION,
+            "dim": self.dim,
+            "count": self.count,
+            "vectors": {"offset": VECTORS_OFFSET, "dtype": "<f4"},
+            "ids": {"offset": ids_offset, "dtype": "<i8"},
+            "blocks": {
+                name: [[blocks_offset + offset, length] for offset, length in spans]
+                for name, spans in self._blocks.items()
+            },
+        }
+        data = json.dumps(footer).encode()
+        self._file.write(data)
+        self._file.write(_TRAILER.pack(len(data), MAGIC))
+        self._file.flush()
+
+
+class SnapshotReader:
+    """mmap으로 열어 벡터/ids는 필요한 행 범위만 읽고, 블록은 필요할 때 하나씩 압축 해제"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size < VECTORS_OFFSET + _TRAILER.size:
+                raise SnapshotError("File too small for a snapshot")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        footer_len, magic = _TRAILER.unpack(self._mmap[-_TRAILER.size :])
+        if self._mmap[:8] != MAGIC or magic != MAGIC:
+            self.close()
+            raise SnapshotError("Not a RAG snapshot")
+        start = size - _TRAILER.size - footer_len
+        try:
+            self.meta: Dict[str, Any] = json.loads(self._mmap[max(start, 0) : start + footer_len])
+        except ValueError:
+            self.close()
+            raise SnapshotError("Corrupted snapshot footer")
+        if self.meta.get("version") != FORMAT_VERSION:
+            self.close()
+            raise SnapshotError(f"Unsupported snapshot version {self.meta.get('version')}")
+        self.dim: int = self.meta["dim"]
+        self.count: int = self.meta["count"]
+
+    def __enter__(self) -> "SnapshotReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def _array(self, typecode: str, offset: int, start: int, end: int) -> array:
+        values = array(typecode)
+        values.frombytes(
+            self._mmap[offset + start * values.itemsize : offset + end * values.itemsize]
+        )
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+
+    def ids(self, start: int = 0, end: Optional[int] = None) -> List[int]:
+        end = self.count if end is None else min(end, self.count)
+        return self._array("q", self.meta["ids"]["offset"], start, end).tolist()
+
+    def vectors(self, start: int = 0, end: Optional[int] = None) -> List[List[float]]:
+        end = self.count if end is None else min(end, self.count)
+        flat = self._array("f", self.meta["vectors"]["offset"], start * self.dim, end * self.dim)
+        return [flat[i : i + self.dim].tolist() for i in range(0, len(flat), self.dim)]
+
+    def blocks(self, name: str) -> Iterator[List[Dict[str, Any]]]:
+        """블록별 행 목록 (payloads 블록은 vectors/ids 순서와 같음)"""
+        for offset, length in self.meta["blocks"].get(name, []):
+            yield _rows(json.loads(zlib.decompress(self._mmap[offset : offset + length])))
@@ -0,0 +1,187 @@
+"""
+SQLite 점진적 유지보수 (전체 VACUUM 대체)
+- 보존 기간이 지난 행을 배치 단위로 삭제 (배치마다 커밋 → 다른 writer가 사이에 끼어들 수 있음)
+- auto_vacuum=INCREMENTAL 에서 incremental_vacuum(N)으로 빈 페이지를 N개씩 반환
+- WAL 체크포인트(TRUNCATE) + PRAGMA optimize
+- auto_vacuum이 꺼진 기존 DB는 첫 실행 때 한 번만 VACUUM으로 전환 (마이그레이션)
+- 진행 상황은 progress()로 조회 (다른 스레드에서 읽어도 됨)
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, ContextManager, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+@dataclass(frozen=True)
+class RetentionRule:
+    """table에서 condition(고정 SQL)을 만족하는 행을 삭제. WITHOUT ROWID 테이블은 key에 PK 컬럼 지정"""
+
+    table: str
+    condition: str
+    params: Tuple[Any, ...] = ()
+    key: str = "rowid"  # 예: "(bucket_start, collection, query_hash)"
+
+
+def auto_vacuum_mode(conn: sqlite3.Connection) -> int:
+    """0: NONE, 1: FULL, 2: INCREMENTAL"""
+    return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+
+def enable_incremental_auto_vacuum(conn: sqlite3.Connection) -> bool:
+    """
+    새 DB 연결 직후 호출. 테이블이 아직 없으면 즉시 적용되고,
+    이미 테이블이 있는 DB는 VACUUM 전까지 그대로이므로 False 반환 (SQLiteMaintenance가 전환)
+    """
+    if auto_vacuum_mode(conn) == AUTO_VACUUM_INCREMENTAL:
+        return True
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    return auto_vacuum_mode(conn) == AUTO_VACUUM_INCREMENTAL
+
+
+class SQLiteMaintenance:
+    """
+    transaction: 커밋/롤백을 처리하는 연결 context manager 팩토리 (RAGDatabase.transaction 등)
+    rules: 보존 정책. 순서대로 배치 삭제
+    """
+
+    def __init__(
+        self,
+        name: str,
+        transaction: Callable[[], ContextManager[sqlite3.Connection]],
+        rules: Callable[[], List[RetentionRule]],
+        delete_batch: int = 5000,
+        vacuum_pages: int = 1000,
+        pause: float = 0.01,
+        migrate: bool = True,
+    ):
+        self.name = name
+        self._transaction = transaction
+        self._rules = rules
+        self.delete_batch = max(1, delete_batch)
+        self.vacuum_pages = max(1, vacuum_pages)
+        self.pause = pause
+        self.migrate = migrate
+        self._run_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._progress: Dict[str, Any] = {"name": name, "state": "idle", "runs": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._run_lock.locked()
+
+    def progress(self) -> Dict[str, Any]:
+        with self._state_lock:
+            return {k: dict(v) if isinstance(v, dict) else v for k, v in self._progress.items()}
+
+    def _update(self, **fields):
+        with self._state_lock:
+            self._progress.update(fields)
+
+    def run(self) -> Dict[str, Any]:
+        """한 번 실행 (블로킹, 백그라운드 스레드에서 호출). 이미 실행 중이면 현재 진행 상황 반환"""
+        if not self._run_lock.acquire(blocking=False):
+            return self.progress()
+        started = time.perf_counter()
+        try:
+            self._update(
+                state="running",
+                phase=None,
+                started_at=datetime.utcnow().isoformat(),
+                finished_at=None,
+                error=None,
+                deleted={},
+                freed_pages=0,
+            )
+            self._migrate()
+            self._delete_expired()
+            self._incremental_vacuum()
+            self._checkpoint()
+            self._phase("optimize")
+            with self._transaction() as conn:
+                conn.execute("PRAGMA optimize")
+            self._update(state="idle")
+        except Exception as e:
+            logger.warning(f"SQLite maintenance ({self.name}) failed: {e}")
+            self._update(state="failed", error=str(e))
+        finally:
+            with self._state_lock:
+                self._progress["phase"] = None
+                self._progress["runs"] += 1
+                self._progress["finished_at"] = datetime.utcnow().isoformat()
+                self._progress["duration_ms"] = int((time.perf_counter() - started) * 1000)
+            self._run_lock.release()
+        return self.progress()
+
+    def _phase(self, phase: str):
+        self._update(phase=phase)
+
+    def _migrate(self):
+        with self._transaction() as conn:
+            mode = auto_vacuum_mode(conn)
+        self._update(auto_vacuum=mode)
+        if mode == AUTO_VACUUM_INCREMENTAL or not self.migrate:
+            return
+        # auto_vacuum 변경은 VACUUM으로 파일을 다시 써야 적용됨 (DB당 최초 1회만 전체 잠금)
+        self._phase("migrate_auto_vacuum")
+        with self._transaction() as conn:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            mode = auto_vacuum_mode(conn)
+        self._update(auto_vacuum=mode)
+        logger.info(f"SQLite maintenance ({self.name}): auto_vacuum migrated to {mode}")
+
+    def _delete_expired(self):
+        for rule in self._rules():
+            self._phase(f"delete:{rule.table}")
+            total = 0
+            while True:
+                with self._transaction() as conn:
+                    deleted = conn.execute(
+                        f"""
+                        DELETE FROM {rule.table} WHERE {rule.key} IN (
+                            SELECT {rule.key.strip("()")} FROM {rule.table}
+                            WHERE {rule.condition} LIMIT ?
+                        )
+                        """,
+                        (*rule.params, self.delete_batch),
+                    ).rowcount
+                total += deleted
+                with self._state_lock:
+                    self._progress["deleted"][rule.table] = total
+                if deleted < self.delete_batch:
+                    break
+                time.sleep(self.pause)
+
+    def _incremental_vacuum(self):
+        self._phase("incremental_vacuum")
+        freed = 0
+        while True:
+            with self._transaction() as conn:
+                if auto_vacuum_mode(conn) != AUTO_VACUUM_INCREMENTAL:
+                    break
+                before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if not before:
+                    break
+                # incremental_vacuum은 결과 행을 끝까지 읽어야 전부 실행됨
+                conn.execute(f"PRAGMA incremental_vacuum({self.vacuum_pages})").fetchall()
+                after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            freed += before - after
+            self._update(freed_pages=freed, freelist_pages=after)
+            if after == 0 or after >= before:
+                break
+            time.sleep(self.pause)
+
+    def _checkpoint(self):
+        self._phase("wal_checkpoint")
+        with self._transaction() as conn:
+            row = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        # (busy, WAL 프레임 수, 체크포인트된 프레임 수). WAL 모드가 아니면 -1
+        self._update(wal_checkpoint={"busy": row[0], "log": row[1], "checkpointed": row[2]})
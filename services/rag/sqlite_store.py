@@ -0,0 +1,77 @@
+"""
+RAG 로컬 SQLite 저장소 공통 베이스
+- 스레드별 연결 (WAL), :memory:는 단일 연결 공유 + 트랜잭션 직렬화
+- rag_analytics.db와 같은 디렉토리에 저장소별 파일 생성
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Optional
+
+_NULL_LOCK = nullcontext()
+
+
+def sibling_db_path(env_var: str, filename: str) -> str:
+    """env_var가 있으면 그 경로, 없으면 RAG_DB_PATH와 같은 디렉토리의 filename"""
+    explicit = os.getenv(env_var)
+    if explicit:
+        return explicit
+    analytics_path = os.getenv("RAG_DB_PATH", "/mnt/e/ai-data/sqlite/rag_analytics.db")
+    if analytics_path == ":memory:":
+        return ":memory:"
+    return str(Path(analytics_path).parent / filename)
+
+
+class SQLiteStore:
+    """스레드 안전 SQLite 연결/트랜잭션 관리 (서브클래스는 _init_schema 구현)"""
+
+    # 연결마다 적용할 추가 PRAGMA
+    pragmas: tuple = ()
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._shared_connection: Optional[sqlite3.Connection] = None
+        self._shared_lock = threading.RLock()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        if self.db_path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        for pragma in self.pragmas:
+            conn.execute(f"PRAGMA {pragma}")
+        return conn
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Thread-safe connection handling"""
+        if self.db_path == ":memory:":
+            # 스레드별 연결이면 :memory: DB가 스레드마다 따로 생기므로 하나를 공유
+            if self._shared_connection is None:
+                self._shared_connection = self._connect()
+            return self._shared_connection
+        if not hasattr(self._local, "connection"):
+            self._local.connection = self._connect()
+        return self._local.connection
+
+    @contextmanager
+    def transaction(self):
+        """Transaction context manager"""
+        conn = self._get_connection()
+        with self._shared_lock if conn is self._shared_connection else _NULL_LOCK:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _init_schema(self):
+        raise NotImplementedError
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+RAG Retrieval Benchmark (dense vs hybrid BM25+dense)
+고정 fixture 코퍼스를 색인한 뒤 두 모드의 recall@k와 검색 지연(p50/p95)을 비교
+- 실제 Qdrant / Embedding 서비스 필요 (LLM 호출 없음)
+- 렉시컬 leg의 추가 비용은 lexical_search_time_ms로 별도 표시
+
+--profiles: 컬렉션 튜닝 프로파일(latency/balanced/memory) 비교
+- 임의 단위 벡터를 프로파일별 컬렉션에 색인 (Qdrant만 필요)
+- 정답은 exact 검색, 프로파일 기본 search params로 ANN 검색한 recall@k와 p95 보고
+
+Usage:
+    QDRANT_URL=http://localhost:6333 EMBEDDING_URL=http://localhost:8003 \
+        python3 tests/benchmark_retrieval.py
+    python3 tests/benchmark_retrieval.py --docs 500 --topk 5 --repeat 3
+    python3 tests/benchmark_retrieval.py --profiles --vectors 50000 --dim 384
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+os.environ.setdefault("RAG_DB_PATH", str(Path(tempfile.gettempdir()) / "rag_bench_analytics.db"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx  # noqa: E402
+from qdrant_client import QdrantClient  # noqa: E402
+from qdrant_client.http import models as qmodels  # noqa: E402
+
+import app as rag  # noqa: E402
+from collection_profiles import PROFILES, create_collection_kwargs, search_params  # noqa: E402
+
+COLLECTION = "bench_retrieval"
+
+TOPICS = [
+    ("네트워크연결관리", "network connection handling and retry policy"),
+    ("데이터베이스마이그레이션", "database schema migration steps"),
+    ("인증토큰갱신", "authentication token refresh flow"),
+    ("캐시무효화전략", "cache invalidation strategy for services"),
+    ("로그수집파이프라인", "log collection pipeline configuration"),
+    ("배포롤백절차", "deployment rollback procedure"),
+]
+
+
+def build_corpus(n_docs: int, seed: int = 42) -> Tuple[List[Tuple[str, str]], List[Dict]]:
+    """(doc_id, text) 목록과 (query, expected_doc_id, kind) 질의 세트 생성"""
+    rng = random.Random(seed)
+    docs, queries = [], []
+    for i in range(n_docs):
+        ko, en = TOPICS[i % len(TOPICS)]
+        code = f"ERR_{rng.choice(['CONN', 'AUTH', 'DB', 'IO'])}_{1000 + i}"
+        doc_id = f"fixture/doc_{i:05d}.md"
+        text = (
+            f"{ko} 문서 {i}. This section describes {en}. "
+            f"When the service fails it reports {code} in the logs. "
+            f"{ko}에 대한 자세한 설명과 예시 코드가 포함되어 있습니다."
+        )
+        docs.append((doc_id, text))
+        if i % 5 == 0:
+            queries.append({"query": code, "expected": doc_id, "kind": "identifier"})
+        if i % 7 == 0:
+            queries.append(
+                {"query": f"{code} 오류는 왜 발생하나요", "expected": doc_id, "kind": "mixed"}
+            )
+    return docs, queries
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def index_corpus(client: httpx.AsyncClient, docs: List[Tuple[str, str]]):
+    rag.EMBED_DIM = await rag._probe_embedding_dim(client)
+    if rag.qdrant.collection_exists(COLLECTION):
+        rag.qdrant.delete_collection(COLLECTION)
+    rag._ensure_collection(COLLECTION, rag.EMBED_DIM)
+
+    payloads = [
+        {"point_id": i, "doc_id": doc_id, "chunk_id": 0, "text": text, "source": doc_id}
+        for i, (doc_id, text) in enumerate(docs)
+    ]
+    embeddings: List[List[float]] = []
+    for i in range(0, len(payloads), 64):
+        embeddings.extend(await rag._embed_texts(client, [p["text"] for p in payloads[i : i + 64]]))
+    rag.chunk_store.put_chunks(COLLECTION, payloads)
+    rag._upsert_points(COLLECTION, embeddings, [rag._qdrant_payload(p) for p in payloads])
+    rag.lexical.index_chunks(
+        COLLECTION, [(p["point_id"], p["doc_id"], p["text"]) for p in payloads]
+    )
+
+
+async def run_mode(
+    client: httpx.AsyncClient, queries: List[Dict], topk: int, hybrid: bool, repeat: int
+) -> Dict:
+    latencies, lexical_ms, hits_at_k = [], [], {}
+    for _ in range(repeat):
+        for item in queries:
+            body = rag.QueryRequest(query=item["query"], collection=COLLECTION, hybrid=hybrid)
+            start = time.perf_counter()
+            hits, timings = await rag._retrieve(client, item["query"], [COLLECTION], topk, body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            lexical_ms.append(timings.get("lexical_search_time_ms", 0.0))
+            found = item["expected"] in [h.get("doc_id") for h in hits]
+            hits_at_k.setdefault(item["kind"], []).append(found)
+
+    total = [v for values in hits_at_k.values() for v in values]
+    return {
+        "recall_at_k": sum(total) / max(1, len(total)),
+        "recall_by_kind": {k: sum(v) / len(v) for k, v in hits_at_k.items()},
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+        "lexical_p95_ms": percentile(lexical_ms, 95),
+    }
+
+
+def random_vectors(n: int, dim: int, rng: random.Random) -> List[List[float]]:
+    out = []
+    for _ in range(n):
+        vec = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+        norm = sum(v * v for v in vec) ** 0.5 or 1.0
+        out.append([v / norm for v in vec])
+    return out
+
+
+def wait_until_indexed(collection: str, timeout: float = 600.0):
+    """optimizer가 HNSW/양자화 구축을 끝낼 때까지 대기 (status green)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if rag.qdrant.get_collection(collection).status == qmodels.CollectionStatus.GREEN:
+            return
+        time.sleep(1.0)
+
+
+def run_profile(name: str, vectors: List[List[float]], queries: List[List[float]], topk: int):
+    collection = f"bench_profile_{name}"
+    profile = PROFILES[name]
+    if rag.qdrant.collection_exists(collection):
+        rag.qdrant.delete_collection(collection)
+    rag.qdrant.create_collection(
+        collection_name=collection, **create_collection_kwargs(profile, len(vectors[0]))
+    )
+    for i in range(0, len(vectors), 1000):
+        rag.qdrant.upsert(
+            collection_name=collection,
+            points=[
+                qmodels.PointStruct(id=i + j, vector=vec)
+                for j, vec in enumerate(vectors[i : i + 1000])
+            ],
+        )
+    wait_until_indexed(collection)
+
+    exact = search_params(None, exact=True)
+    ann = search_params(profile)
+    latencies, recalls = [], []
+    for vec in queries:
+        truth = rag._search(collection, vec, topk, exact)
+        start = time.perf_counter()
+        found = rag._search(collection, vec, topk, ann)
+        latencies.append((time.perf_counter() - start) * 1000)
+        expected = {h["id"] for h in truth}
+        recalls.append(len(expected & {h["id"] for h in found}) / max(1, len(expected)))
+
+    rag.qdrant.delete_collection(collection)
+    return {
+        "recall_at_k": statistics.mean(recalls),
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+    }
+
+
+def profile_benchmark(args):
+    rng = random.Random(42)
+    vectors = random_vectors(args.vectors, args.dim, rng)
+    queries = random_vectors(args.queries, args.dim, rng)
+    print(
+        f"Profiles: {args.vectors} vectors x {args.dim}d, {args.queries} queries (topk={args.topk})\n"
+    )
+    print(f"{'profile':<10} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for name in PROFILES:
+        r = run_profile(name, vectors, queries, args.topk)
+        print(f"{name:<10} {r['recall_at_k']:>9.3f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Dense vs hybrid retrieval benchmark")
+    parser.add_argument("--docs", type=int, default=300, help="fixture corpus size")
+    parser.add_argument("--topk", type=int, default=rag.RAG_TOPK)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--profiles", action="store_true", help="compare collection profiles")
+    parser.add_argument("--vectors", type=int, default=20000, help="vectors per profile")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rag.qdrant = QdrantClient(url=rag.QDRANT_URL, timeout=30.0)
+    if args.profiles:
+        profile_benchmark(args)
+        return
+    docs, queries = build_corpus(args.docs)
+
+    async with httpx.AsyncClient() as client:
+        print(f"Indexing {len(docs)} fixture docs into '{COLLECTION}'...")
+        await index_corpus(client, docs)
+
+        print(f"Running {len(queries)} queries x {args.repeat} (topk={args.topk})\n")
+        print(f"{'mode':<8} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'lex p95':>8}  by kind")
+        for mode, hybrid in (("dense", False), ("hybrid", True)):
+            r = await run_mode(client, queries, args.topk, hybrid, args.repeat)
+            kinds = ", ".join(f"{k}={v:.2f}" for k, v in sorted(r["recall_by_kind"].items()))
+            print(
+                f"{mode:<8} {r['recall_at_k']:>9.3f} {r['p50_ms']:>8.1f} "
+                f"{r['p95_ms']:>8.1f} {r['lexical_p95_ms']:>8.2f}  {kinds}"
+            )
+
+    rag.qdrant.delete_collection(COLLECTION)
+    rag.chunk_store.delete_collection(COLLECTION)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -10,6 +10,7 @@ NOTE: RAG service behavior:
 - Tests validate actual service responses, not idealized error codes
 """
 
+import asyncio
 import os
 import sys
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -913,3 +914,1735 @@ async def test_health_all_dependencies_down(app_with_mocks, mock_qdrant_client):
             if response.status_code == 200:
                 data = response.json()
                 assert data["status"] in ["degraded", "unhealthy"]
+
+
+# ============================================================================
+# Async Batched Analytics Writer
+# ============================================================================
+
+
+def test_analytics_writer_batches_and_aggregates_access():
+    """Writer flushes searches/cache in bulk and sums access counts per doc_id"""
+    from analytics_writer import AnalyticsWriter
+    from database import RAGDatabase
+
+    database = RAGDatabase(":memory:")
+    database.update_document_metadata("doc-a", "a.md", 10, 1, "test", "x")
+    writer = AnalyticsWriter(database)
+
+    writer.cache_query("q1", "col", "answer", [{"doc_id": "doc-a"}], ttl_hours=1)
+    for _ in range(3):
+        writer.log_search(collection="col", query="q1", results_count=1, response_time_ms=5)
+        writer.track_document_access("doc-a")
+    writer.stop()
+
+    stats = writer.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["written"] == 7
+    assert stats["dropped"] == 0
+    assert database.get_cached_query("q1", "col")["response"] == "answer"
+    with database.transaction() as conn:
+        logged = conn.execute("SELECT COUNT(*) FROM search_logs").fetchone()[0]
+        accessed = conn.execute(
+            "SELECT access_count FROM document_metadata WHERE doc_id = 'doc-a'"
+        ).fetchone()[0]
+    assert logged == 3
+    assert accessed == 3
+
+
+def test_analytics_writer_keeps_good_rows_when_one_fails():
+    """A bad row only drops itself; other kinds and rows are still written, expiry is UTC"""
+    from analytics_writer import AnalyticsWriter
+    from database import RAGDatabase
+
+    database = RAGDatabase(":memory:")
+    writer = AnalyticsWriter(database)
+
+    writer.cache_query("good", "col", "answer", [], ttl_hours=1)
+    writer.cache_query("bad", "col", object(), [])  # not bindable → fails on insert
+    writer.log_search(collection="col", query="good", results_count=1, response_time_ms=5)
+    writer.stop()
+
+    stats = writer.stats()
+    assert stats["written"] == 2
+    assert stats["lost"] == 1
+    assert database.get_cached_query("good", "col")["response"] == "answer"
+    with database.transaction() as conn:
+        logged = conn.execute("SELECT COUNT(*) FROM search_logs").fetchone()[0]
+        drift = conn.execute(
+            "SELECT ABS(julianday(expires_at) - julianday('now', '+1 hour')) * 86400"
+            " FROM query_cache"
+        ).fetchone()[0]
+    assert logged == 1
+    assert drift < 60
+
+
+def test_analytics_writer_drops_when_queue_full():
+    """Full queue never blocks the caller; overflow is counted as dropped"""
+    from analytics_writer import AnalyticsWriter
+    from database import RAGDatabase
+
+    writer = AnalyticsWriter(RAGDatabase(":memory:"), max_queue_size=2)
+    writer.start = lambda: None  # keep the writer idle so the queue fills up
+
+    results = [writer.track_document_access("doc") for _ in range(5)]
+
+    assert results == [True, True, False, False, False]
+    assert writer.stats()["dropped"] == 3
+    assert writer.stats()["queue_depth"] == 2
+
+
+@pytest.mark.asyncio
+async def test_query_defers_analytics_writes(app_with_mocks, mock_qdrant_client):
+    """/query enqueues cache/log/access writes instead of writing synchronously"""
+    mock_qdrant_client.search.return_value = [
+        MagicMock(payload={"text": "ctx", "doc_id": "d1", "chunk_id": 0}, score=0.9)
+    ]
+    transport = ASGITransport(app=app_with_mocks)
+    with (
+        patch.object(rag_app_module.db, "log_search") as sync_log,
+        patch.object(rag_app_module.analytics, "_put", return_value=True) as put,
+    ):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/query", json={"query": "deferred analytics", "collection": "c"}
+            )
+
+    assert response.status_code == 200
+    assert not sync_log.called
+    kinds = [call.args[0] for call in put.call_args_list]
+    assert kinds == ["cache", "search", "access"]
+
+
+# ============================================================================
+# SSE Streaming (/query/stream)
+# ============================================================================
+
+
+class _FakeStream:
+    """Async context manager mimicking httpx streaming response"""
+
+    def __init__(self, lines):
+        self._lines = lines
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+    def raise_for_status(self):
+        pass
+
+    async def aiter_lines(self):
+        for line in self._lines:
+            yield line
+
+
+@pytest.mark.asyncio
+async def test_query_stream_emits_context_deltas_usage(app_with_mocks, mock_qdrant_client):
+    """/query/stream sends context first, forwards deltas, ends with usage and caches"""
+    import json as _json
+
+    mock_qdrant_client.search.return_value = [
+        MagicMock(payload={"text": "ctx", "doc_id": "d1", "chunk_id": 0}, score=0.9)
+    ]
+    gateway_lines = [
+        'data: {"choices": [{"index": 0, "delta": {"content": "안녕"}}]}',
+        'data: {"choices": [{"index": 0, "delta": {"content": "하세요"}}]}',
+        'data: {"choices": [], "usage": {"total_tokens": 12}}',
+        "data: [DONE]",
+    ]
+    client_mock = rag_app_module.httpx.AsyncClient.return_value.__aenter__.return_value
+    client_mock.stream = MagicMock(return_value=_FakeStream(gateway_lines))
+
+    transport = ASGITransport(app=app_with_mocks)
+    with patch.object(rag_app_module.analytics, "cache_query") as cache_query:
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/query/stream", json={"query": "stream test", "collection": "c"}
+            )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = [b for b in response.text.split("\n\n") if b]
+    assert blocks[0].startswith("event: context")
+    deltas = [
+        _json.loads(b[len("data: ") :])["choices"][0]["delta"]["content"]
+        for b in blocks
+        if b.startswith("data: {")
+    ]
+    assert deltas == ["안녕", "하세요"]
+    assert blocks[-2].startswith("event: usage")
+    assert '"total_tokens": 12' in blocks[-2]
+    assert blocks[-1] == "data: [DONE]"
+    assert cache_query.call_args.args[2] == "안녕하세요"
+    assert client_mock.stream.call_args.kwargs["json"]["stream"] is True
+
+
+class _BrokenStream(_FakeStream):
+    async def aiter_lines(self):
+        for line in self._lines:
+            yield line
+        raise rag_app_module.httpx.ReadError("gateway disconnected")
+
+
+@pytest.mark.asyncio
+async def test_query_stream_ends_with_error_event_on_midstream_failure(
+    app_with_mocks, mock_qdrant_client
+):
+    """A gateway failure after headers were sent ends with an error usage event and [DONE]"""
+    mock_qdrant_client.search.return_value = [
+        MagicMock(payload={"text": "ctx", "doc_id": "d1", "chunk_id": 0}, score=0.9)
+    ]
+    gateway_lines = ['data: {"choices": [{"index": 0, "delta": {"content": "부분"}}]}']
+    client_mock = rag_app_module.httpx.AsyncClient.return_value.__aenter__.return_value
+    client_mock.stream = MagicMock(return_value=_BrokenStream(gateway_lines))
+
+    transport = ASGITransport(app=app_with_mocks)
+    with patch.object(rag_app_module.analytics, "cache_query") as cache_query:
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/query/stream", json={"query": "broken stream", "collection": "c"}
+            )
+
+    blocks = [b for b in response.text.split("\n\n") if b]
+    assert response.status_code == 200
+    assert "부분" in blocks[1]
+    assert blocks[-2].startswith("event: usage")
+    assert "gateway disconnected" in blocks[-2]
+    assert blocks[-1] == "data: [DONE]"
+    cache_query.assert_not_called()
+
+
+# ============================================================================
+# Hybrid BM25 + Dense Retrieval (RRF)
+# ============================================================================
+
+
+def test_lexical_index_matches_identifiers_and_korean_compounds():
+    """FTS5 index finds exact error codes and Korean compound sub-terms"""
+    from lexical_index import LexicalIndex
+
+    index = LexicalIndex(":memory:")
+    index.index_chunks(
+        "col",
+        [
+            (0, "a.md", "연결 실패 시 ERR_CONN_42 코드가 반환됩니다"),
+            (1, "b.md", "파이썬프로그래밍 입문서"),
+            (2, "c.md", "unrelated content"),
+        ],
+    )
+    # 같은 point_id 재색인은 교체
+    index.index_chunks("col", [(2, "c.md", "other unrelated content")])
+
+    assert [h["id"] for h in index.search("col", "ERR_CONN_42", 5)] == [0]
+    assert [h["id"] for h in index.search("col", "프로그래밍", 5)] == [1]
+    assert index.search("other-col", "ERR_CONN_42", 5) == []
+    assert index.count("col") == 3
+
+
+def test_reciprocal_rank_fusion_weights():
+    """RRF rewards agreement between legs and honours per-leg weights"""
+    from lexical_index import reciprocal_rank_fusion
+
+    dense = [{"id": 1}, {"id": 2}]
+    lexical_hits = [{"id": 2}, {"id": 3}]
+
+    fused = reciprocal_rank_fusion([(dense, 1.0), (lexical_hits, 1.0)], k=60)
+    assert [h["id"] for h in fused] == [2, 1, 3]
+
+    dense_only = reciprocal_rank_fusion([(dense, 1.0), (lexical_hits, 0.0)], k=60)
+    assert [h["id"] for h in dense_only] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_query_hybrid_fuses_lexical_only_hits(app_with_mocks, mock_qdrant_client):
+    """Lexical-only hits are fused in and their payloads fetched in one retrieve call"""
+    from lexical_index import LexicalIndex
+
+    index = LexicalIndex(":memory:")
+    index.index_chunks("hybrid-col", [(7, "codes.md", "ERR_CONN_42 troubleshooting")])
+    mock_qdrant_client.search.return_value = [
+        MagicMock(id=1, payload={"text": "dense text", "doc_id": "d.md", "chunk_id": 0}, score=0.8)
+    ]
+    mock_qdrant_client.retrieve.return_value = [
+        MagicMock(id=7, payload={"text": "ERR_CONN_42 troubleshooting", "doc_id": "codes.md"})
+    ]
+
+    transport = ASGITransport(app=app_with_mocks)
+    with patch.object(rag_app_module, "lexical", index):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/query",
+                json={
+                    "query": "ERR_CONN_42",
+                    "collection": "hybrid-col",
+                    "topk": 2,
+                    "lexical_weight": 2.0,
+                },
+            )
+
+    assert response.status_code == 200
+    context = response.json()["context"]
+    assert [c["doc_id"] for c in context] == ["codes.md", "d.md"]
+    assert mock_qdrant_client.retrieve.call_args.kwargs["ids"] == [7]
+    assert (
+        mock_qdrant_client.search.call_args.kwargs["limit"] == rag_app_module.RAG_HYBRID_CANDIDATES
+    )
+
+
+# ============================================================================
+# Tokenizer-based Chunking and Context Budgeting
+# ============================================================================
+
+
+def test_token_counter_chunks_by_offsets_with_overlap():
+    """Chunks are slices of the original text with exact token windows and offsets"""
+    from token_counter import TokenCounter
+
+    counter = TokenCounter()  # heuristic backend (no tokenizer loaded)
+    text = " ".join(f"w{i}" for i in range(100))
+
+    spans = counter.chunk_spans(text, size=30, overlap=10, snap_ratio=0.0)
+
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    for start, end in spans:
+        chunk = text[start:end]
+        assert chunk == chunk.strip()
+        assert counter.count(chunk) <= 30 * 2  # "w12" = 2 heuristic tokens per word
+    # 인접 청크는 overlap만큼 겹침
+    assert spans[1][0] < spans[0][1]
+
+
+def test_token_counter_snaps_to_sentence_end():
+    """Window end snaps back to a sentence boundary inside the snap zone"""
+    from token_counter import TokenCounter
+
+    counter = TokenCounter()
+    text = "가나다라마바사아자차. 카타파하가나다라마바사아자차카타파하"
+    spans = counter.chunk_spans(text, size=12, overlap=0, snap_ratio=0.25)
+
+    assert text[spans[0][0] : spans[0][1]] == "가나다라마바사아자차."
+
+
+def test_token_counter_uses_real_tokenizer_when_loaded():
+    """A loaded HF tokenizer drives counts and offsets instead of the heuristic"""
+    tokenizers = pytest.importorskip("tokenizers")
+    from tokenizers.models import WordLevel
+    from tokenizers.pre_tokenizers import Whitespace
+    from token_counter import TokenCounter
+
+    vocab = {"[UNK]": 0, "안녕하세요": 1, "hello": 2, "world": 3}
+    tok = tokenizers.Tokenizer(WordLevel(vocab, unk_token="[UNK]"))
+    tok.pre_tokenizer = Whitespace()
+    counter = TokenCounter("custom", tokenizer=tok)
+
+    assert counter.backend == "tokenizers"
+    assert counter.count("안녕하세요 hello world") == 3
+    assert counter.truncate("안녕하세요 hello world", 2) == "안녕하세요 hello"
+
+
+def test_pack_context_fills_budget_exactly():
+    """Context packing truncates the last hit to the remaining token budget"""
+    hits = [{"text": "가" * 50}, {"text": "나" * 50}, {"text": "다" * 50}]
+
+    ctx = rag_app_module._pack_context(hits, budget=120)
+
+    assert [len(c) for c in ctx] == [50, 50, 20]
+    assert sum(rag_app_module.chat_tokens.count(c) for c in ctx) == 120
+
+
+# ============================================================================
+# Multi-collection Fan-out
+# ============================================================================
+
+
+@pytest.mark.asyncio
+async def test_query_fans_out_across_collections(app_with_mocks, mock_qdrant_client):
+    """One embedding + one LLM call for N collections; hits merged by score"""
+    by_collection = {
+        "docs-a": [MagicMock(id=1, payload={"text": "a", "doc_id": "a.md"}, score=0.6)],
+        "docs-b": [MagicMock(id=1, payload={"text": "b", "doc_id": "b.md"}, score=0.9)],
+    }
+    mock_qdrant_client.search.side_effect = lambda collection_name, **kw: by_collection[
+        collection_name
+    ]
+
+    client_mock = rag_app_module.httpx.AsyncClient.return_value.__aenter__.return_value
+    original_post = client_mock.post
+    calls = []
+
+    async def counting_post(url, **kwargs):
+        calls.append(url)
+        return await original_post(url, **kwargs)
+
+    client_mock.post = counting_post
+    transport = ASGITransport(app=app_with_mocks)
+    with patch.object(rag_app_module.analytics, "cache_query") as cache_query:
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/query",
+                json={
+                    "query": "fan-out question",
+                    "collections": ["docs-b", "docs-a", "docs-b"],
+                    "hybrid": False,
+                },
+            )
+
+    assert response.status_code == 200
+    context = response.json()["context"]
+    assert [(c["collection"], c["doc_id"]) for c in context] == [
+        ("docs-b", "b.md"),
+        ("docs-a", "a.md"),
+    ]
+    assert sum("/embed" in u for u in calls) == 1
+    assert sum("/chat/completions" in u for u in calls) == 1
+    # 캐시 키는 순서와 무관한 컬렉션 집합 (+ 색인 버전)
+    assert cache_query.call_args.args[1] == 'docs-a@v0,docs-b@v0#{"hybrid": false}'
+
+
+@pytest.mark.asyncio
+async def test_dense_fan_out_normalizes_scores_per_collection(app_with_mocks, mock_qdrant_client):
+    """Dense-only merge is per-collection max-normalized so low-scoring models still contribute"""
+
+    def hit(pid, doc, score):
+        return MagicMock(id=pid, payload={"text": doc, "doc_id": doc}, score=score)
+
+    by_collection = {
+        "high-a": [hit(1, "a1.md", 0.9), hit(2, "a2.md", 0.88)],
+        "low-b": [hit(1, "b1.md", 0.3), hit(2, "b2.md", 0.2)],
+    }
+    mock_qdrant_client.search.side_effect = lambda collection_name, **kw: by_collection[
+        collection_name
+    ]
+
+    transport = ASGITransport(app=app_with_mocks)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/query",
+            json={
+                "query": "normalized fan-out",
+                "collections": ["high-a", "low-b"],
+                "hybrid": False,
+                "select_context": False,
+                "topk": 2,
+            },
+        )
+
+    assert response.status_code == 200
+    assert [c["doc_id"] for c in response.json()["context"]] == ["a1.md", "b1.md"]
+
+
+# ============================================================================
+# Batch Query (/query/batch)
+# ============================================================================
+
+
+@pytest.mark.asyncio
+async def test_query_batch_streams_ndjson_in_input_order(app_with_mocks, mock_qdrant_client):
+    """One embed call + one Qdrant batch search per window; NDJSON keeps input order"""
+    import json as _json
+
+    def batch_points(collection_name, requests):
+        return [
+            MagicMock(
+                points=[MagicMock(id=n, payload={"text": f"t{n}", "doc_id": f"d{n}"}, score=0.5)]
+            )
+            for n, _ in enumerate(requests)
+        ]
+
+    mock_qdrant_client.query_batch_points.side_effect = batch_points
+    client_mock = rag_app_module.httpx.AsyncClient.return_value.__aenter__.return_value
+    original_post = client_mock.post
+    embed_calls = []
+
+    async def counting_post(url, **kwargs):
+        if "/embed" in url:
+            embed_calls.append(kwargs["json"]["texts"])
+        return await original_post(url, **kwargs)
+
+    client_mock.post = counting_post
+    transport = ASGITransport(app=app_with_mocks)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/query/batch",
+            json={
+                "queries": ["batch q1", "  ", "batch q2"],
+                "collection": "batch-col",
+                "hybrid": False,
+                "use_cache": False,
+            },
+        )
+
+    assert response.status_code == 200
+    rows = [_json.loads(line) for line in response.text.splitlines()]
+    assert [r["index"] for r in rows] == [0, 1, 2]
+    assert rows[0]["answer"] == "Mock answer based on context"
+    assert rows[0]["context"][0]["doc_id"] == "d0"
+    assert rows[1]["usage"] == {"error": "empty query"}
+    assert rows[2]["context"][0]["doc_id"] == "d1"
+    assert embed_calls == [["batch q1", "batch q2"]]
+    assert mock_qdrant_client.query_batch_points.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_query_batch_producer_failure_still_ends_stream(app_with_mocks):
+    """A producer error resolves queued placeholders and emits an error line for every query"""
+    import json as _json
+
+    real_get = rag_app_module.db.get_cached_query
+
+    def flaky_get(query, scope):
+        if query == "boom":
+            raise RuntimeError("cache unavailable")
+        return real_get(query, scope)
+
+    transport = ASGITransport(app=app_with_mocks)
+    with patch.object(rag_app_module.db, "get_cached_query", side_effect=flaky_get):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await asyncio.wait_for(
+                client.post(
+                    "/query/batch",
+                    json={"queries": ["fine", "boom", "after"], "collection": "batch-col"},
+                ),
+                timeout=5,
+            )
+
+    rows = [_json.loads(line) for line in response.text.splitlines()]
+    assert [r["index"] for r in rows] == [0, 1, 2]
+    assert all(r["error"] == "cache unavailable" for r in rows)
+
+
+# ============================================================================
+# Local Chunk Store (text out of Qdrant payloads)
+# ============================================================================
+
+
+def test_chunk_store_batched_lookup():
+    """Chunks are stored per (collection, point_id) and fetched in one lookup"""
+    from chunk_store import ChunkStore
+
+    store = ChunkStore(":memory:")
+    store.put_chunks(
+        "col",
+        [
+            {"point_id": i, "doc_id": "a.md", "chunk_id": i, "text": f"chunk {i}"}
+            for i in range(1000)
+        ],
+    )
+
+    found = store.get_chunks("col", [5, 999, 5000])
+    assert sorted(found) == [5, 999]
+    assert found[999]["text"] == "chunk 999"
+    assert store.get_chunks("other", [5]) == {}
+    assert len(store.get_chunks("col", list(range(1000)))) == 1000
+
+
+@pytest.mark.asyncio
+async def test_index_keeps_text_out_of_qdrant_payload(app_with_mocks, mock_qdrant_client, tmp_path):
+    """/index writes text to the chunk store; /query resolves it from there"""
+    from chunk_store import ChunkStore
+
+    (tmp_path / "guide.md").write_text("청크 저장소 테스트 문서입니다.", encoding="utf-8")
+    store = ChunkStore(":memory:")
+    transport = ASGITransport(app=app_with_mocks)
+    with (
+        patch.object(rag_app_module, "chunk_store", store),
+        patch.object(rag_app_module, "DOCUMENTS_DIR", str(tmp_path)),
+    ):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/index", params={"collection": "store-col"})
+            assert response.json()["chunks"] == 1
+
+            point = mock_qdrant_client.upsert.call_args.kwargs["points"][0]
+            assert "text" not in point.payload and "doc_id" not in point.payload
+
+            mock_qdrant_client.search.return_value = [
+                MagicMock(id=point.id, payload=None, score=0.9)
+            ]
+            response = await client.post(
+                "/query",
+                json={"query": "chunk store query", "collection": "store-col", "hybrid": False},
+            )
+
+    assert mock_qdrant_client.search.call_args.kwargs["with_payload"] is False
+    assert response.json()["context"][0]["doc_id"].endswith("guide.md")
+    assert not mock_qdrant_client.retrieve.called
+
+
+@pytest.mark.asyncio
+async def test_index_with_profile_and_query_ef_override(
+    app_with_mocks, mock_qdrant_client, tmp_path
+):
+    """A new collection gets the profile's HNSW/quantization config; queries use its search params"""
+    from qdrant_client.http import models as qmodels
+
+    (tmp_path / "guide.md").write_text("프로파일 테스트 문서입니다.", encoding="utf-8")
+    transport = ASGITransport(app=app_with_mocks)
+    with patch.object(rag_app_module, "DOCUMENTS_DIR", str(tmp_path)):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/index", params={"collection": "profile-col", "profile": "memory"}
+            )
+            assert response.status_code == 200
+
+            kwargs = mock_qdrant_client.create_collection.call_args.kwargs
+            assert kwargs["vectors_config"].on_disk is True
+            assert kwargs["on_disk_payload"] is True
+            assert isinstance(kwargs["quantization_config"], qmodels.BinaryQuantization)
+
+            response = await client.post(
+                "/query",
+                json={
+                    "query": "profile query",
+                    "collection": "profile-col",
+                    "hybrid": False,
+                    "hnsw_ef": 256,
+                },
+            )
+            assert response.status_code == 200
+
+            bad = await client.post("/index", params={"collection": "x", "profile": "fastest"})
+            assert bad.status_code == 400
+
+    params = mock_qdrant_client.search.call_args.kwargs["search_params"]
+    assert params.hnsw_ef == 256
+    assert params.exact is False
+    assert params.quantization.rescore is True
+    assert params.quantization.oversampling == 3.0
+
+
+@pytest.mark.asyncio
+async def test_apply_profile_to_existing_collection(app_with_mocks, mock_qdrant_client):
+    """Admin endpoint updates an existing collection and records the profile"""
+    from qdrant_client.http import models as qmodels
+
+    transport = ASGITransport(app=app_with_mocks)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/collections/tuned-col/profile", params={"profile": "latency"}
+        )
+        assert response.status_code == 200
+        assert response.json()["profile"]["m"] == 32
+
+        kwargs = mock_qdrant_client.update_collection.call_args.kwargs
+        assert kwargs["hnsw_config"].m == 32
+        assert kwargs["vectors_config"][""].on_disk is False
+        assert isinstance(kwargs["quantization_config"], qmodels.ScalarQuantization)
+        assert rag_app_module.db.get_collection_settings("tuned-col")["profile"] == "latency"
+
+        bad = await client.post("/collections/tuned-col/profile", params={"profile": "nope"})
+        assert bad.status_code == 400
+
+        mock_qdrant_client.collection_exists.return_value = False
+        missing = await client.post("/collections/ghost/profile", params={"profile": "memory"})
+        assert missing.status_code == 404
+
+
+# ============================================================================
+# Payload-indexed Filtered Retrieval
+# ============================================================================
+
+
+def test_qdrant_payload_and_filter_fields():
+    """Payload carries indexed filter fields; filters expand host-mapped paths"""
+    payload = rag_app_module._qdrant_payload(
+        {"point_id": 3, "doc_id": "/mnt/host/proj/docs/Guide.MD", "mtime": 100.0, "checksum": "ab"}
+    )
+    assert payload["path_prefixes"] == [
+        "/mnt",
+        "/mnt/host",
+        "/mnt/host/proj",
+        "/mnt/host/proj/docs",
+    ]
+    assert payload["ext"] == "md"
+    assert "text" not in payload and "doc_id" not in payload
+
+    qfilter = rag_app_module._qdrant_filter(
+        rag_app_module.QueryFilter(path_prefix="/proj/docs/", extensions=[".MD"], modified_after=50)
+    )
+    paths, exts, mtime = qfilter.must
+    assert paths.match.any == ["/proj/docs", "/mnt/host/proj/docs"]
+    assert exts.match.any == ["md"]
+    assert mtime.range.gte == 50 and mtime.range.lt is None
+    assert rag_app_module._qdrant_filter(rag_app_module.QueryFilter()) is None
+
+
+@pytest.mark.asyncio
+async def test_query_filter_pushed_down_to_both_legs(app_with_mocks, mock_qdrant_client):
+    """Filters reach the Qdrant search and the BM25 leg, and get their own cache entry"""
+    from chunk_store import ChunkStore
+    from lexical_index import LexicalIndex
+
+    index = LexicalIndex(":memory:")
+    index.index_chunks(
+        "filter-col",
+        [
+            (1, "docs/api/a.md", "ERR_DB_7 설명", 200.0),
+            (2, "docs/guide/b.txt", "ERR_DB_7 가이드", 200.0),
+            (3, "docs/api/old.md", "ERR_DB_7 이전 문서", 10.0),
+        ],
+    )
+    store = ChunkStore(":memory:")
+    store.put_chunks(
+        "filter-col", [{"point_id": 1, "doc_id": "docs/api/a.md", "chunk_id": 0, "text": "설명"}]
+    )
+    body = {
+        "query": "ERR_DB_7",
+        "collection": "filter-col",
+        "filter": {"path_prefix": "docs/api", "extensions": ["md"], "modified_after": 100},
+    }
+    transport = ASGITransport(app=app_with_mocks)
+    with (
+        patch.object(rag_app_module, "lexical", index),
+        patch.object(rag_app_module, "chunk_store", store),
+    ):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/query", json=body)
+    assert response.status_code == 200
+
+    qfilter = mock_qdrant_client.search.call_args.kwargs["query_filter"]
+    assert [c.key for c in qfilter.must] == ["path_prefixes", "ext", "mtime"]
+    assert [c["doc_id"] for c in response.json()["context"]] == ["docs/api/a.md"]
+
+    scope = rag_app_module._cache_scope
+    unfiltered = scope(["filter-col"], rag_app_module.QueryRequest(query="q"))
+    filtered = scope(["filter-col"], rag_app_module.QueryRequest(**body))
+    assert unfiltered == "filter-col@v0" and filtered.startswith(unfiltered + "?")
+
+
+def test_cache_scope_separates_retrieval_options():
+    """Requests with different retrieval options never share cached or coalesced answers"""
+    scope = rag_app_module._cache_scope
+    QueryRequest = rag_app_module.QueryRequest
+    default = scope(["opt-col"], QueryRequest(query="q"))
+    same_topk = scope(["opt-col"], QueryRequest(query="Q", topk=rag_app_module.RAG_TOPK))
+    variants = [
+        scope(["opt-col"], QueryRequest(query="q", **options))
+        for options in [
+            {"hybrid": False},
+            {"dense_weight": 2.0},
+            {"lexical_weight": 0.5},
+            {"candidates": 10},
+            {"topk": rag_app_module.RAG_TOPK + 1},
+            {"hnsw_ef": 256},
+            {"exact": True},
+            {"select_context": False},
+            {"mmr_lambda": 0.3},
+            {"min_relative_score": 0.5},
+            {"neighbors": 1},
+        ]
+    ]
+    assert default == same_topk == "opt-col@v0"
+    assert len({default, *variants}) == len(variants) + 1
+    assert rag_app_module._flight_key("q", variants[0]) != rag_app_module._flight_key("q", default)
+
+
+# ============================================================================
+# Analytics Rollups
+# ============================================================================
+
+
+def test_latency_sketch_quantiles_and_merge():
+    """Sketch quantiles stay within relative accuracy and merge losslessly"""
+    from latency_sketch import LatencySketch
+
+    first, second = LatencySketch(), LatencySketch()
+    first.extend(range(1, 501))
+    second.extend(range(501, 1001))
+    merged = LatencySketch.from_json(first.to_json()).merge(second)
+
+    assert merged.count == 1000
+    assert merged.quantile(0.5) == pytest.approx(500, rel=0.02)
+    assert merged.quantile(0.99) == pytest.approx(990, rel=0.02)
+    assert merged.mean == pytest.approx(500.5)
+
+
+@pytest.mark.asyncio
+async def test_rollups_feed_analytics_endpoints(app_with_mocks):
+    """Incremental rollups merge into existing buckets; endpoints read only rollups"""
+    from database import RAGDatabase
+
+    test_db = RAGDatabase(":memory:")
+    test_db.log_searches_bulk(
+        [
+            {"collection": "a", "query": "q1", "response_time_ms": 100, "llm_tokens_used": 10},
+            {"collection": "a", "query": "q1", "response_time_ms": 300, "llm_tokens_used": 10},
+        ]
+    )
+    assert test_db.rollup_search_logs()["rolled_up"] == 2
+    test_db.log_search("b", "q2", results_count=4, response_time_ms=200, llm_response_time_ms=150)
+    assert test_db.rollup_search_logs()["rolled_up"] == 1
+    assert test_db.rollup_search_logs()["rolled_up"] == 0
+
+    transport = ASGITransport(app=app_with_mocks)
+    with patch.object(rag_app_module, "db", test_db):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            summary = (await client.get("/analytics")).json()
+            latency = (await client.get("/analytics/latency", params={"collection": "a"})).json()
+
+    assert summary["total_searches"] == 3
+    assert summary["avg_response_time"] == pytest.approx(200)
+    assert summary["total_tokens"] == 20
+    assert summary["top_queries"][0] == {"query": "q1", "count": 2}
+    assert {c["collection"] for c in summary["collection_usage"]} == {"a", "b"}
+
+    assert latency["stages"]["total"]["count"] == 2
+    assert latency["stages"]["total"]["p99"] == pytest.approx(300, rel=0.02)
+    assert len(latency["buckets"]) == 1
+
+
+# ============================================================================
+# Index-versioned Cache Invalidation
+# ============================================================================
+
+
+@pytest.mark.asyncio
+async def test_reindex_invalidates_only_that_collections_cache(app_with_mocks, tmp_path):
+    """Indexing bumps the collection's version, so only its cached answers stop matching"""
+    from database import RAGDatabase
+
+    test_db = RAGDatabase(":memory:")
+    (tmp_path / "doc.md").write_text("버전 테스트 문서", encoding="utf-8")
+    transport = ASGITransport(app=app_with_mocks)
+    with (
+        patch.object(rag_app_module, "db", test_db),
+        patch.object(rag_app_module, "DOCUMENTS_DIR", str(tmp_path)),
+    ):
+        scope_a = rag_app_module._cache_scope(["ver-a"], None)
+        scope_b = rag_app_module._cache_scope(["ver-b"], None)
+        test_db.cache_query("same question", scope_a, "old answer", [])
+        test_db.cache_query("same question", scope_b, "b answer", [])
+
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            before = await client.post(
+                "/query", json={"query": "same question", "collection": "ver-a"}
+            )
+            await client.post("/index", params={"collection": "ver-a"})
+            after = await client.post(
+                "/query", json={"query": "same question", "collection": "ver-a"}
+            )
+            other = await client.post(
+                "/query", json={"query": "same question", "collection": "ver-b"}
+            )
+
+        assert test_db.get_index_versions(["ver-a", "ver-b"]) == {"ver-a": 1, "ver-b": 0}
+        assert rag_app_module._cache_scope(["ver-b", "ver-a"], None) == "ver-a@v1,ver-b@v0"
+
+    assert before.json()["cached"] is True and before.json()["answer"] == "old answer"
+    assert after.json()["cached"] is False
+    assert other.json()["cached"] is True and other.json()["answer"] == "b answer"
+
+
+# ============================================================================
+# Prefix-stable Prompt Layout
+# ============================================================================
+
+
+def test_prefix_stable_prompt_shares_prefix_across_questions():
+    """Same chunks in any hit order give a byte-identical prefix; question comes last"""
+    hits = [
+        {"collection": "c", "doc_id": "b.md", "chunk_id": 1, "id": 2},
+        {"collection": "c", "doc_id": "a.md", "chunk_id": 0, "id": 1},
+    ]
+    texts = ["beta text", "alpha text"]
+
+    with (
+        patch.object(rag_app_module, "RAG_PROMPT_LAYOUT", "prefix_stable"),
+        patch.object(rag_app_module, "RAG_LLM_SLOTS", 4),
+    ):
+        sys1, user1, slot1 = rag_app_module._build_prompt("첫 질문", hits, texts)
+        sys2, user2, slot2 = rag_app_module._build_prompt(
+            "후속 질문", list(reversed(hits)), list(reversed(texts))
+        )
+        payload = rag_app_module._llm_payload("chat-7b", sys1, user1, stream=False, slot=slot1)
+
+    prefix = user1.rsplit("Question:", 1)[0]
+    assert sys1 == sys2 and user2.startswith(prefix)
+    assert prefix.index("[a.md#0]") < prefix.index("[b.md#1]")
+    assert user1.endswith("Question:\n첫 질문")
+    assert slot1 == slot2 and 0 <= slot1 < 4
+    assert payload["cache_prompt"] is True and payload["id_slot"] == slot1
+
+    with patch.object(rag_app_module, "RAG_PROMPT_LAYOUT", "classic"):
+        _, classic_user, classic_slot = rag_app_module._build_prompt("질문", hits, texts)
+    assert classic_user.startswith("Question:\n질문") and classic_slot is None
+
+
+@pytest.mark.asyncio
+async def test_query_reports_cached_prompt_tokens(app_with_mocks, mock_httpx_response):
+    """Cached-token counts from llama.cpp timings are surfaced in usage"""
+    client_mock = rag_app_module.httpx.AsyncClient.return_value.__aenter__.return_value
+    original_post = client_mock.post
+
+    async def post(url, **kwargs):
+        if "/chat/completions" in url:
+            return mock_httpx_response(
+                {
+                    "choices": [{"message": {"content": "cached answer"}}],
+                    "usage": {"prompt_tokens": 900, "completion_tokens": 10},
+                    "timings": {"cache_n": 850, "prompt_n": 50},
+                }
+            )
+        return await original_post(url, **kwargs)
+
+    client_mock.post = post
+    transport = ASGITransport(app=app_with_mocks)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/query", json={"query": "cached tokens question", "collection": "prefix-col"}
+        )
+
+    assert response.json()["usage"]["cached_tokens"] == 850
+
+
+# ============================================================================
+# Single-flight Coalescing and LLM Concurrency Limits
+# ============================================================================
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limiter_hands_over_slots_and_bounds_queue():
+    """Waiters get slots FIFO; callers beyond the queue bound are rejected"""
+    import asyncio
+
+    from llm_limiter import ConcurrencyLimiter, LimiterFull
+
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_waiting=1)
+    await limiter.acquire()
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.waiting == 1
+
+    with pytest.raises(LimiterFull):
+        await limiter.acquire()
+    # bounded=False (배치) 는 대기열 상한을 무시하고 대기
+    unbounded = asyncio.ensure_future(limiter.acquire(bounded=False))
+    await asyncio.sleep(0)
+    assert limiter.waiting == 2
+
+    limiter.release()
+    await waiter
+    limiter.release()
+    await unbounded
+    assert limiter.stats()["in_flight"] == 1 and limiter.waiting == 0
+    limiter.release()
+    assert limiter.stats() == {
+        "max_concurrent": 1,
+        "max_waiting": 1,
+        "in_flight": 0,
+        "waiting": 0,
+        "admitted": 3,
+        "rejected": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_queries_share_one_generation(
+    app_with_mocks, mock_httpx_response
+):
+    """N identical in-flight queries trigger one LLM call; a full queue returns 503"""
+    import asyncio
+
+    from llm_limiter import ConcurrencyLimiter
+
+    client_mock = rag_app_module.httpx.AsyncClient.return_value.__aenter__.return_value
+    original_post = client_mock.post
+    llm_calls = []
+
+    async def slow_post(url, **kwargs):
+        if "/chat/completions" in url:
+            llm_calls.append(url)
+            await asyncio.sleep(0.05)
+        return await original_post(url, **kwargs)
+
+    client_mock.post = slow_post
+    body = {"query": "popular coalesced question", "collection": "flight-col"}
+    transport = ASGITransport(app=app_with_mocks)
+    coalesced_before = rag_app_module.llm_flights.coalesced
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*(client.post("/query", json=body) for _ in range(5)))
+
+        busy = ConcurrencyLimiter(max_concurrent=1, max_waiting=0)
+        busy.in_flight = 1
+        with patch.object(rag_app_module, "llm_limiter", busy):
+            overloaded = await client.post(
+                "/query", json={"query": "overloaded question", "collection": "flight-col"}
+            )
+
+    assert len(llm_calls) == 1
+    assert all(r.json()["answer"] == "Mock answer based on context" for r in responses)
+    assert sum(bool(r.json()["usage"].get("coalesced")) for r in responses) == 4
+    assert rag_app_module.llm_flights.coalesced - coalesced_before == 4
+    assert overloaded.status_code == 503
+    assert overloaded.headers["Retry-After"] == "5"
+
+
+# ============================================================================
+# Incremental Database Maintenance
+# ============================================================================
+
+
+def test_maintenance_migrates_and_vacuums_incrementally(tmp_path):
+    """Legacy DB is switched to incremental auto_vacuum; old rows go in batches, pages are returned"""
+    import sqlite3
+
+    from database import RAGDatabase
+
+    db_path = tmp_path / "legacy.db"
+    legacy = sqlite3.connect(db_path)
+    legacy.execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY)")
+    legacy.commit()
+    legacy.close()
+
+    test_db = RAGDatabase(str(db_path))
+    test_db.maintenance.delete_batch = 100
+    test_db.maintenance.vacuum_pages = 8
+    padding = "x" * 500
+    with test_db.transaction() as conn:
+        conn.executemany(
+            """
+            INSERT INTO search_logs (timestamp, collection, query, query_hash)
+            VALUES (datetime('now', ?), 'c', ?, 'h')
+            """,
+            [("-40 days" if i < 250 else "-1 days", padding) for i in range(300)],
+        )
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+
+    result = test_db.optimize_database()
+    progress = result["maintenance"]
+
+    assert result["database_optimized"] is True
+    assert progress["auto_vacuum"] == 2
+    assert progress["deleted"]["search_logs"] == 250
+    assert progress["freed_pages"] > 0
+    assert progress["freelist_pages"] == 0
+    assert progress["wal_checkpoint"]["busy"] == 0
+    assert progress["phase"] is None and progress["runs"] == 1
+    with test_db.transaction() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM search_logs").fetchone()[0] == 50
+
+
+@pytest.mark.asyncio
+async def test_optimize_endpoint_runs_in_background(app_with_mocks):
+    """/optimize returns immediately; /maintenance reports the finished run"""
+    import asyncio
+
+    transport = ASGITransport(app=app_with_mocks)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        started = (await client.post("/optimize")).json()
+        assert started["message"] in ("Maintenance started", "Maintenance already running")
+        for _ in range(100):
+            progress = (await client.get("/maintenance")).json()
+            if progress["runs"] and progress["state"] != "running":
+                break
+            await asyncio.sleep(0.01)
+
+    assert progress["state"] == "idle"
+    assert progress["name"] == "rag_analytics"
+
+
+# ============================================================================
+# Retrieval-only Search
+# ============================================================================
+
+
+@pytest.mark.asyncio
+async def test_search_returns_packed_chunks_without_llm(app_with_mocks, mock_qdrant_client):
+    """/search embeds and retrieves but never calls the gateway; cached apart from answers"""
+    mock_qdrant_client.search.return_value = [
+        MagicMock(
+            id=1,
+            payload={
+                "text": "alpha beta gamma",
+                "doc_id": "a.md",
+                "chunk_id": 2,
+                "char_start": 40,
+                "char_end": 56,
+            },
+            score=0.9,
+        )
+    ]
+    http = rag_app_module.httpx.AsyncClient.return_value.__aenter__.return_value
+    embed_post = http.post
+    urls = []
+
+    async def recording_post(url, **kwargs):
+        urls.append(url)
+        return await embed_post(url, **kwargs)
+
+    http.post = recording_post
+    transport = ASGITransport(app=app_with_mocks)
+    with patch.object(rag_app_module.analytics, "cache_query") as cache_query:
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/search",
+                json={"query": "alpha search-only", "collection": "s-col", "hybrid": False},
+            )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["cached"] is False
+    assert data["usage"]["total_tokens"] == 0
+    assert data["results"] == [
+        {
+            "score": 0.9,
+            "collection": "s-col",
+            "doc_id": "a.md",
+            "chunk_id": 2,
+            "char_start": 40,
+            "char_end": 56,
+            "text": "alpha beta gamma",
+            "truncated": False,
+        }
+    ]
+    assert not any("/chat/completions" in u for u in urls)
+    key = cache_query.call_args.args[1]
+    assert key.startswith("search|s-col@") and key != rag_app_module._cache_scope(["s-col"], None)
+
+
+# ============================================================================
+# Deadline Propagation
+# ============================================================================
+
+
+def test_deadline_budgets_and_retry_stop():
+    """Stage budgets shrink with the deadline; retries that cannot fit are skipped"""
+    from deadline import Deadline, DeadlineExceeded, current_deadline, stop_before_deadline
+    from deadline import misses, stage_timeout
+
+    assert Deadline.from_header(None) is None and Deadline.from_header("abc") is None
+    stop = stop_before_deadline(2.0)
+    retry_state = MagicMock(upcoming_sleep=0)
+    assert stage_timeout("embed", 60.0) == 60.0 and stop(retry_state) is False
+
+    token = current_deadline.set(Deadline.from_header("1000"))
+    try:
+        assert stage_timeout("embed", 60.0, share=0.25) == pytest.approx(0.25, abs=0.05)
+        assert stop(retry_state) is True  # 2 s backoff cannot fit in 1 s
+        before = misses["llm"]
+        with pytest.raises(DeadlineExceeded):
+            stage_timeout("llm", 60.0, minimum=5.0)
+        assert misses["llm"] == before + 1
+    finally:
+        current_deadline.reset(token)
+
+
+@pytest.mark.asyncio
+async def test_query_degrades_to_context_when_llm_budget_runs_out(
+    app_with_mocks, mock_qdrant_client
+):
+    """A slow LLM past the caller's deadline yields retrieved context flagged degraded"""
+    import asyncio
+
+    from deadline import misses
+
+    mock_qdrant_client.search.return_value = [
+        MagicMock(
+            id=1, payload={"text": "deadline ctx", "doc_id": "d.md", "chunk_id": 0}, score=0.7
+        )
+    ]
+    http = rag_app_module.httpx.AsyncClient.return_value.__aenter__.return_value
+    fast_post = http.post
+
+    async def slow_llm_post(url, **kwargs):
+        if "/chat/completions" in url:
+            await asyncio.sleep(5)
+        return await fast_post(url, **kwargs)
+
+    http.post = slow_llm_post
+    before = misses["llm"]
+    transport = ASGITransport(app=app_with_mocks)
+    with patch.object(rag_app_module, "RAG_DEADLINE_LLM_MIN_MS", 0):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/query",
+                json={"query": "deadline degrade", "collection": "dl-col", "hybrid": False},
+                headers={"X-Request-Deadline-Ms": "300"},
+            )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["degraded"] is True and data["answer"] == ""
+    assert data["usage"]["deadline_stage"] == "llm"
+    assert data["context"][0]["text"] == "deadline ctx"
+    assert data["response_time_ms"] < 1000
+    assert misses["llm"] == before + 1
+
+
+@pytest.mark.asyncio
+async def test_coalesced_callers_keep_their_own_deadlines(app_with_mocks, mock_qdrant_client):
+    """A leader's LLM deadline is not shared, and a follower never waits past its own deadline"""
+    mock_qdrant_client.search.return_value = [
+        MagicMock(id=1, payload={"text": "flight ctx", "doc_id": "f.md", "chunk_id": 0}, score=0.7)
+    ]
+    http = rag_app_module.httpx.AsyncClient.return_value.__aenter__.return_value
+    fast_post = http.post
+
+    async def slow_llm_post(url, **kwargs):
+        if "/chat/completions" in url:
+            await asyncio.sleep(0.6)
+        return await fast_post(url, **kwargs)
+
+    http.post = slow_llm_post
+    transport = ASGITransport(app=app_with_mocks)
+
+    async def ask(client, query, deadline_ms=None, delay=0.0):
+        await asyncio.sleep(delay)
+        headers = {"X-Request-Deadline-Ms": str(deadline_ms)} if deadline_ms else {}
+        body = {"query": query, "collection": "flight-col", "hybrid": False}
+        return (await client.post("/query", json=body, headers=headers)).json()
+
+    with patch.object(rag_app_module, "RAG_DEADLINE_LLM_MIN_MS", 0):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            # 짧은 deadline의 리더가 degraded여도 deadline 없는 대기자는 다시 생성해 답변을 받음
+            leader, follower = await asyncio.gather(
+                ask(client, "short leader", 300), ask(client, "short leader", delay=0.05)
+            )
+            assert leader["degraded"] is True and leader["answer"] == ""
+            assert follower["degraded"] is False
+            assert follower["answer"] == "Mock answer based on context"
+
+            # 리더보다 짧은 deadline의 대기자는 자기 deadline에 검색 컨텍스트만 받고 끝남
+            leader, follower = await asyncio.gather(
+                ask(client, "long leader"), ask(client, "long leader", 200, delay=0.05)
+            )
+            assert leader["degraded"] is False
+            assert follower["degraded"] is True
+            assert follower["context"][0]["text"] == "flight ctx"
+            assert follower["response_time_ms"] < 500
+
+
+# ============================================================================
+# Context Selection (MMR, score gap, adjacent-chunk merge)
+# ============================================================================
+
+
+def test_select_context_merges_overlaps_and_drops_duplicates():
+    """Overlapping windows collapse into one span; near-duplicates and weak hits are dropped"""
+    from context_selection import select_context
+
+    doc = "alpha beta gamma delta epsilon zeta eta theta iota kappa"
+    hits = [
+        {"doc_id": "a.md", "chunk_id": 0, "char_start": 0, "char_end": 34, "score": 0.9},
+        {"doc_id": "a.md", "chunk_id": 1, "char_start": 17, "char_end": 57, "score": 0.85},
+        {"doc_id": "b.md", "chunk_id": 0, "text": "alpha beta gamma delta", "score": 0.8},
+        {"doc_id": "c.md", "chunk_id": 0, "text": "unrelated lambda mu nu", "score": 0.6},
+        {"doc_id": "d.md", "chunk_id": 0, "text": "far below the gap", "score": 0.1},
+    ]
+    for h in hits[:2]:
+        h["text"] = doc[h["char_start"] : h["char_end"]]
+
+    selected = select_context(hits, k=3, lambda_=0.5, min_relative_score=0.3)
+
+    # b.md repeats a.md's opening words, so MMR prefers the new half of a.md (then merged)
+    assert [h["doc_id"] for h in selected] == ["a.md", "c.md"]
+    merged = selected[0]
+    assert merged["text"] == doc and merged["chunk_ids"] == [0, 1]
+    assert (merged["char_start"], merged["char_end"]) == (0, 57)
+    assert merged["score"] == 0.9
+
+
+# ============================================================================
+# Neighbor-window Expansion
+# ============================================================================
+
+
+@pytest.mark.asyncio
+async def test_search_expands_hit_to_neighbors_within_budget(app_with_mocks, mock_qdrant_client):
+    """A hit grows to its ±N chunks from the chunk store; stale rows and the budget are respected"""
+    from chunk_store import ChunkStore
+
+    words = [f"w{i}" for i in range(60)]
+    doc = " ".join(words)
+    spans = [(i * 30, min(len(doc), i * 30 + 40)) for i in range(6)]
+    store = ChunkStore(":memory:")
+    store.put_chunks(
+        "nb-col",
+        [
+            {
+                "point_id": 10 + i,
+                "doc_id": "n.md",
+                "chunk_id": i,
+                "text": doc[s:e],
+                "char_start": s,
+                "char_end": e,
+            }
+            for i, (s, e) in enumerate(spans)
+        ]
+        # leftover row from an older index run (different point-id base) must not be used
+        + [
+            {
+                "point_id": 100,
+                "doc_id": "n.md",
+                "chunk_id": 3,
+                "text": "stale",
+                "char_start": 0,
+                "char_end": 5,
+            }
+        ],
+    )
+    mock_qdrant_client.search.return_value = [MagicMock(id=12, payload=None, score=0.9)]
+
+    transport = ASGITransport(app=app_with_mocks)
+    with patch.object(rag_app_module, "chunk_store", store):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            body = {"query": "w25", "collection": "nb-col", "hybrid": False, "neighbors": 1}
+            wide = (await client.post("/search", json=body)).json()
+            narrow = (await client.post("/search", json={**body, "budget": 1})).json()
+
+    [span] = wide["results"]
+    assert span["chunk_ids"] == [1, 2, 3]
+    assert span["text"] == doc[30:130]
+    assert (span["char_start"], span["char_end"]) == (30, 130)
+    assert wide["usage"]["neighbor_chunks"] == 2
+    assert narrow["usage"]["neighbor_chunks"] == 0
+
+
+@pytest.mark.asyncio
+async def test_query_fails_loudly_when_chunk_text_is_missing(app_with_mocks, mock_qdrant_client):
+    """Vectors without chunk-store rows (lost DB) → 503 asking for a re-index, not empty context"""
+    from chunk_store import ChunkStore
+
+    mock_qdrant_client.search.return_value = [MagicMock(id=5, payload=None, score=0.9)]
+    mock_qdrant_client.retrieve.return_value = []  # 현재 payload에는 원문이 없음
+
+    transport = ASGITransport(app=app_with_mocks)
+    with patch.object(rag_app_module, "chunk_store", ChunkStore(":memory:")):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            body = {"query": "anything", "collection": "lost-col", "hybrid": False}
+            response = await client.post("/query", json={**body, "use_cache": False})
+            search = await client.post("/search", json=body)
+
+    assert response.status_code == 503
+    assert "re-index" in response.json()["detail"]
+    assert search.status_code == 503
+
+
+def test_embedding_model_follows_env_and_compose():
+    """rag reads EMBEDDING_MODEL, and every compose file passes it to rag like to embedding"""
+    import subprocess
+    from pathlib import Path
+
+    import yaml
+
+    env = {**os.environ, "EMBEDDING_MODEL": "intfloat/multilingual-e5-small"}
+    env.pop("RAG_EMBED_TOKENIZER", None)
+    out = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import app; print(app.RAG_EMBEDDING_MODEL); print(app.RAG_EMBED_TOKENIZER)",
+        ],
+        cwd=os.path.dirname(rag_app_module.__file__),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert out.stdout.split()[-2:] == ["intfloat/multilingual-e5-small"] * 2
+
+    docker = Path(__file__).resolve().parents[3] / "docker"
+    for name in ("compose.p2.yml", "compose.p2.cpu.yml", "compose.p3.yml"):
+        services = yaml.safe_load((docker / name).read_text())["services"]
+        model = [
+            e for e in services["embedding"]["environment"] if e.startswith("EMBEDDING_MODEL=")
+        ]
+        assert model and set(model) <= set(services["rag"]["environment"]), name
+
+
+@pytest.mark.asyncio
+async def test_embedding_migration_refused_when_old_model_is_not_served(
+    app_with_mocks, mock_qdrant_client, mock_httpx_response
+):
+    """Without the old model on the embedding allowlist the re-embed must not start"""
+
+    async def mock_post(url: str, **kwargs):
+        request = kwargs["json"]
+        if request.get("model") == "old/model":
+            return mock_httpx_response({"detail": "Model not allowed"}, status_code=400)
+        return mock_httpx_response(
+            {
+                "embeddings": [[0.1] * 384 for _ in request["texts"]],
+                "model": "BAAI/bge-small-en-v1.5",
+            }
+        )
+
+    rag_app_module.httpx.AsyncClient.return_value.__aenter__.return_value.post = mock_post
+    rag_app_module._set_collection_target("old-col", "old-col", "old/model", 384)
+    transport = ASGITransport(app=app_with_mocks)
+    try:
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            refused = await client.post("/collections/old-col/migrate")
+
+            # 자동 시작(기동/색인 시)도 확인 단계에서 멈추고 진행 상황에 이유를 남김
+            auto = rag_app_module._start_embedding_migration("old-col", auto=False)
+            while auto.running:
+                await asyncio.sleep(0.01)
+            info = (await client.get("/collections/old-col/embedding")).json()
+    finally:
+        rag_app_module._collection_targets.pop("old-col", None)
+        rag_app_module._embedding_migrations.pop("old-col", None)
+
+    assert refused.status_code == 409
+    assert "EMBEDDING_ALLOWED_MODELS" in refused.json()["detail"]
+    assert info["migration"]["state"] == "failed"
+    assert "EMBEDDING_ALLOWED_MODELS" in info["migration"]["error"]
+    assert info["current"]["physical"] == "old-col"
+    mock_qdrant_client.create_collection.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_embedding_migration_reembeds_into_shadow_then_swaps(
+    app_with_mocks, mock_qdrant_client, mock_httpx_response
+):
+    """Queries use the recorded model/collection until the shadow re-embed swaps the alias"""
+    import asyncio
+
+    from chunk_store import ChunkStore
+
+    store = ChunkStore(":memory:")
+    store.put_chunks("mig-col", [{"point_id": 1, "doc_id": "a.md", "chunk_id": 0, "text": "alpha"}])
+    existing = MagicMock()
+    existing.name = "mig-col"
+    mock_qdrant_client.get_collections.return_value = MagicMock(collections=[existing])
+    mock_qdrant_client.count.return_value = MagicMock(count=3)
+    # point 2는 이전 방식(payload에 원문), point 3은 원문이 없어 건너뜀
+    mock_qdrant_client.scroll.return_value = (
+        [
+            MagicMock(id=1, payload={"doc_id": "a.md"}),
+            MagicMock(id=2, payload={"doc_id": "b.md", "text": "beta"}),
+            MagicMock(id=3, payload={"doc_id": "c.md"}),
+        ],
+        None,
+    )
+    embed_models = []
+
+    async def mock_post(url: str, **kwargs):
+        request = kwargs["json"]
+        embed_models.append(request.get("model"))
+        model = request.get("model", "BAAI/bge-small-en-v1.5")
+        return mock_httpx_response(
+            {"embeddings": [[0.1] * 384 for _ in request["texts"]], "model": model}
+        )
+
+    rag_app_module.httpx.AsyncClient.return_value.__aenter__.return_value.post = mock_post
+    rag_app_module._set_collection_target("mig-col", "mig-col", "old/model", 384)
+    transport = ASGITransport(app=app_with_mocks)
+    body = {"query": "alpha", "collection": "mig-col", "hybrid": False, "use_cache": False}
+    try:
+        with (
+            patch.object(rag_app_module, "chunk_store", store),
+            patch.object(rag_app_module, "RAG_EMBED_MIGRATION_AUTO", False),
+            patch.object(rag_app_module, "RAG_EMBED_MIGRATION_DROP_DELAY", -1),
+        ):
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                await client.post("/search", json=body)
+                assert embed_models == ["old/model"]
+                searched = mock_qdrant_client.search.call_args.kwargs["collection_name"]
+                assert searched == "mig-col"
+
+                started = (await client.post("/collections/mig-col/migrate")).json()
+                assert started["target"] == "mig-col__baai_bge_small_en_v1_5"
+                while rag_app_module._embedding_migrations["mig-col"].running:
+                    await asyncio.sleep(0.01)
+                info = (await client.get("/collections/mig-col/embedding")).json()
+
+                embed_models.clear()
+                await client.post("/search", json={**body, "query": "alpha again"})
+    finally:
+        rag_app_module._collection_targets.pop("mig-col", None)
+        rag_app_module._alias_map().pop("mig-col", None)
+
+    assert info["migration"]["state"] == "swapped"
+    assert (info["migration"]["migrated"], info["migration"]["skipped"]) == (2, 1)
+    assert info["current"] == {
+        "physical": "mig-col__baai_bge_small_en_v1_5",
+        "model": "BAAI/bge-small-en-v1.5",
+        "dim": 384,
+    }
+    upsert = mock_qdrant_client.upsert.call_args.kwargs
+    assert upsert["collection_name"] == "mig-col__baai_bge_small_en_v1_5"
+    assert [p.id for p in upsert["points"]] == [1, 2]
+    assert embed_models == [None]
+    searched = mock_qdrant_client.search.call_args.kwargs["collection_name"]
+    assert searched == "mig-col__baai_bge_small_en_v1_5"
+    # alias 도입 전 컬렉션 → 삭제 후 같은 이름의 Qdrant alias로 교체
+    assert mock_qdrant_client.delete_collection.call_args.args == ("mig-col",)
+    [op] = mock_qdrant_client.update_collection_aliases.call_args.kwargs[
+        "change_aliases_operations"
+    ]
+    assert op.create_alias.alias_name == "mig-col"
+    assert op.create_alias.collection_name == "mig-col__baai_bge_small_en_v1_5"
+
+
+def test_qdrant_alias_is_the_durable_collection_mapping():
+    """The swap lives in Qdrant: a lost DB or another replica's swap resolves through the alias"""
+    from database import RAGDatabase
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models as qmodels
+
+    client = QdrantClient(":memory:")
+    params = qmodels.VectorParams(size=4, distance=qmodels.Distance.COSINE)
+    shadow = "alias-col__baai_bge_small_en_v1_5"
+    for name in ("alias-col", shadow, "alias-col__next_model"):
+        client.create_collection(name, vectors_config=params)
+    names = lambda: sorted(c.name for c in client.get_collections().collections)  # noqa: E731
+
+    with (
+        patch.object(rag_app_module, "qdrant", client),
+        patch.object(rag_app_module, "db", RAGDatabase(":memory:")),
+        patch.object(rag_app_module, "_qdrant_aliases", None),
+        patch.object(rag_app_module, "_collection_targets", {}),
+        patch.object(rag_app_module, "RAG_EMBED_MIGRATION_AUTO", False),
+    ):
+        rag_app_module._point_alias("alias-col", shadow)
+        assert names() == ["alias-col__baai_bge_small_en_v1_5", "alias-col__next_model"]
+
+        # 컨테이너 DB 유실: 빈 컬렉션을 새로 만들지 않고 alias가 가리키는 컬렉션을 사용
+        target = rag_app_module._ensure_collection("alias-col", 4)
+        assert target == {"physical": shadow, "model": "BAAI/bge-small-en-v1.5", "dim": 4}
+        assert "alias-col" not in names()
+
+        # 다른 replica가 alias를 교체 → 재확인 때 반영하고 답변 캐시 무효화
+        client.update_collection_aliases(
+            change_aliases_operations=[
+                qmodels.DeleteAliasOperation(
+                    delete_alias=qmodels.DeleteAlias(alias_name="alias-col")
+                ),
+                qmodels.CreateAliasOperation(
+                    create_alias=qmodels.CreateAlias(
+                        collection_name="alias-col__next_model", alias_name="alias-col"
+                    )
+                ),
+            ]
+        )
+        version = rag_app_module.db.get_index_versions(["alias-col"])["alias-col"]
+        rag_app_module._refresh_collection_targets()
+        assert rag_app_module._physical("alias-col") == "alias-col__next_model"
+        assert rag_app_module._collection_target("alias-col")["model"] is None
+        assert rag_app_module.db.get_index_versions(["alias-col"])["alias-col"] == version + 1
+
+
+@pytest.mark.asyncio
+async def test_cache_warmup_answers_top_queries_into_cache(app_with_mocks, mock_qdrant_client):
+    """After a re-index the top queries are answered into the cache only, highest count first"""
+    import asyncio
+
+    from cache_warmup import CacheWarmup
+
+    db = rag_app_module.db
+    with db.transaction() as conn:
+        bucket = conn.execute("SELECT strftime('%Y-%m-%d %H:00:00', 'now')").fetchone()[0]
+        conn.executemany(
+            """
+            INSERT INTO query_rollups (bucket_start, collection, query_hash, query, count)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [
+                (bucket, "warm-col", "h1", "how to install", 9),
+                (bucket, "other,warm-col", "h2", "what is rag", 4),
+                (bucket, "other-col", "h3", "unrelated", 50),
+            ],
+        )
+    db.bump_index_version("warm-col")
+    mock_qdrant_client.search.return_value = [MagicMock(id=1, payload=None, score=0.9)]
+    mock_qdrant_client.retrieve.return_value = [
+        MagicMock(id=1, payload={"text": "install guide", "doc_id": "a.md"})
+    ]
+
+    # 다른 테스트의 /index가 예약한 warm-up과 섞이지 않도록 새 인스턴스 사용
+    warmup = CacheWarmup(
+        top_queries=lambda col: db.get_top_queries(col, 24, 10),
+        warm=rag_app_module._warm_answer,
+        idle=rag_app_module.cache_warmup._idle,
+    )
+    transport = ASGITransport(app=app_with_mocks)
+    with (
+        patch.object(rag_app_module, "cache_warmup", warmup),
+        patch.object(rag_app_module.analytics, "cache_query") as cache_query,
+        patch.object(rag_app_module.analytics, "log_search") as log_search,
+    ):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            started = (await client.post("/cache/warmup", params={"collection": "warm-col"})).json()
+            assert started["pending"] == ["warm-col"]
+            while warmup.progress()["state"] != "idle":
+                await asyncio.sleep(0.01)
+            progress = (await client.get("/cache/warmup")).json()
+
+    assert (progress["total"], progress["warmed"], progress["failed"]) == (2, 2, 0)
+    warmed = [(c.args[0], c.args[1]) for c in cache_query.call_args_list]
+    assert warmed == [
+        ("how to install", "warm-col@v1"),
+        ("what is rag", "other@v0,warm-col@v1"),
+    ]
+    assert cache_query.call_args_list[0].args[2] == "Mock answer based on context"
+    log_search.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_index_dedups_identical_chunks_across_documents(
+    app_with_mocks, mock_qdrant_client, tmp_path
+):
+    """Identical (normalized) chunks are embedded once and remember every referencing document"""
+    from chunk_store import ChunkStore
+    from lexical_index import LexicalIndex
+
+    header = "Licensed under the Apache License, Version 2.0. See LICENSE for details."
+    (tmp_path / "a.md").write_text(header)
+    (tmp_path / "vendor").mkdir()
+    (tmp_path / "vendor" / "b.txt").write_text("  " + header.replace(" ", "\n  ", 3) + "\n")
+    (tmp_path / "c.md").write_text("Completely different release notes.")
+    store, lexical = ChunkStore(":memory:"), LexicalIndex(":memory:")
+
+    transport = ASGITransport(app=app_with_mocks)
+    with (
+        patch.object(rag_app_module, "chunk_store", store),
+        patch.object(rag_app_module, "lexical", lexical),
+        patch.object(rag_app_module.cache_warmup, "schedule"),
+    ):
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/index", params={"collection": "dedup-col", "path": os.path.relpath(tmp_path)}
+            )
+
+    data = response.json()
+    assert (data["chunks"], data["unique_chunks"]) == (3, 2)
+    assert data["dedup_ratio"] == pytest.approx(1 / 3, abs=1e-4)
+
+    points = mock_qdrant_client.upsert.call_args.kwargs["points"]
+    assert [p.id for p in points] == [0, 1]
+    assert points[0].payload["ext"] == ["md", "txt"]
+    # 중복 문서 경로로 필터해도 대표 point가 걸림
+    assert any(p.endswith("vendor") for p in points[0].payload["path_prefixes"])
+    mock_qdrant_client.delete.assert_called_once()
+    assert lexical.count("dedup-col") == 2
+
+    chunk = store.get_chunks("dedup-col", [0])[0]
+    assert [os.path.basename(d) for d in chunk["doc_ids"]] == ["a.md", "b.txt"]
+    assert store.count("dedup-col") == 2
+
+
+@pytest.mark.asyncio
+async def test_snapshot_export_then_import_restores_without_embedding(
+    app_with_mocks, mock_qdrant_client
+):
+    """Export → import restores vectors, chunk store rows, lexical index and document metadata"""
+    from chunk_store import ChunkStore
+    from lexical_index import LexicalIndex
+
+    source, restored = ChunkStore(":memory:"), ChunkStore(":memory:")
+    lexical = LexicalIndex(":memory:")
+    source.put_chunks(
+        "snap-src",
+        [
+            {"point_id": 0, "doc_id": "snap/a.md", "chunk_id": 0, "text": "alpha release notes"},
+            {"point_id": 1, "doc_id": "snap/a.md", "chunk_id": 1, "text": "beta migration guide"},
+            {"point_id": 2, "doc_id": "snap/b.md", "chunk_id": 0, "canonical_id": 0},
+        ],
+    )
+    rag_app_module.db.update_document_metadata("snap/a.md", "a.md", 40, 2, "snap/model", "c1")
+    rag_app_module.db.update_document_metadata("snap/b.md", "b.md", 19, 1, "snap/model", "c2")
+    rag_app_module._set_collection_target("snap-src", "snap-src", "snap/model", 4)
+    mock_qdrant_client.scroll.side_effect = [
+        ([MagicMock(id=0, vector=[0.5, 0.25, 0.0, 1.0], payload={"mtime": [1.0, 2.0]})], 1),
+        ([MagicMock(id=1, vector=[1.0, 0.0, -0.5, 0.125], payload={"ext": "md"})], None),
+    ]
+    mock_qdrant_client.collection_exists.side_effect = lambda name: name == "snap-src"
+    embed_post = AsyncMock()
+    rag_app_module.httpx.AsyncClient.return_value.__aenter__.return_value.post = embed_post
+
+    transport = ASGITransport(app=app_with_mocks)
+    try:
+        with (
+            patch.object(rag_app_module, "lexical", lexical),
+            patch.object(rag_app_module.cache_warmup, "schedule"),
+        ):
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                with patch.object(rag_app_module, "chunk_store", source):
+                    exported = await client.get("/collections/snap-src/export")
+                with patch.object(rag_app_module, "chunk_store", restored):
+                    response = await client.post(
+                        "/collections/snap-dst/import", content=exported.content
+                    )
+                    invalid = await client.post("/collections/snap-x/import", content=b"junk")
+        target = rag_app_module._collection_target("snap-dst")
+    finally:
+        for name in ("snap-src", "snap-dst"):
+            rag_app_module._collection_targets.pop(name, None)
+
+    assert exported.status_code == 200
+    assert exported.headers["x-snapshot-points"] == "2"
+    data = response.json()
+    assert (data["points"], data["chunks"], data["chunk_refs"], data["documents"]) == (2, 2, 1, 2)
+    assert invalid.status_code == 400
+    embed_post.assert_not_called()
+
+    assert target == {"physical": "snap-dst", "model": "snap/model", "dim": 4}
+    points = sorted(
+        (p for call in mock_qdrant_client.upsert.call_args_list for p in call.kwargs["points"]),
+        key=lambda p: p.id,
+    )
+    assert [p.vector for p in points] == [[0.5, 0.25, 0.0, 1.0], [1.0, 0.0, -0.5, 0.125]]
+    assert points[1].payload == {"ext": "md"}
+    assert restored.get_chunks("snap-dst", [0])[0]["doc_ids"] == ["snap/a.md", "snap/b.md"]
+    assert restored.get_neighbors("snap-dst", [(0, "snap/a.md", 0, 0)], 1)[0][0]["id"] == 1
+    assert lexical.count("snap-dst") == 2
+    docs = rag_app_module.db.get_documents_metadata(["snap/a.md", "snap/b.md"])
+    assert sorted(d["chunk_count"] for d in docs) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_health_serves_cached_probe_with_backoff_and_deep_refresh(app_with_mocks):
+    """A running prober answers /health from cache; failures back off; deep=true probes live"""
+    from health_prober import HealthProber
+
+    calls = {"qdrant": 0, "embedding": 0, "api_gateway": 0}
+
+    def probe(name, fail=False):
+        async def run():
+            calls[name] += 1
+            if fail:
+                raise ConnectionError(f"{name} down")
+            return {"dim": 384} if name == "embedding" else {}
+
+        return run
+
+    prober = HealthProber(
+        {
+            "qdrant": probe("qdrant"),
+            "embedding": probe("embedding"),
+            "api_gateway": probe("api_gateway", fail=True),
+        },
+        interval=30,
+        max_backoff=100,
+    )
+    await prober.probe()
+    await prober.probe(["api_gateway"])
+    gateway = prober.snapshot()["api_gateway"]
+    assert (gateway["failures"], gateway["error"]) == (2, "api_gateway down")
+    assert gateway["next_probe_in_s"] == pytest.approx(60, abs=1)
+    await prober.probe(["api_gateway"] * 3)
+    assert prober.snapshot()["api_gateway"]["next_probe_in_s"] == pytest.approx(100, abs=1)
+
+    prober.start()
+    try:
+        with patch.object(rag_app_module, "health_prober", prober):
+            transport = ASGITransport(app=app_with_mocks)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                before = dict(calls)
+                cached = await client.get("/health")
+                assert calls == before
+                deep = await client.get("/health", params={"deep": "true"})
+                assert calls == {name: count + 1 for name, count in before.items()}
+    finally:
+        prober.stop()
+
+    data = cached.json()
+    assert cached.status_code == 503
+    assert data["cached"] is True and deep.json()["cached"] is False
+    assert data["dependencies"]["embedding"]["dim"] == 384
+    assert data["dependencies"]["qdrant"]["status"] == "healthy"
+    assert data["dependencies"]["api_gateway"]["status"] == "unhealthy"
+    assert data["dependencies"]["qdrant"]["stale"] is False
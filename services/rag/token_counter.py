@@ -0,0 +1,127 @@
+"""
+RAG Token Counter
+- HuggingFace tokenizers 기반 실제 토큰 카운트 (임베딩 모델 / 채팅 모델 별도)
+- 토크나이저를 못 불러오면 스크립트 인지 근사치로 동작 (한글 음절 ≈ 1토큰)
+- 토큰 char offset 기반 청킹: split/join 없이 원문 슬라이스 + 오프셋 기록
+"""
+
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+try:
+    from tokenizers import Tokenizer
+
+    TOKENIZERS_AVAILABLE = True
+except ImportError:
+    Tokenizer = None
+    TOKENIZERS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 근사 토큰: 한글 음절 1개, 영문 최대 4자, 숫자 최대 3자, 그 외 비공백 문자 1개
+_APPROX_TOKEN_RE = re.compile(r"[가-힣]|[A-Za-z]{1,4}|\d{1,3}|\S")
+_SENTENCE_END = ".!?。"
+
+Span = Tuple[int, int]
+
+
+def _load_tokenizer(name: str):
+    """tokenizer.json 경로, 디렉토리 또는 HF 모델 ID에서 로드"""
+    if os.path.isdir(name):
+        name = os.path.join(name, "tokenizer.json")
+    if os.path.isfile(name):
+        return Tokenizer.from_file(name)
+    return Tokenizer.from_pretrained(name)
+
+
+class TokenCounter:
+    """모델 토크나이저 기반 토큰 카운터 (load() 전에는 근사치 사용)"""
+
+    def __init__(self, name: Optional[str] = None, tokenizer=None, cache_size: int = 8192):
+        self.name = name
+        self._tokenizer = tokenizer
+        self._lock = threading.Lock()
+        self.load_error: Optional[str] = None
+        self._count_cached = lru_cache(maxsize=cache_size)(self._count)
+
+    @property
+    def backend(self) -> str:
+        return "tokenizers" if self._tokenizer is not None else "heuristic"
+
+    def load(self) -> bool:
+        """토크나이저 로드 (startup에서 한 번). 실패 시 근사치 유지"""
+        if self._tokenizer is not None:
+            return True
+        if not self.name or not TOKENIZERS_AVAILABLE:
+            return False
+        with self._lock:
+            if self._tokenizer is None:
+                try:
+                    self._tokenizer = _load_tokenizer(self.name)
+                    self._count_cached.cache_clear()
+                except Exception as e:
+                    self.load_error = str(e)[:200]
+                    logger.warning(f"Tokenizer '{self.name}' unavailable, using heuristic: {e}")
+        return self._tokenizer is not None
+
+    def spans(self, text: str) -> List[Span]:
+        """토큰별 (char_start, char_end) 오프셋"""
+        if self._tokenizer is not None:
+            enc = self._tokenizer.encode(text, add_special_tokens=False)
+            return [(s, e) for s, e in enc.offsets if e > s]
+        return [m.span() for m in _APPROX_TOKEN_RE.finditer(text)]
+
+    def _count(self, text: str) -> int:
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+        return sum(1 for _ in _APPROX_TOKEN_RE.finditer(text))
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return self._count_cached(text)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """앞에서부터 max_tokens 토큰까지만 남김"""
+        if max_tokens <= 0:
+            return ""
+        spans = self.spans(text)
+        if len(spans) <= max_tokens:
+            return text
+        return text[: spans[max_tokens - 1][1]]
+
+    def chunk_spans(
+        self, text: str, size: int, overlap: int, snap_ratio: float = 0.2
+    ) -> List[Span]:
+        """
+        토큰 오프셋 한 번 순회로 청크 char 구간 계산
+        - 창 끝의 snap_ratio 구간 안에 문장 끝이 있으면 그 위치에서 자름
+        - 다음 청크는 (끝 - overlap) 토큰부터 시작
+        """
+        spans = self.spans(text)
+        n = len(spans)
+        if n == 0:
+            return []
+        size = max(8, size)  # 안전 하한
+        overlap = max(0, min(overlap, size - 1))
+        snap = max(1, int(size * snap_ratio))
+
+        out: List[Span] = []
+        i = 0
+        while i < n:
+            end = min(i + size, n)
+            if end < n:
+                for j in range(end - 1, max(i, end - snap) - 1, -1):
+                    pos = spans[j][1]
+                    if text[pos - 1] in _SENTENCE_END or text.startswith("\n", pos):
+                        end = j + 1
+                        break
+            out.append((spans[i][0], spans[end - 1][1]))
+            if end >= n:
+                break
+            i = max(i + 1, end - overlap)
+        return out
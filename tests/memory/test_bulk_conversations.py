@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+대화 대량 저장 테스트 (save_conversations_bulk)
+단건 저장과 같은 점수/TTL/FTS/임베딩 큐 결과를 한 트랜잭션으로 만드는지 검증
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from memory_system import MemorySystem  # noqa: E402
+
+CONVERSATIONS = [
+    {"user_query": "안녕하세요!", "ai_response": "안녕하세요! 무엇을 도와드릴까요?"},
+    {
+        "user_query": "How do I fix this config error?",
+        "ai_response": "Set the environment variable first:\n```python\nimport os\n```",
+        "model_used": "code-7b",
+        "session_id": "replay",
+        "tags": ["config"],
+    },
+    {
+        "user_query": "배포 전략 결정",
+        "ai_response": "Blue/green 배포로 결정했습니다. " * 80,
+        "context": {"user_important": True},
+        "token_count": 321,
+        "response_time_ms": 1200,
+    },
+]
+
+
+@pytest.fixture
+def memory(tmp_path):
+    return MemorySystem(data_dir=str(tmp_path))
+
+
+def _rows(memory, project_id, ids):
+    placeholders = ",".join("?" * len(ids))
+    with memory.transaction(project_id) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT id, user_query, importance_score, tags, session_id, token_count,
+                   project_context, expires_at IS NULL AS permanent
+            FROM conversations WHERE id IN ({placeholders}) ORDER BY id
+        """,
+            ids,
+        ).fetchall()
+    return [tuple(row)[1:] for row in rows]
+
+
+def test_bulk_save_matches_single_saves(memory):
+    single_ids = [memory.save_conversation("single", **c) for c in CONVERSATIONS]
+    bulk_ids = memory.save_conversations_bulk("bulk", CONVERSATIONS)
+
+    assert bulk_ids == [1, 2, 3]
+    assert _rows(memory, "bulk", bulk_ids) == _rows(memory, "single", single_ids)
+
+    with memory.transaction("bulk") as conn:
+        pending = conn.execute(
+            "SELECT conversation_id FROM conversation_embeddings WHERE sync_status = 'pending'"
+        ).fetchall()
+        trigger = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'conversations_ai_insert'"
+        ).fetchone()[0]
+    assert [row[0] for row in pending] == bulk_ids
+    assert trigger == 1
+
+    # FTS는 대량 저장분과 이후 단건 저장분 모두 검색됨
+    later_id = memory.save_conversation("bulk", "blue green rollout", "done")
+    assert [r["id"] for r in memory.search_conversations("bulk", "Blue")] == [3, later_id]
+
+
+def test_bulk_save_is_all_or_nothing(memory):
+    assert memory.save_conversations_bulk("bulk", []) == []
+    assert memory.save_conversations_bulk("bulk", [*CONVERSATIONS, {"user_query": "x"}]) is None
+    assert memory.save_conversations_bulk("bulk", CONVERSATIONS[:1]) == [1]
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """memory-service 앱 (tmp_path DB, 백그라운드 임베딩 처리 생략)"""
+    monkeypatch.setenv("MEMORY_DATA_DIR", str(tmp_path))
+    spec = importlib.util.spec_from_file_location(
+        "memory_service_app", ROOT / "services" / "memory-service" / "app.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, "process_embeddings_background", AsyncMock())
+    return module
+
+
+def test_bulk_endpoint_returns_ids_in_request_order(service):
+    client = TestClient(service.app)
+    response = client.post("/v1/memory/conversations/bulk", json={"conversations": CONVERSATIONS})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == len(CONVERSATIONS)
+    assert body["conversation_ids"] == [1, 2, 3]
+    queries = [row[0] for row in _rows(service.memory_system, body["project_id"], [1, 2, 3])]
+    assert queries == [c["user_query"] for c in CONVERSATIONS]
+    service.process_embeddings_background.assert_awaited_once_with(body["project_id"])
+
+
+def test_bulk_endpoint_caps_conversations_per_request(service, monkeypatch):
+    monkeypatch.setattr(service, "MEMORY_BULK_MAX_CONVERSATIONS", 2)
+    client = TestClient(service.app)
+
+    response = client.post("/v1/memory/conversations/bulk", json={"conversations": CONVERSATIONS})
+    assert response.status_code == 413
+    assert "At most 2" in response.json()["detail"]
+
+    # 거절된 요청은 아무것도 저장하지 않음 → 한도 안의 요청이 ID 1부터 받음
+    response = client.post(
+        "/v1/memory/conversations/bulk", json={"conversations": CONVERSATIONS[:2]}
+    )
+    assert response.status_code == 200
+    assert response.json()["conversation_ids"] == [1, 2]
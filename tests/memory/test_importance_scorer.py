@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+중요도 점수 골든 테스트 (KeywordMatcher / 컴파일된 코드 패턴)
+키워드마다 `in`, 패턴마다 IGNORECASE 검색하던 이전 구현과 점수가 같은지 검증
+"""
+
+import random
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+
+from memory_system import (  # noqa: E402
+    _CODE_PATTERNS_LOWER,
+    CODE_PATTERNS,
+    HIGH_IMPORTANCE_KEYWORDS,
+    LOW_IMPORTANCE_KEYWORDS,
+    KeywordMatcher,
+    MemorySystem,
+)
+from test_importance_scoring import IMPORTANCE_TEST_CASES  # noqa: E402
+
+
+def legacy_score(user_query, ai_response, model_used=None, context=None):
+    """이전 calculate_importance_score 구현 (기준값)"""
+    score = 5
+    context = context or {}
+    combined_text = f"{user_query.lower()} {ai_response.lower()}"
+    score += min(sum(1 for k in HIGH_IMPORTANCE_KEYWORDS if k in combined_text), 3)
+    score -= min(sum(1 for k in LOW_IMPORTANCE_KEYWORDS if k in combined_text), 2)
+    if len(ai_response) > 2000:
+        score += 2
+    elif len(ai_response) > 1000:
+        score += 1
+    elif len(ai_response) < 100:
+        score -= 1
+    for pattern in CODE_PATTERNS:
+        if re.search(pattern, ai_response, re.IGNORECASE):
+            score += 1
+            break
+    if model_used == "code-7b":
+        score += 1
+    if context.get("user_saved", False):
+        score = 10
+    elif context.get("user_important", False):
+        score = max(score, 8)
+    if len(user_query) > 200:
+        score += 1
+    return max(1, min(10, score))
+
+
+def _variants():
+    for case in IMPORTANCE_TEST_CASES:
+        query, response = case["user_query"], case["ai_response"]
+        yield query, response, None, case.get("context")
+        yield query, (response * 80)[:10240], "code-7b", None  # 10KB 응답
+        yield query * 8, response[:90], None, {"user_saved": True}
+    # 키워드 포함/경계 걸침, lower()와 IGNORECASE가 다르게 접는 문자
+    for text in [
+        "configuration hissue thi okay plan",
+        "chissue tesTest 좋다좋아 hellok",
+        "İmport os",
+        "claſs Foo and SELECT id\nFROM t",
+        "DEF main(): pass",
+        "``` ` `` `x`",
+        "```a```",
+        "",
+    ]:
+        yield text, text, None, None
+
+
+@pytest.fixture(scope="module")
+def memory(tmp_path_factory):
+    return MemorySystem(data_dir=str(tmp_path_factory.mktemp("memory")))
+
+
+def test_scenario_scores_are_unchanged(memory):
+    scores = [
+        memory.calculate_importance_score(
+            c["user_query"], c["ai_response"], context=c.get("context")
+        )
+        for c in IMPORTANCE_TEST_CASES
+    ]
+    assert scores == [3, 3, 6, 6, 8, 8]
+
+    for query, response, model, context in _variants():
+        expected = legacy_score(query, response, model, context)
+        assert memory.calculate_importance_score(query, response, model, context) == expected
+
+
+def test_lowercase_code_patterns_match_ignorecase_search():
+    for _, response, _, _ in _variants():
+        if any(ch in response for ch in "\u0130\u0131\u017f"):
+            continue  # 원문 IGNORECASE 검색으로 대체되는 경우
+        for pattern, lowered in zip(CODE_PATTERNS, _CODE_PATTERNS_LOWER):
+            expected = re.search(pattern, response, re.IGNORECASE) is not None
+            assert (lowered.search(response.lower()) is not None) == expected, (pattern, response)
+
+
+def test_keyword_matcher_matches_substring_checks():
+    tables = {"high": HIGH_IMPORTANCE_KEYWORDS, "low": LOW_IMPORTANCE_KEYWORDS}
+    matcher = KeywordMatcher(tables)
+    pieces = list("abcdefghiklmnoprstuy ") + [
+        "설정",
+        "좋",
+        "다",
+        "테스트",
+        "hi",
+        "ok",
+        "config",
+        "uration",
+        "design",
+        " pattern",
+    ]
+    rng = random.Random(7)
+    for _ in range(3000):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 60)))
+        expected = {name: sum(1 for k in words if k in text) for name, words in tables.items()}
+        assert matcher.counts(text) == expected, text
+        capped = {"high": min(expected["high"], 3), "low": min(expected["low"], 2)}
+        assert matcher.counts(text, limits={"high": 3, "low": 2}) == capped, text
+
+
+def test_keyword_matcher_shared_keywords_respect_every_limit():
+    matcher = KeywordMatcher({"a": ["ok", "hi", "설정"], "b": ["ok", "plan", "ok"]})
+    assert matcher.counts("ok hi plan 설정") == {"a": 3, "b": 3}
+    assert matcher.counts("ok hi plan 설정", limits={"a": 1, "b": 3}) == {"a": 1, "b": 3}
+    assert matcher.counts("ok plan", limits={"b": 1}) == {"a": 1, "b": 1}